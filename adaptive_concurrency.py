@@ -0,0 +1,228 @@
+"""
+AIMD concurrency control for advanced_archiver workers
+
+AdaptiveLimiter decides how many archive jobs may run at once. The limit grows by one after
+every `limit` successful jobs that finish under the latency target, and is halved when a job
+is too slow, when too many recent jobs timed out, or when the machine runs short of CPU or
+memory. It always stays within [min_limit, max_limit]. Independently of that limit, at most
+per_host jobs run against one host, with per_host_delay seconds between their starts.
+acquire_next hands out work from a HostQueue, choosing among hosts that have a free slot, so
+one saturated host does not hold up jobs for the others.
+"""
+
+import asyncio
+import os
+import time
+from collections import Counter, OrderedDict, deque
+
+try:
+    import psutil
+    _HAS_PSUTIL = True
+except ImportError:
+    _HAS_PSUTIL = False
+
+
+def system_pressure():
+    """(درصد CPU, درصد حافظه) سیستم؛ None برای مقدارهایی که قابل اندازه‌گیری نیستند"""
+    if _HAS_PSUTIL:
+        return psutil.cpu_percent(interval=None), psutil.virtual_memory().percent
+    if hasattr(os, 'getloadavg'):
+        return os.getloadavg()[0] / (os.cpu_count() or 1) * 100, None
+    return None, None
+
+
+class HostQueue:
+    """کارهای در انتظار به تفکیک هاست (به ترتیب ورود در هر هاست)"""
+
+    def __init__(self):
+        self._queues = OrderedDict()
+        self._size = 0
+
+    def put(self, host, item):
+        self._queues.setdefault(host, deque()).append(item)
+        self._size += 1
+
+    def hosts(self):
+        return self._queues.keys()
+
+    def pop(self, host):
+        items = self._queues[host]
+        item = items.popleft()
+        if not items:
+            del self._queues[host]
+        self._size -= 1
+        return item
+
+    def __len__(self):
+        return self._size
+
+
+class AdaptiveLimiter:
+    """
+    محدودکننده AIMD برای asyncio. هر کار قبل از شروع acquire(host) و بعد از پایان
+    release(host, started, seconds, ok, timed_out) را صدا می‌زند.
+    """
+
+    def __init__(self, min_limit=2, max_limit=16, initial=None, target_latency=60.0, timeout_rate=0.2,
+                 cpu_high=90.0, memory_high=85.0, per_host=2, per_host_delay=0.0, window=20,
+                 decrease_factor=0.5, pressure=system_pressure, pressure_interval=1.0):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = min(max(initial or min_limit, min_limit), max_limit)
+        self.target_latency = target_latency
+        self.timeout_rate = timeout_rate
+        self.cpu_high = cpu_high
+        self.memory_high = memory_high
+        self.per_host = per_host
+        self.per_host_delay = per_host_delay
+        self.decrease_factor = decrease_factor
+        self.pressure = pressure
+        self.pressure_interval = pressure_interval
+
+        self.active = 0
+        self.peak_active = 0
+        self.host_active = Counter()
+        self._host_next_start = {}
+        self._outcomes = deque(maxlen=window)
+        self._successes = 0
+        self._last_decrease = 0.0
+        self._last_pressure = (0.0, (None, None))
+        self._cond = asyncio.Condition()
+
+        self.increases = 0
+        self.decreases = Counter()
+        self.completed = 0
+        self.timeouts = 0
+        self.history = [(time.monotonic(), self.limit)]
+
+    # ---------------------- Slots ----------------------
+    def _take(self, host):
+        """گرفتن slot (زیر قفل)؛ زمان مجاز شروع روی این هاست را برمی‌گرداند"""
+        self.active += 1
+        self.peak_active = max(self.peak_active, self.active)
+        self.host_active[host] += 1
+        start = max(time.monotonic(), self._host_next_start.get(host, 0.0))
+        self._host_next_start[host] = start + self.per_host_delay
+        return start
+
+    @staticmethod
+    async def _wait_until(start):
+        delay = start - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return time.monotonic()
+
+    async def acquire(self, host):
+        """صبر تا جای خالی در سقف کلی و سقف هاست؛ زمان شروع (monotonic) را برمی‌گرداند"""
+        async with self._cond:
+            await self._cond.wait_for(
+                lambda: self.active < self.limit and self.host_active[host] < self.per_host
+            )
+            start = self._take(host)
+        return await self._wait_until(start)
+
+    def _ready_host(self, pending):
+        # از هاست‌های دارای جای خالی، هاستی که زودتر اجازه شروع دارد
+        ready = [host for host in pending.hosts() if self.host_active[host] < self.per_host]
+        if not ready:
+            return None
+        return min(ready, key=lambda host: self._host_next_start.get(host, 0.0))
+
+    async def acquire_next(self, pending):
+        """
+        کار بعدی pending (HostQueue) که هاستش جای خالی دارد، همراه با slot آن:
+        (host, item, started)، یا None وقتی کاری نمانده است
+        """
+        async with self._cond:
+            await self._cond.wait_for(
+                lambda: not pending or (self.active < self.limit and self._ready_host(pending) is not None)
+            )
+            if not pending:
+                return None
+            host = self._ready_host(pending)
+            item = pending.pop(host)
+            start = self._take(host)
+            if not pending:
+                # workerهای منتظر باید بفهمند کاری نمانده است
+                self._cond.notify_all()
+        return host, item, await self._wait_until(start)
+
+    async def release(self, host, started, seconds, ok=True, timed_out=False):
+        async with self._cond:
+            self.active -= 1
+            self.host_active[host] -= 1
+            if not self.host_active[host]:
+                del self.host_active[host]
+            self._record(started, seconds, ok, timed_out)
+            self._cond.notify_all()
+
+    # ---------------------- AIMD ----------------------
+    def _sample_pressure(self):
+        sampled_at, values = self._last_pressure
+        now = time.monotonic()
+        if now - sampled_at >= self.pressure_interval:
+            values = self.pressure() if self.pressure else (None, None)
+            self._last_pressure = (now, values)
+        return values
+
+    def _decrease(self, reason, started):
+        # کارهایی که پیش از کاهش قبلی شروع شده‌اند همان تراکم قبلی را گزارش می‌کنند و دوباره کم نمی‌کنند
+        if started < self._last_decrease:
+            return
+        new_limit = max(self.min_limit, int(self.limit * self.decrease_factor))
+        self._last_decrease = time.monotonic()
+        self._successes = 0
+        # نرخ تایم‌اوت بعد از کاهش فقط از کارهای شروع‌شده با سقف جدید حساب می‌شود
+        self._outcomes.clear()
+        self.decreases[reason] += 1
+        if new_limit != self.limit:
+            self.limit = new_limit
+            self.history.append((self._last_decrease, self.limit))
+
+    def _record(self, started, seconds, ok, timed_out):
+        self.completed += 1
+        self.timeouts += bool(timed_out)
+        if started >= self._last_decrease:
+            self._outcomes.append(bool(timed_out))
+
+        cpu, memory = self._sample_pressure()
+        if cpu is not None and cpu >= self.cpu_high:
+            self._decrease('cpu', started)
+        elif memory is not None and memory >= self.memory_high:
+            self._decrease('memory', started)
+        elif len(self._outcomes) >= self._outcomes.maxlen // 2 and \
+                sum(self._outcomes) / len(self._outcomes) > self.timeout_rate:
+            self._decrease('timeouts', started)
+        elif seconds > self.target_latency:
+            self._decrease('latency', started)
+        elif ok:
+            # افزایش جمعی: یک واحد بعد از هر limit کار موفق (تقریبا یک دور کامل)
+            self._successes += 1
+            if self._successes >= self.limit and self.limit < self.max_limit:
+                self._successes = 0
+                self.limit += 1
+                self.increases += 1
+                self.history.append((time.monotonic(), self.limit))
+
+    # ---------------------- Metrics ----------------------
+    def as_dict(self):
+        return {
+            'limit': self.limit,
+            'peak_active': self.peak_active,
+            'completed': self.completed,
+            'timeouts': self.timeouts,
+            'increases': self.increases,
+            'decreases': dict(self.decreases),
+            'limits': [limit for _, limit in self.history],
+        }
+
+    def summary(self):
+        stats = self.as_dict()
+        decreases = ', '.join(f"{reason} {count}" for reason, count in sorted(stats['decreases'].items())) or 'none'
+        limits = [limit for _, limit in self.history]
+        return (
+            f"Concurrency: limit {stats['limit']} (range {self.min_limit}-{self.max_limit}, "
+            f"min seen {min(limits)}, max seen {max(limits)}), peak {stats['peak_active']} active, "
+            f"{stats['increases']} increases, decreases: {decreases}; "
+            f"{stats['timeouts']}/{stats['completed']} timed out, per-host cap {self.per_host}"
+        )
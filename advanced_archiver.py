@@ -3,8 +3,12 @@ Parallel Web Archiver - Ultimate Version (Optimized for Speed & Stability)
 """
 
 import os
+import sys
 import asyncio
+import contextlib
+import functools
 import logging
+import time
 import pandas as pd
 from urllib.parse import urlparse
 from rich.progress import Progress, SpinnerColumn, TimeElapsedColumn, TaskID, BarColumn, TimeRemainingColumn
@@ -12,13 +16,44 @@ from rich.logging import RichHandler
 from rich.console import Console
 from typing import List, Dict
 
+from archive_browser import BrowserContextPool, _HAS_PLAYWRIGHT
+from archive_manifest import ArchiveManifest, file_digest
+from adaptive_concurrency import AdaptiveLimiter, HostQueue
+
+try:
+    import psutil
+    _HAS_PSUTIL = True
+except ImportError:
+    _HAS_PSUTIL = False
+
+try:
+    import resource
+    _HAS_RESOURCE = True
+except ImportError:
+    _HAS_RESOURCE = False
+
 # ---------------------- Configuration ----------------------
 INPUT_EXCEL = r"E:\1-python\SEO-BLACKHOLE\2-project\0-scrap-website\good_output\content_results.xlsx"
 OUTPUT_DIR = r"E:\1-python\SEO-BLACKHOLE\2-project\0-scrap-website\OUTPUT"
 SINGLE_FILE_PATH = r"E:\1-python\SEO-BLACKHOLE\2-project\0-scrap-website\node_modules\.bin\single-file.cmd"
-MAX_CONCURRENT_TASKS = 5  # کاهش تعداد برای پایداری بیشتر
+MAX_CONCURRENT_TASKS = 5  # تعداد اولیه کارهای همزمان؛ کنترل‌کننده AIMD آن را بین MIN_WORKERS و MAX_WORKERS تغییر می‌دهد
+MIN_WORKERS = 2
+MAX_WORKERS = max(10, min(32, (os.cpu_count() or 2) * 4))  # سقف همزمانی؛ حداقل همان 10 کارگر قبلی
+PER_HOST_LIMIT = 2  # سقف کار همزمان روی یک دامنه
+TARGET_LATENCY = 90  # ثانیه؛ آرشیو کندتر از این یعنی بار زیاد است
+TIMEOUT_RATE_HIGH = 0.2  # کسر تایم‌اوت در 20 کار اخیر که باعث کاهش همزمانی می‌شود
+CPU_HIGH_PERCENT = 90
+MEMORY_HIGH_PERCENT = 85
 REQUEST_TIMEOUT = 180  # کاهش به 3 دقیقه
-DELAY_BETWEEN_REQUESTS = 1  # کاهش تاخیر به 1 ثانیه
+DELAY_BETWEEN_REQUESTS = 1  # فاصله (ثانیه) بین شروع دو آرشیو از یک دامنه
+ARCHIVE_BACKEND = 'single-file'  # single-file (فایل مستقل با منابع درون‌خطی) | browser (فقط DOM با base؛ منابع از سایت زنده، نیاز به playwright)
+BROWSER_CONTEXTS = 4  # تعداد context های باز مرورگر ماندگار (سقف همزمانی در همین حالت)
+PAGES_PER_CONTEXT = 20  # context بعد از این تعداد صفحه بسته و دوباره ساخته می‌شود
+MAX_INFLIGHT_BYTES = 256 * 1024 * 1024  # سقف حجم صفحه‌هایی که مرورگر ماندگار همزمان در حافظه این پروسس دارد
+VALIDATE_PREFIX_BYTES = 64 * 1024  # برای بررسی <html فقط همین مقدار از ابتدای فایل خوانده می‌شود
+STREAM_CHUNK_BYTES = 64 * 1024
+MANIFEST_FILE = 'archive_manifest.db'  # در OUTPUT_DIR؛ یک ردیف برای هر URL نرمال‌شده
+ARCHIVE_MAX_AGE_DAYS = 7  # آرشیو موفق جوان‌تر از این دوباره گرفته نمی‌شود (None = هرگز)
 # -----------------------------------------------------------
 
 # تنظیمات لاگینگ
@@ -30,6 +65,65 @@ logging.basicConfig(
 logger = logging.getLogger("rich")
 console = Console()
 
+# ---------------------- Memory ----------------------
+class ByteBudget:
+    """
+    سقف مجموع بایت‌های صفحه‌هایی که همزمان در حافظه این پروسس هستند. BrowserContextPool پیش از
+    کپی DOM به پایتون (page.content()) به اندازه حجم واقعی صفحه رزرو می‌کند و اگر سقف پر باشد منتظر
+    می‌ماند. single-file صفحه را در پروسس خودش نگه می‌دارد و تعداد آن‌ها را limiter محدود می‌کند.
+    """
+
+    def __init__(self, limit=MAX_INFLIGHT_BYTES):
+        self.limit = limit
+        self.in_use = 0
+        self.peak = 0
+        self.waits = 0
+        self._cond = asyncio.Condition()
+
+    @contextlib.asynccontextmanager
+    async def reserve(self, size):
+        size = min(size, self.limit)
+        async with self._cond:
+            if self.in_use + size > self.limit:
+                self.waits += 1
+            await self._cond.wait_for(lambda: self.in_use + size <= self.limit)
+            self.in_use += size
+            self.peak = max(self.peak, self.in_use)
+        try:
+            yield
+        finally:
+            async with self._cond:
+                self.in_use -= size
+                self._cond.notify_all()
+
+
+def peak_rss_bytes(children=False):
+    """بیشترین حافظه مقیم پروسس (یا پروسس‌های فرزند تمام‌شده مثل single-file)، None اگر قابل اندازه‌گیری نباشد"""
+    if _HAS_RESOURCE:
+        usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+        # ru_maxrss در لینوکس کیلوبایت و در macOS بایت است
+        return usage.ru_maxrss if sys.platform == 'darwin' else usage.ru_maxrss * 1024
+    if _HAS_PSUTIL and not children:
+        info = psutil.Process().memory_info()
+        return getattr(info, 'peak_wset', None) or info.rss  # peak_wset فقط در ویندوز
+    return None
+
+def memory_report():
+    own = peak_rss_bytes()
+    if own is None:
+        return "اوج حافظه: نامشخص (psutil نصب نیست)"
+    report = f"اوج حافظه (RSS): {own/1024/1024:.1f} MB"
+    children = peak_rss_bytes(children=True)
+    if children:
+        report += f"، بزرگ‌ترین پروسس فرزند: {children/1024/1024:.1f} MB"
+    return report
+
+def is_valid_html_file(output_file: str) -> bool:
+    """وجود <html در ابتدای فایل، با خواندن حداکثر VALIDATE_PREFIX_BYTES بایت"""
+    with open(output_file, 'rb') as f:
+        prefix = f.read(VALIDATE_PREFIX_BYTES)
+    return b'<html' in prefix.lower()
+
 # ---------------------- Core Functions ----------------------
 async def test_single_file():
     """تست اولیه single-file"""
@@ -78,19 +172,17 @@ async def download_url(url: str, output_file: str, progress: Progress, worker_id
                 progress.console.print(
                     f"[Worker {worker_id}] [green]✓ دانلود موفق ({size/1024:.1f} KB): {url}[/green]"
                 )
-                # بررسی محتوای فایل
+                # بررسی محتوای فایل (فقط ابتدای فایل خوانده می‌شود)
                 try:
-                    with open(output_file, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                        if len(content) > 0 and '<html' in content.lower():
-                            progress.console.print(
-                                f"[Worker {worker_id}] [blue]⚡ فایل HTML معتبر است[/blue]"
-                            )
-                        else:
-                            success = False
-                            progress.console.print(
-                                f"[Worker {worker_id}] [red]× محتوای HTML نامعتبر است[/red]"
-                            )
+                    if is_valid_html_file(output_file):
+                        progress.console.print(
+                            f"[Worker {worker_id}] [blue]⚡ فایل HTML معتبر است[/blue]"
+                        )
+                    else:
+                        success = False
+                        progress.console.print(
+                            f"[Worker {worker_id}] [red]× محتوای HTML نامعتبر است[/red]"
+                        )
                 except Exception as e:
                     success = False
                     progress.console.print(
@@ -120,58 +212,142 @@ async def download_url(url: str, output_file: str, progress: Progress, worker_id
         if not success and os.path.exists(output_file):
             os.remove(output_file)
 
-async def download_worker(queue: asyncio.Queue, progress: Progress, task_id: TaskID, worker_id: int) -> None:
-    """کارگر موازی برای دانلود URLها"""
+async def browser_download(pool: BrowserContextPool, url: str, output_file: str, progress: Progress, worker_id: int) -> bool:
+    """ذخیره یک URL با context های مرورگر ماندگار"""
+    progress.console.print(f"[Worker {worker_id}] [yellow]⏳ شروع دانلود: {url}[/yellow]")
+    success = False
+    try:
+        timing = await pool.capture(url, output_file)
+        success = timing['bytes'] > 0 and is_valid_html_file(output_file)
+        if success:
+            progress.console.print(
+                f"[Worker {worker_id}] [green]✓ دانلود موفق ({timing['bytes']/1024:.1f} KB) در {timing['total']:.1f}s "
+                f"(بارگذاری {timing['navigate']:.1f}s): {url}[/green]"
+            )
+        else:
+            progress.console.print(f"[Worker {worker_id}] [red]× صفحه خالی است: {url}[/red]")
+        return success
+
+    except Exception as e:
+        progress.console.print(f"[Worker {worker_id}] [red]× خطا: {str(e)}[/red]")
+        if pool.connected:
+            return False
+
+    finally:
+        if not success and os.path.exists(output_file):
+            os.remove(output_file)
+
+    # Chromium از دست رفت (capture بعدی آن را دوباره راه می‌اندازد یا BrowserUnavailable می‌دهد)؛
+    # این URL با single-file ذخیره می‌شود
+    progress.console.print(f"[Worker {worker_id}] [yellow]مرورگر در دسترس نیست، استفاده از single-file: {url}[/yellow]")
+    return await download_url(url, output_file, progress, worker_id)
+
+async def start_browser_pool(budget: ByteBudget = None):
+    """مرورگر ماندگار طبق ARCHIVE_BACKEND، یا None برای استفاده از single-file"""
+    if ARCHIVE_BACKEND != 'browser':
+        return None
+    if not _HAS_PLAYWRIGHT:
+        console.print("[yellow]playwright نصب نیست؛ از single-file استفاده می‌شود[/yellow]")
+        return None
+    try:
+        pool = await BrowserContextPool(BROWSER_CONTEXTS, PAGES_PER_CONTEXT, REQUEST_TIMEOUT, budget=budget).start()
+        console.print(f"[cyan]مرورگر ماندگار با {BROWSER_CONTEXTS} context آماده شد ({pool.startup_seconds:.1f}s)[/cyan]")
+        return pool
+    except Exception as e:
+        console.print(f"[yellow]راه‌اندازی مرورگر ماندگار ناموفق بود، از single-file استفاده می‌شود: {str(e)}[/yellow]")
+        return None
+
+async def download_worker(pending: HostQueue, limiter: AdaptiveLimiter, progress: Progress, task_id: TaskID, worker_id: int,
+                          archive=download_url, manifest: ArchiveManifest = None, backend: str = 'single-file') -> None:
+    """کارگر موازی برای دانلود URLها؛ limiter کار بعدی را از هاستی با جای خالی برمی‌دارد"""
     worker_task = progress.add_task(f"[blue]Worker {worker_id}[/blue]", total=None)
     
     while True:
+        batch = None
         try:
-            batch = await queue.get()
-            if not batch:
+            picked = await limiter.acquire_next(pending)
+            if picked is None:
                 break
+            host, batch, slot_started = picked
                 
             url = batch['url']
-            progress.update(worker_task, description=f"[blue]Worker {worker_id}:[/blue] {urlparse(url).netloc}")
+            progress.update(worker_task, description=f"[blue]Worker {worker_id}:[/blue] {host}")
             
-            domain = urlparse(url).netloc.replace('.', '_')
-            output_file = os.path.join(OUTPUT_DIR, f"{domain}.html")
+            # نام فایل از manifest (دامنه + hash URL)؛ صفحه‌های مختلف یک دامنه روی هم نوشته نمی‌شوند
+            output_file = os.path.join(OUTPUT_DIR, batch['file'])
+            # آرشیو در فایل موقت نوشته می‌شود و فقط بعد از موفقیت جای آرشیو قبلی را می‌گیرد؛
+            # تلاش ناموفق برای تازه‌سازی، آرشیو سالم قبلی را پاک نمی‌کند
+            part_file = output_file + '.part'
             
-            success = await download_url(url, output_file, progress, worker_id)
+            started = time.perf_counter()
+            success = False
+            try:
+                success = await archive(url, part_file, progress, worker_id)
+            finally:
+                seconds = time.perf_counter() - started
+                # هر دو مسیر آرشیو بعد از REQUEST_TIMEOUT قطع می‌شوند؛ شکست در این زمان یعنی تایم‌اوت
+                timed_out = not success and seconds >= REQUEST_TIMEOUT
+                await limiter.release(host, slot_started, seconds, success, timed_out)
+                if success:
+                    os.replace(part_file, output_file)
+                elif os.path.exists(part_file):
+                    os.remove(part_file)
             batch['success'] = success
+
+            size, digest = 0, None
+            if success:
+                size, digest = await asyncio.to_thread(file_digest, output_file)
+            if manifest:
+                manifest.record(batch['key'], url, batch['file'], success, seconds, backend, size, digest)
             
             if success:
                 progress.console.print(f"[Worker {worker_id}] ✓ پردازش {url} تمام شد")
             else:
                 progress.console.print(f"[Worker {worker_id}] × پردازش {url} با خطا مواجه شد")
             
-            await asyncio.sleep(DELAY_BETWEEN_REQUESTS)
-            
         except asyncio.CancelledError:
             break
         finally:
-            if 'batch' in locals() and batch:
-                queue.task_done()
+            if batch:
                 progress.update(task_id, advance=1)
 
 async def parallel_download(urls: List[str]) -> None:
     """مدیریت دانلود موازی"""
-    if not await test_single_file():
+    manifest = ArchiveManifest(os.path.join(OUTPUT_DIR, MANIFEST_FILE))
+    max_age = ARCHIVE_MAX_AGE_DAYS * 86400 if ARCHIVE_MAX_AGE_DAYS is not None else None
+    todo = manifest.pending(urls, OUTPUT_DIR, max_age)
+    console.print(f"• [cyan]{len(todo)} URL برای آرشیو، بقیه آرشیو تازه دارند یا تکراری‌اند[/cyan]")
+    if not todo:
+        manifest.close()
         return
+
+    budget = ByteBudget()
+    pool = await start_browser_pool(budget)
+    if pool:
+        archive = functools.partial(browser_download, pool)
+    else:
+        if not await test_single_file():
+            manifest.close()
+            return
+        archive = download_url
+    backend = 'browser' if pool else 'single-file'
         
-    queue = asyncio.Queue()
-    results = []
-    
-    MAX_WORKERS = 10  # افزایش به 10 ورکر
-    
-    # تبدیل URLها به batch
-    for url in urls:
-        batch = {'url': url, 'success': False}
-        results.append(batch)
-        await queue.put(batch)
+    pending = HostQueue()
+    run_started = time.time()
+    # با مرورگر ماندگار همزمانی واقعی حداکثر تعداد context هاست؛ سقف بالاتر فقط انتظار برای context
+    # را به زمان هر صفحه اضافه می‌کند و limiter آن را کندی سرور می‌بیند
+    max_workers = min(MAX_WORKERS, pool.contexts) if pool else MAX_WORKERS
+    # max_workers کارگر ساخته می‌شوند ولی فقط به اندازه سقف فعلی limiter همزمان کار می‌کنند
+    limiter = AdaptiveLimiter(
+        min_limit=min(MIN_WORKERS, max_workers), max_limit=max_workers, initial=MAX_CONCURRENT_TASKS,
+        target_latency=TARGET_LATENCY, timeout_rate=TIMEOUT_RATE_HIGH,
+        cpu_high=CPU_HIGH_PERCENT, memory_high=MEMORY_HIGH_PERCENT,
+        per_host=PER_HOST_LIMIT, per_host_delay=DELAY_BETWEEN_REQUESTS
+    )
     
-    # اضافه کردن سیگنال‌های پایان
-    for _ in range(MAX_WORKERS):
-        await queue.put(None)
+    # تبدیل URLها به batch، در صف جدای هر هاست
+    for url_key, url, file_name in todo:
+        pending.put(urlparse(url).netloc, {'url': url, 'key': url_key, 'file': file_name, 'success': False})
     
     with Progress(
         SpinnerColumn(),
@@ -186,51 +362,84 @@ async def parallel_download(urls: List[str]) -> None:
     ) as progress:
         total_task = progress.add_task(
             "[bold magenta]⚡ پیشرفت کلی[/bold magenta]",
-            total=len(urls)
+            total=len(todo)
         )
         
         workers = [
             asyncio.create_task(
-                download_worker(queue, progress, total_task, i+1)
+                download_worker(pending, limiter, progress, total_task, i+1, archive, manifest, backend)
             ) 
-            for i in range(MAX_WORKERS)
+            for i in range(max_workers)
         ]
         
-        await asyncio.gather(*workers)
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            if pool:
+                await pool.close()
         
-        # گزارش نهایی با جزئیات بیشتر
-        successful = sum(1 for r in results if r['success'])
-        total_size = sum(os.path.getsize(os.path.join(OUTPUT_DIR, f"{urlparse(r['url']).netloc.replace('.', '_')}.html")) 
-                        for r in results if r['success'])
+        # گزارش نهایی از روی manifest (بدون stat دوباره فایل‌ها)
+        report = manifest.report(run_started)
+        manifest.close()
         
         progress.console.print(f"\n[bold]📊 گزارش نهایی:[/bold]")
-        progress.console.print(f"✓ تعداد فایل‌های دانلود شده: {successful}")
-        progress.console.print(f"× تعداد فایل‌های ناموفق: {len(urls) - successful}")
-        if successful > 0:
-            progress.console.print(f"💾 حجم کل دانلود: {total_size/1024/1024:.2f} MB")
+        progress.console.print(f"✓ تعداد فایل‌های دانلود شده: {report['ok']}")
+        progress.console.print(f"× تعداد فایل‌های ناموفق: {report['failed']}")
+        if report['ok'] > 0:
+            progress.console.print(f"💾 حجم کل دانلود: {report['total_size']/1024/1024:.2f} MB")
+            progress.console.print(
+                f"⏱ زمان هر صفحه: میانه {report['median_seconds']:.1f}s، p95 {report['p95_seconds']:.1f}s ({backend})"
+            )
+        if pool:
+            progress.console.print(f"[cyan]{pool.summary()}[/cyan]")
+        progress.console.print(f"[cyan]{limiter.summary()}[/cyan]")
+        if pool:
+            progress.console.print(
+                f"🧠 {memory_report()}؛ بیشترین حجم صفحه‌های همزمان در حافظه {budget.peak/1024/1024:.1f} MB "
+                f"از {budget.limit/1024/1024:.0f} MB ({budget.waits} بار انتظار برای سقف)"
+            )
+        else:
+            progress.console.print(f"🧠 {memory_report()}")
         
-        if len(urls) - successful > 0:
+        if report['failed_urls']:
             progress.console.print("\n[yellow]❌ لینک‌های ناموفق:[/yellow]")
-            for r in results:
-                if not r['success']:
-                    progress.console.print(f"• {r['url']}")
+            for url in report['failed_urls']:
+                progress.console.print(f"• {url}")
 
 def archive_pages(urls, output_dir):
     """
     دریافت لیستی از URLها و دانلود کامل صفحات به صورت HTML در پوشه خروجی.
     """
-    import requests
     import os
     from datetime import datetime
+    from http_session import get_session, session_stats
+    from page_cache import get_page_cache
 
+    session = get_session()
+    cache = get_page_cache()
     for url in urls:
         try:
-            response = requests.get(url, timeout=30)
-            response.raise_for_status()
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             filename = os.path.join(output_dir, f"archive_{url.split('//')[-1].replace('/', '_')}_{timestamp}.html")
-            with open(filename, 'w', encoding='utf-8') as f:
-                f.write(response.text)
+            # فایل موقت فقط بعد از دریافت کامل نام نهایی را می‌گیرد؛ قطع اتصال فایل ناقص باقی نمی‌گذارد
+            part_file = filename + '.part'
+            try:
+                if cache:
+                    # صفحه تازه از کش و صفحه کهنه با درخواست شرطی (304) دریافت می‌شود
+                    html = cache.fetch(session, url, timeout=30).html
+                    with open(part_file, 'w', encoding='utf-8') as f:
+                        f.write(html)
+                else:
+                    # بدنه تکه‌تکه روی دیسک نوشته می‌شود و کل صفحه در حافظه نمی‌ماند
+                    with session.get(url, timeout=30, stream=True) as response:
+                        response.raise_for_status()
+                        with open(part_file, 'wb') as f:
+                            for chunk in response.iter_content(chunk_size=STREAM_CHUNK_BYTES):
+                                f.write(chunk)
+                os.replace(part_file, filename)
+            finally:
+                if os.path.exists(part_file):
+                    os.remove(part_file)
             if os.path.exists(filename):
                 console.print(f"[green]آرشیو انجام شد: [yellow]{url}[/yellow] -> {filename}[/green]")
             else:
@@ -238,6 +447,11 @@ def archive_pages(urls, output_dir):
         except Exception as e:
             console.print(f"[red]Error archiving [yellow]{url}[/yellow]: {str(e)}[/red]")
 
+    console.print(f"[cyan]{session_stats().summary()}[/cyan]")
+    if cache:
+        console.print(f"[cyan]{cache.summary()}[/cyan]")
+    console.print(f"[cyan]{memory_report()}[/cyan]")
+
 # ---------------------- Main Execution ----------------------
 def main() -> None:
     """اجرای اصلی برنامه"""
@@ -247,8 +461,8 @@ def main() -> None:
         console.print(f"• [cyan]تعداد URLهای شناسایی شده: {len(urls)}[/cyan]")
         
         os.makedirs(OUTPUT_DIR, exist_ok=True)
+        # هر URL یک بار آرشیو می‌شود (قبلا archive_pages همه را دوباره دانلود می‌کرد)
         asyncio.run(parallel_download(urls))
-        archive_pages(urls, OUTPUT_DIR)
     
     except Exception as e:
         console.print(f"• [bold red]خطای سیستمی: {str(e)}[/bold red]")
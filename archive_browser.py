@@ -0,0 +1,228 @@
+"""
+Persistent headless browser contexts for advanced_archiver
+
+One Chromium process is started once (Playwright) and a fixed number of browser contexts are
+kept open and handed out to archive workers, so a capture costs one navigation instead of a
+Node and Chromium start-up per URL. A context is closed and replaced after pages_per_context
+captures (or after an error) so memory does not grow over long runs. If Chromium itself dies it
+is relaunched (up to max_relaunches times); after that capture raises BrowserUnavailable. The saved file is the
+rendered DOM (page.content()) with a <base> tag, so relative assets keep resolving against the
+live site. That is a different archive format from the single-file CLI (assets inlined), so this
+backend is opt-in (ARCHIVE_BACKEND = 'browser' in advanced_archiver).
+"""
+
+import asyncio
+import contextlib
+import re
+import time
+from html import escape
+
+try:
+    from playwright.async_api import async_playwright
+    _HAS_PLAYWRIGHT = True
+except ImportError:
+    _HAS_PLAYWRIGHT = False
+
+_HEAD_RE = re.compile(r'<head(\s[^>]*)?>', re.IGNORECASE)
+_HTML_RE = re.compile(r'<html(\s[^>]*)?>', re.IGNORECASE)
+_DOCTYPE_RE = re.compile(r'<!doctype[^>]*>', re.IGNORECASE)
+
+# حجم UTF-8 صفحه داخل مرورگر، پیش از کپی آن به پایتون
+_DOCUMENT_BYTES_JS = "() => new Blob([document.documentElement.outerHTML]).size"
+
+
+class BrowserUnavailable(RuntimeError):
+    """Chromium از دست رفته و دوباره بالا نیامد (یا سقف راه‌اندازی دوباره پر شده)"""
+
+
+def _base_position(html):
+    """
+    محل درج <base href>: بعد از تگ head، یا بدون head بعد از تگ html یا doctype
+    (base پیش از doctype صفحه را به quirks mode می‌برد)؛ None اگر صفحه خودش base دارد
+    """
+    if re.search(r'<base\s', html[:4096], re.IGNORECASE):
+        return None
+    for pattern in (_HEAD_RE, _HTML_RE, _DOCTYPE_RE):
+        match = pattern.search(html)
+        if match:
+            return match.end()
+    return 0
+
+
+def _write_file(output_file, html, url=None, chunk_chars=1024 * 1024):
+    """
+    نوشتن HTML (با base) به صورت تکه‌تکه، بدون ساختن کپی کامل صفحه یا bytes کامل آن در حافظه؛
+    حجم فایل را برمی‌گرداند
+    """
+    position = _base_position(html) if url else None
+    with open(output_file, 'wb') as f:
+        start = 0
+        if position is not None:
+            f.write(html[:position].encode('utf-8'))
+            f.write(f'<base href="{escape(url, quote=True)}">'.encode('utf-8'))
+            start = position
+        for offset in range(start, len(html), chunk_chars):
+            f.write(html[offset:offset + chunk_chars].encode('utf-8'))
+        return f.tell()
+
+
+class BrowserContextPool:
+    """
+    context های ماندگار روی یک Chromium برای ذخیره صفحه‌ها.
+    capture منتظر یک context آزاد می‌ماند، صفحه را باز و ذخیره می‌کند و زمان هر مرحله را برمی‌گرداند.
+    """
+
+    def __init__(self, contexts=4, pages_per_context=20, timeout=180, wait_until='load', budget=None,
+                 max_relaunches=3):
+        self.contexts = contexts
+        self.pages_per_context = pages_per_context
+        self.timeout = timeout
+        self.wait_until = wait_until
+        # budget (مثل ByteBudget در advanced_archiver): reserve(size) به اندازه حجم واقعی هر صفحه
+        self.budget = budget
+        self.max_relaunches = max_relaunches
+        self.browser = None
+        self.timings = []
+        self.recycled = 0
+        self.relaunches = 0
+        self.failures = 0
+        self.startup_seconds = 0.0
+        self._playwright = None
+        self._idle = None
+        # هر راه‌اندازی Chromium یک نسل تازه است؛ context های نسل قبل در استفاده بعدی عوض می‌شوند
+        self._generation = 0
+        self._launch_lock = None
+
+    async def start(self):
+        if not _HAS_PLAYWRIGHT:
+            raise RuntimeError("playwright is not installed")
+        start = time.perf_counter()
+        self._playwright = await async_playwright().start()
+        await self._launch()
+        self._launch_lock = asyncio.Lock()
+        self._idle = asyncio.Queue()
+        for index in range(self.contexts):
+            await self._idle.put(await self._new_slot(index))
+        self.startup_seconds = time.perf_counter() - start
+        return self
+
+    async def _launch(self):
+        self.browser = await self._playwright.chromium.launch(headless=True)
+        self._generation += 1
+
+    @property
+    def connected(self):
+        """Chromium زنده است و pool قابل استفاده است"""
+        return self.browser is not None and self.browser.is_connected()
+
+    async def _ensure_browser(self):
+        """راه‌اندازی دوباره Chromium اگر از دست رفته باشد (مثلا crash یا kill شدن پروسس)"""
+        async with self._launch_lock:
+            if self.connected:
+                return
+            if self.relaunches >= self.max_relaunches:
+                raise BrowserUnavailable(f"Chromium died {self.relaunches + 1} times, not relaunching")
+            self.relaunches += 1
+            try:
+                await self.browser.close()
+            except Exception:
+                pass
+            try:
+                await self._launch()
+            except Exception as e:
+                self.relaunches = self.max_relaunches
+                raise BrowserUnavailable(f"Could not relaunch Chromium: {str(e)}") from e
+
+    async def _new_slot(self, index):
+        context = await self.browser.new_context(ignore_https_errors=True)
+        return {'index': index, 'context': context, 'pages': 0, 'generation': self._generation}
+
+    async def _recycle(self, slot):
+        try:
+            await slot['context'].close()
+        except Exception:
+            pass
+        self.recycled += 1
+        return await self._new_slot(slot['index'])
+
+    @staticmethod
+    async def _close_page(slot, page):
+        slot['pages'] += 1
+        await page.close()
+
+    async def capture(self, url, output_file):
+        """ذخیره صفحه در output_file؛ dict زمان‌ها (ثانیه) و حجم فایل. خطاها به فراخواننده می‌رسند."""
+        slot = await self._idle.get()
+        try:
+            await self._ensure_browser()
+            if slot['pages'] >= self.pages_per_context or slot['generation'] != self._generation:
+                slot = await self._recycle(slot)
+            started = time.perf_counter()
+            async with contextlib.AsyncExitStack() as stack:
+                page = await slot['context'].new_page()
+                stack.push_async_callback(self._close_page, slot, page)
+                await page.goto(url, wait_until=self.wait_until, timeout=self.timeout * 1000)
+                navigated = time.perf_counter()
+                if self.budget is not None:
+                    # رزرو به اندازه حجم واقعی صفحه تا پایان نوشتن؛ HTML تا آن زمان در حافظه است
+                    await stack.enter_async_context(self.budget.reserve(await page.evaluate(_DOCUMENT_BYTES_JS)))
+                html = await page.content()
+                final_url = page.url
+                captured = time.perf_counter()
+                size = await asyncio.to_thread(_write_file, output_file, html, final_url)
+                del html
+                finished = time.perf_counter()
+            timing = {
+                'url': url,
+                'context': slot['index'],
+                'navigate': navigated - started,
+                'capture': captured - navigated,
+                'write': finished - captured,
+                'total': finished - started,
+                'bytes': size,
+            }
+            self.timings.append(timing)
+            return timing
+        except Exception:
+            self.failures += 1
+            # context بعد از خطا (مثلا crash یا timeout) در استفاده بعدی عوض می‌شود
+            slot['pages'] = self.pages_per_context
+            raise
+        finally:
+            self._idle.put_nowait(slot)
+
+    async def close(self):
+        if self._idle is not None:
+            while not self._idle.empty():
+                slot = self._idle.get_nowait()
+                try:
+                    await slot['context'].close()
+                except Exception:
+                    pass
+        if self.browser is not None:
+            await self.browser.close()
+        if self._playwright is not None:
+            await self._playwright.stop()
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    def summary(self):
+        if not self.timings:
+            return f"Browser pool: no pages captured ({self.failures} failures)"
+        totals = sorted(timing['total'] for timing in self.timings)
+        count = len(totals)
+
+        def mean(key):
+            return sum(timing[key] for timing in self.timings) / count
+
+        return (
+            f"Browser pool: {count} pages with {self.contexts} contexts, "
+            f"{totals[count // 2]:.2f}s median / {totals[min(int(count * 0.95), count - 1)]:.2f}s p95 per page "
+            f"(navigate {mean('navigate'):.2f}s, capture {mean('capture'):.2f}s, write {mean('write'):.3f}s), "
+            f"{self.recycled} contexts recycled, {self.relaunches} browser relaunches, {self.failures} failures, "
+            f"startup {self.startup_seconds:.1f}s"
+        )
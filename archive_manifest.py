@@ -0,0 +1,167 @@
+"""
+SQLite manifest of archived pages for advanced_archiver
+
+One row per normalized URL with the archive file name, content hash, size, duration and
+status of its latest attempt. The archiver skips URLs whose archive is fresh, writes each URL
+to a collision-free file name, and builds its final report from the manifest rows instead of
+stat-ing every file again.
+"""
+
+import hashlib
+import os
+import sqlite3
+import time
+from collections import namedtuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+ManifestEntry = namedtuple(
+    'ManifestEntry', 'url_key url file_name content_hash size duration status backend attempts archived_at'
+)
+
+
+def normalize_url(url):
+    """
+    کلید یکتای URL: scheme و host با حروف کوچک، بدون پورت پیش‌فرض و fragment،
+    پارامترهای query مرتب‌شده و مسیر خالی به جای '/'
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, parts.path or '/', query, ''))
+
+
+def archive_file_name(url_key):
+    """نام فایل بدون تداخل: دامنه برای خوانایی و hash کلید برای یکتایی"""
+    host = urlsplit(url_key).netloc.replace('.', '_').replace(':', '_')
+    return f"{host}_{hashlib.sha1(url_key.encode('utf-8')).hexdigest()[:12]}.html"
+
+
+def file_digest(path, chunk_size=1024 * 1024):
+    """(حجم, sha256) فایل با خواندن تکه‌تکه"""
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+            size += len(chunk)
+    return size, digest.hexdigest()
+
+
+class ArchiveManifest:
+    """
+    جدول archives با کلید URL نرمال‌شده.
+    pending فهرست کارهای لازم را می‌دهد و record نتیجه هر تلاش را ثبت می‌کند.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS archives (
+                url_key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                file_name TEXT NOT NULL,
+                content_hash TEXT,
+                size INTEGER NOT NULL DEFAULT 0,
+                duration REAL NOT NULL DEFAULT 0,
+                status TEXT NOT NULL,
+                backend TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                archived_at REAL,
+                attempted_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_archives_attempted ON archives(attempted_at);
+        ''')
+        self.conn.commit()
+
+    def get(self, url_key):
+        row = self.conn.execute(
+            '''SELECT url_key, url, file_name, content_hash, size, duration, status, backend, attempts, archived_at
+               FROM archives WHERE url_key = ?''',
+            (url_key,)
+        ).fetchone()
+        return ManifestEntry(*row) if row else None
+
+    def pending(self, urls, output_dir, max_age=None):
+        """
+        [(url_key, url, file_name)] برای URLهایی که آرشیو تازه ندارند؛ هر URL نرمال‌شده یک بار.
+        آرشیو موفق جوان‌تر از max_age ثانیه که فایلش هنوز هست دوباره انجام نمی‌شود.
+        """
+        now = time.time()
+        todo = []
+        seen = set()
+        for url in urls:
+            url_key = normalize_url(url)
+            if url_key in seen:
+                continue
+            seen.add(url_key)
+            entry = self.get(url_key)
+            if (
+                entry and entry.status == 'ok'
+                and (max_age is None or now - entry.archived_at < max_age)
+                and os.path.exists(os.path.join(output_dir, entry.file_name))
+            ):
+                continue
+            todo.append((url_key, url, entry.file_name if entry else archive_file_name(url_key)))
+        return todo
+
+    def record(self, url_key, url, file_name, success, duration, backend=None, size=0, content_hash=None):
+        """ثبت نتیجه یک تلاش؛ تلاش ناموفق اطلاعات آرشیو موفق قبلی را پاک نمی‌کند"""
+        now = time.time()
+        if success:
+            self.conn.execute(
+                '''INSERT INTO archives (url_key, url, file_name, content_hash, size, duration, status, backend,
+                                         attempts, archived_at, attempted_at)
+                   VALUES (?, ?, ?, ?, ?, ?, 'ok', ?, 1, ?, ?)
+                   ON CONFLICT(url_key) DO UPDATE SET
+                       url = excluded.url, file_name = excluded.file_name, content_hash = excluded.content_hash,
+                       size = excluded.size, duration = excluded.duration, status = 'ok', backend = excluded.backend,
+                       attempts = attempts + 1, archived_at = excluded.archived_at, attempted_at = excluded.attempted_at''',
+                (url_key, url, file_name, content_hash, size, duration, backend, now, now)
+            )
+        else:
+            self.conn.execute(
+                '''INSERT INTO archives (url_key, url, file_name, duration, status, backend, attempts, attempted_at)
+                   VALUES (?, ?, ?, ?, 'failed', ?, 1, ?)
+                   ON CONFLICT(url_key) DO UPDATE SET
+                       duration = excluded.duration, status = 'failed', backend = excluded.backend,
+                       attempts = attempts + 1, attempted_at = excluded.attempted_at''',
+                (url_key, url, file_name, duration, backend, now)
+            )
+        self.conn.commit()
+
+    def report(self, since):
+        """خلاصه تلاش‌های بعد از زمان since از روی ردیف‌های manifest (بدون خواندن فایل‌ها)"""
+        ok, failed, total_size = self.conn.execute(
+            '''SELECT COALESCE(SUM(status = 'ok'), 0), COALESCE(SUM(status = 'failed'), 0),
+                      COALESCE(SUM(CASE WHEN status = 'ok' THEN size END), 0)
+               FROM archives WHERE attempted_at >= ?''',
+            (since,)
+        ).fetchone()
+        durations = [row[0] for row in self.conn.execute(
+            "SELECT duration FROM archives WHERE attempted_at >= ? AND status = 'ok' ORDER BY duration", (since,)
+        )]
+        failed_urls = [row[0] for row in self.conn.execute(
+            "SELECT url FROM archives WHERE attempted_at >= ? AND status = 'failed' ORDER BY url", (since,)
+        )]
+        return {
+            'ok': ok,
+            'failed': failed,
+            'total_size': total_size,
+            'median_seconds': durations[len(durations) // 2] if durations else 0.0,
+            'p95_seconds': durations[min(int(len(durations) * 0.95), len(durations) - 1)] if durations else 0.0,
+            'failed_urls': failed_urls,
+        }
+
+    def files_by_key(self):
+        """{url_key: file_name} آرشیوهای موفق"""
+        return dict(self.conn.execute("SELECT url_key, file_name FROM archives WHERE status = 'ok'"))
+
+    def close(self):
+        self.conn.close()
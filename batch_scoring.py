@@ -0,0 +1,177 @@
+"""
+Vectorized content scoring over a columnar feature table
+
+score_features computes the same score as ContentScraper.calculate_content_score for every
+row of a feature frame at once (NumPy over columns instead of one dict at a time), with the
+same CONFIG['SCORE_WEIGHTS'] or any other weights, so stored rows can be re-weighted and
+re-ranked without re-extracting pages.
+
+Usage:
+    python batch_scoring.py --keyword "seo tools" --top 20
+    python batch_scoring.py --write            # store the scores in urls.content_score
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from config import CONFIG, get_logger
+
+logger = get_logger(__name__)
+
+HEADING_COLUMNS = ['h1', 'h2', 'h3', 'h4', 'h5', 'h6']
+FEATURE_COLUMNS = ['google_rank', 'has_meta'] + HEADING_COLUMNS + ['content_length', 'table_count']
+
+# ویژگی‌های ردیف‌های urls؛ تعداد عنوان هر سطح از url_headings
+FEATURES_QUERY = f'''
+    SELECT
+        u.id,
+        u.keyword_id,
+        u.url,
+        u.google_rank,
+        COALESCE(u.meta_description, '') != '' AS has_meta,
+        {', '.join(f"COALESCE(h.{tag}, 0) AS {tag}" for tag in HEADING_COLUMNS)},
+        COALESCE(u.content_length, 0) AS content_length,
+        COALESCE(u.table_count, 0) AS table_count
+    FROM urls u
+    LEFT JOIN (
+        SELECT url_id, {', '.join(f"SUM(level = {level}) AS h{level}" for level in range(1, 7))}
+        FROM url_headings
+        GROUP BY url_id
+    ) h ON h.url_id = u.id
+'''
+
+
+def content_features(content, google_rank=None):
+    """ردیف ویژگی برای یک محتوای استخراج‌شده (همان ورودی‌هایی که calculate_content_score می‌خواند)"""
+    row = {
+        'google_rank': content.get('google_rank') if google_rank is None else google_rank,
+        'has_meta': bool(content.get('meta_description')),
+        'content_length': len(content.get('main_content', '')),
+        'table_count': len(content.get('tables', [])),
+    }
+    for tag in HEADING_COLUMNS:
+        row[tag] = len(content.get(tag, []))
+    return row
+
+
+def features_frame(contents):
+    """DataFrame ستونی ویژگی‌ها از لیست محتواها"""
+    return pd.DataFrame([content_features(content) for content in contents], columns=FEATURE_COLUMNS)
+
+
+def load_features(conn, keyword_id=None):
+    """ویژگی‌های ردیف‌های urls (همه یا یک کلمه کلیدی) به صورت DataFrame"""
+    query = FEATURES_QUERY
+    params = ()
+    if keyword_id:
+        query += ' WHERE u.keyword_id = ?'
+        params = (keyword_id,)
+    return pd.read_sql_query(query, conn, params=params)
+
+
+def _round_like_python(scores):
+    """
+    round(x, 2) پایتون برای آرایه. np.round فقط وقتی با round پایتون فرق دارد که x*100
+    تقریبا روی نیمه باشد؛ همان چند مقدار با round خود پایتون گرد می‌شوند.
+    """
+    integral = np.floor(scores) == scores
+    if integral.all():
+        return scores
+    rounded = np.round(scores, 2)
+    scaled = np.abs(scores * 100)
+    ties = np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6)
+    for i in ties:
+        rounded[i] = round(float(scores[i]), 2)
+    return rounded
+
+
+def score_features(features, weights=None):
+    """
+    امتیاز همه ردیف‌ها با عملیات برداری؛ برابر calculate_content_score برای هر ردیف.
+    جمع‌ها به همان ترتیب تابع اسکالر انجام می‌شوند تا نتیجه اعشاری هم بیت به بیت یکی باشد.
+    ردیف بدون رتبه (NULL) مثل تابع اسکالر امتیاز 0 می‌گیرد.
+    """
+    weights = weights or CONFIG['SCORE_WEIGHTS']
+    rank = features['google_rank'].to_numpy(dtype='float64', na_value=np.nan)
+
+    score = (weights['rank_base'] - rank) * weights['rank']
+    score = score + np.where(features['has_meta'].to_numpy(dtype=bool), weights['meta_description'], 0)
+    for tag, weight in weights['headings'].items():
+        score = score + features[tag].to_numpy(dtype='float64') * weight
+
+    length = features['content_length'].to_numpy(dtype='float64')
+    if weights['content_length']:
+        conditions = [length > threshold for threshold, _ in weights['content_length']]
+        bonuses = [bonus for _, bonus in weights['content_length']]
+        # np.select اولین شرط برقرار را انتخاب می‌کند، مثل break در حلقه تابع اسکالر
+        score = score + np.select(conditions, bonuses, 0)
+
+    score = score + features['table_count'].to_numpy(dtype='float64') * weights['table']
+    score = np.where(np.isnan(rank), 0.0, score)
+    return pd.Series(_round_like_python(score), index=features.index, name='content_score')
+
+
+def rank_features(features, weights=None):
+    """افزودن ستون score و score_rank (رتبه امتیاز داخل هر کلمه کلیدی) و مرتب‌سازی"""
+    ranked = features.copy()
+    ranked['score'] = score_features(ranked, weights)
+    group = ranked.groupby('keyword_id')['score'] if 'keyword_id' in ranked.columns else ranked['score']
+    ranked['score_rank'] = group.rank(ascending=False, method='min').astype('int64')
+    sort_columns = ['keyword_id', 'score_rank'] if 'keyword_id' in ranked.columns else ['score_rank']
+    return ranked.sort_values(sort_columns, kind='stable')
+
+
+def write_scores(db_manager, ids, scores):
+    """ذخیره امتیازها در urls.content_score به صورت دسته‌ای؛ تعداد ردیف‌ها را برمی‌گرداند"""
+    rows = list(zip(scores.tolist(), ids.tolist()))
+    batch_size = CONFIG['DB_BATCH_SIZE'] * 20
+    with db_manager.lock:
+        try:
+            for start in range(0, len(rows), batch_size):
+                db_manager.cursor.executemany(
+                    "UPDATE urls SET content_score = ? WHERE id = ?", rows[start:start + batch_size]
+                )
+            db_manager.conn.commit()
+            return len(rows)
+        except Exception as e:
+            logger.error(f"Error writing scores: {str(e)}")
+            db_manager.conn.rollback()
+            return 0
+
+
+def main():
+    from database_manager import DatabaseManager
+
+    parser = argparse.ArgumentParser(description="Re-score stored rows from their feature columns")
+    parser.add_argument('--db', default=None, help="database path (default: CONFIG['DB_PATH'])")
+    parser.add_argument('--keyword', default=None, help='only rows of this keyword')
+    parser.add_argument('--top', type=int, default=10, help='rows to print per keyword')
+    parser.add_argument('--write', action='store_true', help='store the scores in urls.content_score')
+    args = parser.parse_args()
+
+    db_manager = DatabaseManager(args.db)
+    try:
+        keyword_id = None
+        if args.keyword:
+            row = db_manager.cursor.execute('SELECT id FROM keywords WHERE keyword = ?', (args.keyword,)).fetchone()
+            if not row:
+                logger.error(f"Keyword not found: {args.keyword}")
+                return
+            keyword_id = row[0]
+        with db_manager.lock:
+            features = load_features(db_manager.conn, keyword_id)
+        ranked = rank_features(features)
+        print(ranked.groupby('keyword_id').head(args.top)[
+            ['keyword_id', 'score_rank', 'score', 'google_rank', 'url']
+        ].to_string(index=False))
+        if args.write:
+            written = write_scores(db_manager, ranked['id'], ranked['score'])
+            logger.info(f"Stored {written} scores")
+    finally:
+        db_manager.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1000 @@
+"""
+Performance benchmarks for the scraping pipeline
+
+Usage:
+    python benchmarks.py fetch --urls 200 --hosts 4 --latency 0.1
+    python benchmarks.py session --requests 200
+    python benchmarks.py parse --corpus good_output/page_cache/blobs
+    python benchmarks.py main-text --depths 10 100 400 1000
+    python benchmarks.py tables --tables 40 --rows 30
+    python benchmarks.py excel --rows 20 200 2000
+    python benchmarks.py db-insert --rows 5000
+    python benchmarks.py db-query --rows 10000000
+    python benchmarks.py page-store --pages 2000
+    python benchmarks.py scoring --rows 1000000
+    python benchmarks.py assembly --keywords 10000
+    python benchmarks.py serp-pool --keywords 20 --workers 1 2 4
+    python benchmarks.py serp-waits --keywords 5
+    python benchmarks.py serp-parse --pages 200
+    python benchmarks.py archive-aimd --jobs 400 --capacity 12
+    python benchmarks.py logging --records 20000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from local_server import LocalTestServer
+
+
+def bench_fetch(urls=200, hosts=4, latency=0.1, per_host_delay=0.0):
+    """توان عملیاتی موتور دریافت async در برابر حلقه ترتیبی روی سرورهای محلی"""
+    from content_scraper import ContentScraper
+    from fetch_engine import AsyncFetchEngine
+
+    scraper = ContentScraper()
+    with ExitStack() as stack:
+        servers = [stack.enter_context(LocalTestServer(latency=latency)) for _ in range(hosts)]
+        targets = [servers[i % hosts].url(f"/page/{i}") for i in range(urls)]
+
+        start = time.perf_counter()
+        for url in targets[:min(urls, 20)]:
+            scraper.fetch_page_content(url)
+        sequential_rate = min(urls, 20) / (time.perf_counter() - start)
+
+        engine = AsyncFetchEngine(scraper.fetch_page_content, per_host_delay=per_host_delay)
+        engine.run(targets)
+
+        print(f"sequential: {sequential_rate:.1f} pages/s (first {min(urls, 20)} URLs)")
+        print(f"async engine: {engine.stats.summary()}")
+        for i, server in enumerate(servers):
+            print(f"  host {i}: {len(server.requests)} requests, peak concurrency {server.peak_in_flight}")
+        return engine.stats.as_dict()
+
+
+def bench_session(requests_count=200):
+    """اتصال جدید برای هر درخواست در برابر Session مشترک با keep-alive"""
+    from http_session import create_session, session_stats
+
+    with LocalTestServer() as server:
+        urls = [server.url(f"/page/{i}") for i in range(requests_count)]
+
+        stats = session_stats()
+        stats.reset()
+        start = time.perf_counter()
+        for url in urls:
+            with create_session() as session:
+                session.get(url, timeout=10)
+        fresh_elapsed = time.perf_counter() - start
+        print(f"fresh session per request: {fresh_elapsed:.2f}s - {stats.summary()}")
+
+        stats.reset()
+        start = time.perf_counter()
+        with create_session() as session:
+            for url in urls:
+                session.get(url, timeout=10)
+        pooled_elapsed = time.perf_counter() - start
+        print(f"pooled session: {pooled_elapsed:.2f}s - {stats.summary()}")
+        return {'fresh': fresh_elapsed, 'pooled': pooled_elapsed, **stats.as_dict()}
+
+
+def bench_parse(corpus=None, repeat=3):
+    """زمان پارس هر صفحه با بک‌اندهای مختلف روی صفحات ذخیره‌شده"""
+    from pathlib import Path
+    from config import CONFIG
+    from html_parsers import PARSERS, _HAS_LXML, iter_corpus
+
+    corpus = corpus or Path(CONFIG['CACHE_DIR']) / 'blobs'
+    pages = [path.read_text(encoding='utf-8', errors='replace') for path in iter_corpus(corpus)]
+    if not pages:
+        print(f"no saved pages found in {corpus}")
+        return {}
+
+    results = {}
+    for name, parser_cls in PARSERS.items():
+        if name == 'lxml' and not _HAS_LXML:
+            continue
+        parser = parser_cls()
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for html_content in pages:
+                parser.parse(html_content)
+        per_page = (time.perf_counter() - start) / (repeat * len(pages))
+        results[name] = per_page
+        print(f"{name}: {per_page * 1000:.2f} ms/page over {len(pages)} pages")
+    return results
+
+
+def nested_page(depth, paragraphs=3):
+    """صفحه مصنوعی با div های تو در تو که در هر سطح چند پاراگراف دارد"""
+    body = ''
+    for level in range(depth):
+        body += f'<div class="level-{level}">' + ''.join(
+            f"<p>Level {level} paragraph {i} with enough words to pass the minimum block length.</p>"
+            for i in range(paragraphs)
+        )
+    body += '</div>' * depth
+    nav = '<nav>' + ''.join(f'<a href="/menu/{i}">Menu item {i}</a>' for i in range(20)) + '</nav>'
+    return f"<html><head><title>Nested {depth}</title></head><body>{nav}{body}</body></html>"
+
+
+def bench_main_text(depths=(10, 100, 400, 1000)):
+    """زمان و حجم main_content در حالت legacy و blocks روی صفحات عمیقا تو در تو"""
+    from html_parsers import PARSERS, _HAS_LXML
+
+    results = []
+    for depth in depths:
+        html_content = nested_page(depth)
+        for name, parser_cls in PARSERS.items():
+            if name == 'lxml' and not _HAS_LXML:
+                continue
+            for mode in ('legacy', 'blocks'):
+                parser = parser_cls(main_content_mode=mode)
+                start = time.perf_counter()
+                parsed = parser.parse(html_content)
+                elapsed = time.perf_counter() - start
+                row = {
+                    'depth': depth, 'html_kb': len(html_content) / 1024, 'backend': name, 'mode': mode,
+                    'ms': elapsed * 1000, 'main_content_kb': len(parsed['main_content']) / 1024,
+                }
+                results.append(row)
+                print(
+                    f"depth {depth:5d} ({row['html_kb']:8.1f} KB) {name:5s} {mode:7s}: "
+                    f"{row['ms']:9.1f} ms, main_content {row['main_content_kb']:10.1f} KB"
+                )
+    return results
+
+
+def table_page(tables, rows, cols=6):
+    """صفحه مصنوعی با جدول‌های دارای thead، rowspan/colspan و اعداد با جداکننده هزارگان"""
+    parts = ['<html><head><title>Tables</title></head><body>']
+    for t in range(tables):
+        parts.append('<table><thead><tr><th rowspan="2">Name</th>')
+        parts.append(''.join(f'<th colspan="2">Group {c}</th>' for c in range(cols // 2)))
+        parts.append('</tr><tr>')
+        parts.append(''.join(f'<th>Col {c}</th>' for c in range(cols)))
+        parts.append('</tr></thead><tbody>')
+        for r in range(rows):
+            cells = ''.join(f'<td>{(t + 1) * (r + 1) * (c + 1) * 997:,}</td>' for c in range(cols))
+            parts.append(f'<tr><td>Row {r}</td>{cells}</tr>')
+        parts.append('</tbody></table>')
+    parts.append('</body></html>')
+    return ''.join(parts)
+
+
+def bench_tables(tables=40, rows=30, repeat=3):
+    """استخراج جدول native روی درخت پارس‌شده در برابر pd.read_html برای هر جدول"""
+    from config import CONFIG
+    from content_scraper import ContentScraper
+    from html_parsers import PARSERS, _HAS_LXML
+
+    html_content = table_page(tables, rows)
+    results = []
+    for name, parser_cls in PARSERS.items():
+        if name == 'lxml' and not _HAS_LXML:
+            continue
+        scraper = ContentScraper(parser=parser_cls(), offline=True)
+        outputs = {}
+        for extractor in ('pandas', 'native'):
+            CONFIG['TABLE_EXTRACTOR'] = extractor
+            start = time.perf_counter()
+            for _ in range(repeat):
+                content = scraper.extract_content(html_content, 'http://bench.local/', 1)
+            elapsed = (time.perf_counter() - start) / repeat
+            outputs[extractor] = content['tables']
+            results.append({'backend': name, 'extractor': extractor, 'ms': elapsed * 1000})
+            print(f"{name:5s} {extractor:6s}: {elapsed * 1000:8.1f} ms per page ({tables} tables x {rows} rows)")
+        print(f"{name:5s} records identical: {outputs['pandas'] == outputs['native']}")
+    return results
+
+
+def synthetic_content(i, content_kb=4):
+    """محتوای استخراج‌شده مصنوعی برای بنچمارک خروجی"""
+    paragraph = f"Paragraph text for page {i} with a few words repeated. "
+    return {
+        'url': f"https://example{i % 50}.com/page/{i}",
+        'title': f"Page {i}",
+        'meta_description': f"Description of page {i}",
+        'h1': [f"Heading {i}"], 'h2': [f"Sub {i}.{j}" for j in range(3)],
+        'h3': [], 'h4': [], 'h5': [], 'h6': [],
+        'tables': [[{'a': j, 'b': f"v{j}"} for j in range(5)]],
+        'main_content': paragraph * (content_kb * 1024 // len(paragraph)),
+        'google_rank': i % 10 + 1,
+        'content_score': 50.0,
+    }
+
+
+def _legacy_save(url, row, excel_file):
+    """مسیر قبلی: خواندن کل اکسل، فیلتر، concat و بازنویسی برای هر URL"""
+    import pandas as pd
+    from result_sink import write_content_workbook
+
+    df = pd.DataFrame([row])
+    if os.path.exists(excel_file):
+        existing_df = pd.read_excel(excel_file)
+        existing_df = existing_df[existing_df['URL'] != url]
+        df = pd.concat([existing_df, df], ignore_index=True)
+    write_content_workbook(df, excel_file)
+
+
+def bench_excel(row_counts=(20, 200, 2000), content_kb=4, legacy_max=2000):
+    """بازنویسی اکسل برای هر URL در برابر sink فقط-افزودنی + یک بار ساخت اکسل"""
+    from content_scraper import ContentScraper
+    from result_sink import ResultSink
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in row_counts:
+            contents = [synthetic_content(i, content_kb) for i in range(n)]
+
+            legacy_s = None
+            if n <= legacy_max:
+                excel_file = os.path.join(tmp, f"legacy_{n}.xlsx")
+                start = time.perf_counter()
+                for content in contents:
+                    _legacy_save(content['url'], ContentScraper.content_row(content['url'], content), excel_file)
+                legacy_s = time.perf_counter() - start
+
+            excel_file = os.path.join(tmp, f"sink_{n}.xlsx")
+            start = time.perf_counter()
+            sink = ResultSink(excel_file)
+            for content in contents:
+                sink.append(ContentScraper.content_row(content['url'], content))
+            append_s = time.perf_counter() - start
+            sink.build_workbook()
+            sink.close()
+            sink_s = time.perf_counter() - start
+
+            results.append({'rows': n, 'legacy_s': legacy_s, 'sink_s': sink_s, 'append_s': append_s})
+            legacy = f"{legacy_s:8.2f}s" if legacy_s is not None else "skipped"
+            print(
+                f"{n:6d} rows: per-URL rewrite {legacy:>9s}, "
+                f"sink {sink_s:6.2f}s (appends {append_s * 1000:.0f} ms + one workbook build)"
+            )
+    return results
+
+
+def bench_db_insert(rows=5000, content_kb=1):
+    """توان درج urls: commit برای هر ردیف در برابر دسته‌ای و thread نویسنده"""
+    from database_manager import DatabaseManager
+
+    contents = [synthetic_content(i, content_kb) for i in range(rows)]
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        modes = [
+            ('per-row commit, rollback journal', 'DELETE', 'FULL'),
+            ('per-row commit, WAL', None, None),
+            ('bulk_insert_url_data', None, None),
+            ('batch() context', None, None),
+            ('writer() thread', None, None),
+        ]
+        for i, (mode, journal, synchronous) in enumerate(modes):
+            db = DatabaseManager(os.path.join(tmp, f"bench_{i}.db"))
+            # فقط هزینه دیتابیس؛ page store جداگانه در page-store سنجیده می‌شود
+            db.page_store = None
+            if journal:
+                # حالت قبلی دیتابیس (پیش‌فرض SQLite)
+                db.cursor.execute(f"PRAGMA journal_mode = {journal}")
+                db.cursor.execute(f"PRAGMA synchronous = {synchronous}")
+            keyword_id = db.get_keyword_id('benchmark')
+
+            start = time.perf_counter()
+            if mode.startswith('per-row'):
+                for content in contents:
+                    db.insert_url_data(keyword_id, content)
+            elif mode == 'bulk_insert_url_data':
+                db.bulk_insert_url_data((keyword_id, content) for content in contents)
+            elif mode == 'batch() context':
+                with db.batch() as batch:
+                    for content in contents:
+                        batch.insert_url_data(keyword_id, content)
+            else:
+                with db.writer() as db_writer:
+                    for content in contents:
+                        db_writer.insert_url_data(keyword_id, content)
+            elapsed = time.perf_counter() - start
+
+            count = db.cursor.execute("SELECT COUNT(*) FROM urls").fetchone()[0]
+            db.close()
+            results.append({'mode': mode, 'rows': count, 'rows_per_second': count / elapsed})
+            print(f"{mode:34s}: {count:7d} rows in {elapsed:7.2f}s = {count / elapsed:10.0f} rows/s")
+    return results
+
+
+def build_synthetic_db(db_path, rows, keywords=1000, unique_urls=None, headings=2):
+    """دیتابیس مصنوعی با schema فعلی: rows ردیف urls و headings عنوان برای هر ردیف"""
+    import schema
+
+    unique_urls = unique_urls or max(rows // 20, 1)
+    conn = schema.connect(db_path)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.executemany("INSERT INTO keywords (keyword) VALUES (?)", ((f"keyword {k}",) for k in range(keywords)))
+    chunk = 500_000
+    for low in range(0, rows, chunk):
+        high = min(low + chunk, rows)
+        conn.execute('''
+            WITH RECURSIVE seq(i) AS (SELECT ? UNION ALL SELECT i + 1 FROM seq WHERE i + 1 < ?)
+            INSERT INTO urls (id, keyword_id, url, title, meta_description, google_rank, content_score, created_at)
+            SELECT i + 1, i % ? + 1, 'https://site' || (i % ?) || '.example/page', 'Title ' || i, 'Description ' || i,
+                   i % 100 + 1, (i * 7919 % 1000) / 10.0, datetime(1700000000 + i * 60, 'unixepoch')
+            FROM seq
+        ''', (low, high, keywords, unique_urls))
+        if headings:
+            conn.execute('''
+                WITH RECURSIVE seq(i) AS (SELECT ? UNION ALL SELECT i + 1 FROM seq WHERE i + 1 < ?),
+                     pos(p) AS (SELECT 0 UNION ALL SELECT p + 1 FROM pos WHERE p + 1 < ?)
+                INSERT INTO url_headings (url_id, level, position, text)
+                SELECT i + 1, 1 + p % 3, p / 3, 'Heading ' || p FROM seq, pos
+            ''', (low, high, headings))
+        conn.commit()
+        print(f"  built {high:,} / {rows:,} rows")
+    conn.execute("ANALYZE")
+    conn.close()
+
+
+def _time_query(conn, query, params, repeat):
+    start = time.perf_counter()
+    for i in range(repeat):
+        conn.execute(query, params(i)).fetchall()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def bench_db_query(rows=10_000_000, repeat=50, db_path=None):
+    """تاخیر کوئری‌های اصلی روی دیتابیس مصنوعی، با و بدون ایندکس"""
+    import sqlite3
+
+    import schema
+
+    keywords = 1000
+    unique_urls = max(rows // 20, 1)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = db_path or os.path.join(tmp, 'bench.db')
+        if not os.path.exists(db_path):
+            print(f"Building synthetic database with {rows:,} rows at {db_path}")
+            start = time.perf_counter()
+            build_synthetic_db(db_path, rows, keywords, unique_urls)
+            print(f"  done in {time.perf_counter() - start:.1f}s, {os.path.getsize(db_path) / 1024 ** 2:.0f} MB")
+
+        conn = sqlite3.connect(db_path)
+        queries = {
+            'top 10 URLs for keyword by rank': (
+                '''SELECT url, google_rank, content_score FROM urls {hint}
+                   WHERE keyword_id = ? ORDER BY google_rank LIMIT 10''',
+                lambda i: (i * 37 % keywords + 1,),
+            ),
+            'latest snapshot of URL': (
+                schema.LATEST_SNAPSHOT_QUERY.replace('FROM urls', 'FROM urls {hint}'),
+                lambda i: (f"https://site{i * 7919 % unique_urls}.example/page",),
+            ),
+            'viewer listing for keyword (with headings)': (
+                schema.URLS_FOR_KEYWORD_QUERY.replace('FROM urls u', 'FROM urls u {hint}') + ' LIMIT 50',
+                lambda i: (i * 37 % keywords + 1,),
+            ),
+        }
+        results = []
+        for name, (query, params) in queries.items():
+            plan = conn.execute('EXPLAIN QUERY PLAN ' + query.format(hint=''), params(0)).fetchall()
+            indexed = _time_query(conn, query.format(hint=''), params, repeat)
+            # بدون ایندکس فقط چند بار (اسکن کامل جدول)
+            scan = _time_query(conn, query.format(hint='NOT INDEXED'), params, max(repeat // 25, 1))
+            results.append({'query': name, 'indexed_ms': indexed, 'scan_ms': scan})
+            print(f"{name:44s}: {indexed:8.3f} ms indexed, {scan:9.1f} ms full scan")
+            print(f"  plan: {' / '.join(row[-1] for row in plan)}")
+        conn.close()
+    return results
+
+
+def site_page(i, words=600):
+    """صفحه مصنوعی یک سایت با قالب مشترک (منو، هدر، فوتر) و متن یکتا"""
+    vocabulary = ['seo', 'content', 'ranking', 'search', 'keyword', 'page', 'link', 'google',
+                  'traffic', 'audit', 'speed', 'mobile', 'index', 'crawl', 'schema', 'title']
+    text = ' '.join(vocabulary[(i * 7 + j * j) % len(vocabulary)] + str((i + j) % 97) for j in range(words))
+    nav = ''.join(f'<li class="menu-item"><a href="/category/{c}">Category {c}</a></li>' for c in range(30))
+    footer = ''.join(f'<p class="footer-link"><a href="/legal/{c}">Legal notice {c}</a></p>' for c in range(15))
+    return (
+        f'<!DOCTYPE html><html lang="en"><head><meta charset="utf-8"><title>Article {i}</title>'
+        f'<meta name="description" content="Article {i} about search">'
+        f'<link rel="stylesheet" href="/static/theme.css"><script src="/static/app.js"></script></head>'
+        f'<body><header class="site-header"><ul class="main-menu">{nav}</ul></header>'
+        f'<main><article><h1>Article {i}</h1><p>{text}</p></article></main>'
+        f'<footer class="site-footer">{footer}</footer></body></html>'
+    )
+
+
+def bench_page_store(pages=2000, corpus=None, reads=2000):
+    """حجم و سرعت page store: zlib، zstd بدون دیکشنری و zstd با دیکشنری آموزش‌دیده"""
+    import random
+    import page_store
+    from content_scraper import ContentScraper
+    from html_parsers import iter_corpus
+
+    if corpus:
+        bodies = [path.read_text(encoding='utf-8', errors='replace') for path in iter_corpus(corpus)]
+    else:
+        bodies = [site_page(i) for i in range(pages)]
+    scraper = ContentScraper(offline=True)
+    texts = [scraper.parser.parse(html_content)['main_content'] for html_content in bodies]
+    raw_bytes = sum(len(b.encode('utf-8')) for b in bodies) + sum(len(t.encode('utf-8')) for t in texts)
+    print(f"{len(bodies)} pages, {raw_bytes / 1024 / 1024:.1f} MB of HTML + main text")
+
+    modes = [('zlib', False, None), ('zstd', True, len(bodies) * 2), ('zstd + dictionary', True, None)]
+    results = []
+    for mode, use_zstd, dict_samples in modes:
+        if use_zstd and not page_store._HAS_ZSTD:
+            print(f"{mode:18s}: zstandard is not installed, skipped")
+            continue
+        has_zstd = page_store._HAS_ZSTD
+        page_store._HAS_ZSTD = use_zstd
+        try:
+            with tempfile.TemporaryDirectory() as tmp:
+                store = page_store.PageStore(tmp, dict_samples=dict_samples or min(200, len(bodies) // 4 or 1))
+                start = time.perf_counter()
+                refs = []
+                for html_content, text in zip(bodies, texts):
+                    refs.append(store.put(html_content, 'html'))
+                    refs.append(store.put(text, 'text'))
+                write_seconds = time.perf_counter() - start
+                stored = sum(f.stat().st_size for f in store.root.glob('segment-*.seg'))
+
+                sample = [random.choice(refs) for _ in range(reads)]
+                start = time.perf_counter()
+                for ref in sample:
+                    store.get(ref)
+                read_seconds = time.perf_counter() - start
+
+                html_refs = refs[::2][:200]
+                start = time.perf_counter()
+                for i, ref in enumerate(html_refs):
+                    scraper.extract_content(store.get_text(ref), f"http://bench.local/{i}", 1)
+                rescore_rate = len(html_refs) / (time.perf_counter() - start)
+                store.close()
+        finally:
+            page_store._HAS_ZSTD = has_zstd
+
+        row = {
+            'mode': mode, 'ratio': raw_bytes / stored, 'stored_mb': stored / 1024 / 1024,
+            'write_mb_s': raw_bytes / 1024 / 1024 / write_seconds,
+            'read_us': read_seconds / reads * 1e6, 'rescore_pages_s': rescore_rate,
+        }
+        results.append(row)
+        print(
+            f"{mode:18s}: {row['stored_mb']:7.2f} MB ({row['ratio']:5.1f}x), "
+            f"write {row['write_mb_s']:6.1f} MB/s, read {row['read_us']:7.1f} us/body, "
+            f"re-extract from store {row['rescore_pages_s']:6.0f} pages/s"
+        )
+    return results
+
+
+def bench_scoring(rows=1_000_000, scalar_rows=None):
+    """امتیازدهی برداری batch_scoring در برابر calculate_content_score ردیف به ردیف، با بررسی برابری"""
+    import numpy as np
+    import pandas as pd
+    from batch_scoring import HEADING_COLUMNS, score_features
+    from config import CONFIG
+    from content_scraper import ContentScraper
+
+    rng = np.random.default_rng(42)
+    features = pd.DataFrame({
+        'google_rank': rng.integers(1, 21, rows),
+        'has_meta': rng.random(rows) < 0.8,
+        **{tag: rng.poisson(lam, rows) for tag, lam in zip(HEADING_COLUMNS, (1, 4, 6, 2, 1, 0.5))},
+        'content_length': rng.integers(0, 3000, rows),
+        'table_count': rng.poisson(0.7, rows),
+    })
+    scalar_rows = min(scalar_rows or rows, rows)
+
+    # محتوای معادل برای تابع اسکالر؛ رشته‌ها و لیست‌ها بین ردیف‌ها مشترک‌اند تا حافظه کم بماند
+    texts = {}
+    lists = {}
+    columns = {column: features[column].tolist() for column in features.columns}
+    contents = []
+    for i in range(scalar_rows):
+        length = columns['content_length'][i]
+        content = {
+            'meta_description': 'd' if columns['has_meta'][i] else '',
+            'main_content': texts.setdefault(length, 'x' * length),
+            'tables': lists.setdefault(columns['table_count'][i], [None] * columns['table_count'][i]),
+        }
+        for tag in HEADING_COLUMNS:
+            content[tag] = lists.setdefault(columns[tag][i], [None] * columns[tag][i])
+        contents.append(content)
+    ranks = columns['google_rank'][:scalar_rows]
+
+    scorer = ContentScraper(offline=True)
+    fractional = dict(CONFIG['SCORE_WEIGHTS'], rank=5.15, meta_description=9.99, table=14.7,
+                      headings={'h1': 20.5, 'h2': 15.25, 'h3': 10.1, 'h4': 5.05, 'h5': 3.3, 'h6': 2.01})
+    results = []
+    for label, weights in (('default weights', None), ('fractional weights', fractional)):
+        start = time.perf_counter()
+        scalar = [scorer.calculate_content_score(content, rank, weights) for content, rank in zip(contents, ranks)]
+        scalar_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        vectorized = score_features(features, weights)
+        vector_seconds = time.perf_counter() - start
+
+        mismatches = int((vectorized.to_numpy()[:scalar_rows] != np.array(scalar, dtype='float64')).sum())
+        scalar_rate = scalar_rows / scalar_seconds
+        results.append({
+            'weights': label, 'scalar_rows_s': scalar_rate, 'vector_rows_s': rows / vector_seconds,
+            'mismatches': mismatches,
+        })
+        print(
+            f"{label:18s}: scalar {scalar_rate:10.0f} rows/s ({rows / scalar_rate:6.2f}s for {rows} rows), "
+            f"vectorized {vector_seconds * 1000:7.1f} ms for {rows} rows, "
+            f"{mismatches} mismatches over {scalar_rows} rows"
+        )
+    return results
+
+
+def bench_assembly(keywords=10_000, results=20, legacy_max=1000):
+    """ساخت خروجی ترکیبی: pd.concat برای هر کلمه در برابر لیست ردیف‌ها و SerpAssembler (زمان و اوج حافظه)"""
+    import tracemalloc
+
+    import pandas as pd
+    from output_assembly import SerpAssembler
+
+    def serp(k):
+        return [
+            {'title': f"Result {r} for keyword {k}", 'link': f"https://site{r}.example/{k}/{r}",
+             'description': f"Snippet {r} of keyword {k} " * 4, 'google_rank': r + 1}
+            for r in range(results)
+        ]
+
+    def concat_per_keyword(n):
+        combined = pd.DataFrame()
+        for k in range(n):
+            df = pd.DataFrame(serp(k))
+            df['keyword'] = f"keyword {k}"
+            combined = pd.concat([combined, df], ignore_index=True)
+        return combined
+
+    def row_list(n):
+        rows = []
+        for k in range(n):
+            rows.extend({**result, 'keyword': f"keyword {k}"} for result in serp(k))
+        return pd.DataFrame(rows)
+
+    def assembler(n):
+        assembly = SerpAssembler()
+        for k in range(n):
+            assembly.add(f"keyword {k}", serp(k))
+        return assembly.to_frame()
+
+    reference = None
+    for label, build in (('pd.concat per keyword', concat_per_keyword), ('list of rows', row_list),
+                         ('SerpAssembler', assembler)):
+        n = keywords
+        if build is concat_per_keyword and keywords > legacy_max:
+            n = legacy_max
+        start = time.perf_counter()
+        frame = build(n)
+        seconds = time.perf_counter() - start
+        # اوج حافظه در اجرای جداگانه اندازه‌گیری می‌شود تا tracemalloc زمان را خراب نکند
+        tracemalloc.start()
+        build(n)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        note = ''
+        if n == keywords:
+            if reference is None:
+                reference = frame
+            else:
+                note = ', same frame' if frame.equals(reference) else ', FRAME DIFFERS'
+        else:
+            note = f", {keywords} keywords ~{seconds * (keywords / n) ** 2:.0f}s (quadratic)"
+        print(f"{label:22s}: {n:6d} keywords ({len(frame)} rows) in {seconds:7.2f}s, peak {peak / 1024 / 1024:7.1f} MB{note}")
+
+
+def bench_serp_pool(keywords=20, workers=(1, 2, 4), latency=0.2, max_searches=None):
+    """WebScraperPool با مرورگرهای headless روی صفحه جستجوی ساختگی محلی (نیازمند Chrome)"""
+    from local_server import serp_page
+    from scraper_pool import RateLimiter, WebScraperPool
+
+    words = [f"benchmark keyword {i}" for i in range(keywords)]
+    results = []
+    with LocalTestServer(latency=latency, fallback=serp_page) as server:
+        for count in workers:
+            pool = WebScraperPool(
+                workers=count, max_searches=max_searches, search_url=server.url('/'),
+                headless=True, rate_limiter=RateLimiter(per_minute=0)
+            )
+            with pool:
+                found = pool.search_all(words)
+            stats = pool.as_dict()
+            complete = sum(1 for word in words if len(found.get(word, [])) == 20)
+            results.append(stats)
+            print(
+                f"{count} browsers: {keywords} keywords in {stats['elapsed']:.1f}s "
+                f"({stats['keywords_per_minute']:.1f} keywords/min), {complete}/{keywords} with 20 results"
+            )
+            for metrics in pool.metrics:
+                print(f"  {metrics.summary()}")
+    return results
+
+
+def bench_serp_waits(keywords=5, latency=0.2):
+    """زمان هر جستجو با تاخیرهای ثابت قبلی در برابر انتظار رویدادمحور (یک مرورگر headless، نیازمند Chrome)"""
+    import statistics
+
+    from local_server import serp_page
+    from web_scraper import WebScraper
+
+    results = {}
+    with LocalTestServer(latency=latency, fallback=serp_page) as server:
+        for label, fixed_sleeps in (('fixed sleeps', True), ('readiness waits', False)):
+            scraper = WebScraper(search_url=server.url('/'), headless=True, fixed_sleeps=fixed_sleeps)
+            try:
+                counts = [len(scraper.search_google(f"benchmark keyword {i}")) for i in range(keywords)]
+            finally:
+                scraper.close_browser()
+            totals = sorted(timing['total'] for timing in scraper.timings)
+            phases = {
+                phase: statistics.mean(timing.get(phase, 0.0) for timing in scraper.timings)
+                for phase in ('load', 'first_page', 'second_page')
+            }
+            results[label] = {'median': statistics.median(totals), 'max': totals[-1], **phases}
+            print(
+                f"{label:16s}: median {results[label]['median']:6.2f}s/keyword, max {totals[-1]:6.2f}s "
+                f"(load {phases['load']:.2f}s, page 1 {phases['first_page']:.2f}s, page 2 {phases['second_page']:.2f}s), "
+                f"{sum(1 for count in counts if count == 20)}/{keywords} with 20 results"
+            )
+    return results
+
+
+def bench_serp_parse(pages=200, corpus=None, padding_kb=200):
+    """serp_parser روی پوشه صفحه‌های نتایج: lxml + cssselect در برابر BeautifulSoup"""
+    import serp_parser
+    from local_server import serp_page
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if corpus is None:
+            # صفحه‌های ساختگی با حجم اسکریپت و style شبیه صفحه واقعی گوگل
+            corpus = tmp
+            padding = f"<script>var state = '{'x' * 1024}';</script>" * padding_kb
+            for i in range(pages):
+                html = serp_page(f"/search?q=keyword+{i // 2}&start={(i % 2) * 10}")
+                html = html.replace('<body>', f'<body>{padding}', 1)
+                name = serp_parser.serp_file_name(f"keyword {i // 2}", i % 2 + 1, '20260101_000000')
+                with open(os.path.join(tmp, name), 'w', encoding='utf-8') as f:
+                    f.write(html)
+
+        has_lxml_css = serp_parser._HAS_LXML_CSS
+        outputs = {}
+        try:
+            for label, use_lxml in (('lxml + cssselect', True), ('BeautifulSoup', False)):
+                if use_lxml and not has_lxml_css:
+                    print(f"{label:18s}: cssselect not installed")
+                    continue
+                serp_parser._HAS_LXML_CSS = use_lxml
+                start = time.perf_counter()
+                parsed = list(serp_parser.iter_serp_dir(corpus))
+                rows = list(serp_parser.iter_keyword_rows(parsed))
+                seconds = time.perf_counter() - start
+                outputs[label] = rows
+                print(f"{label:18s}: {len(parsed)} pages, {len(rows)} results in {seconds:.2f}s ({len(parsed) / seconds:.0f} pages/s)")
+        finally:
+            serp_parser._HAS_LXML_CSS = has_lxml_css
+        if len(outputs) == 2:
+            first, second = outputs.values()
+            print(f"same results: {first == second}")
+    return outputs
+
+
+def bench_archive_aimd(jobs=400, hosts=8, base_latency=0.2, capacity=12, timeout=2.0, fixed_workers=10,
+                       max_workers=32, per_host=2, real_pressure=False):
+    """
+    شبیه‌سازی کنترل همزمانی آرشیو روی سرورهای محلی: تاخیر هر پاسخ با تعداد کل درخواست‌های
+    همزمان بالاتر از capacity زیاد می‌شود. تعداد ثابت کارگر در برابر AdaptiveLimiter.
+    """
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+
+    import requests
+    from adaptive_concurrency import AdaptiveLimiter, HostQueue, system_pressure
+
+    def run(servers, label, limiter=None):
+        urls = [servers[i % hosts].url(f"/page/{i}") for i in range(jobs)]
+        latencies = []
+        timeouts = 0
+        host_active = Counter()
+        host_peak = 0
+        executor = ThreadPoolExecutor(max_workers=max(max_workers, fixed_workers) + 4)
+
+        def fetch(url):
+            try:
+                requests.get(url, timeout=timeout).raise_for_status()
+                return True
+            except requests.Timeout:
+                return None
+            except requests.RequestException:
+                return False
+
+        async def worker(queue):
+            nonlocal timeouts, host_peak
+            loop = asyncio.get_running_loop()
+            while True:
+                if limiter:
+                    # مثل advanced_archiver: کار بعدی از هاستی که جای خالی دارد
+                    picked = await limiter.acquire_next(queue)
+                    if picked is None:
+                        return
+                    host, url, started = picked
+                else:
+                    url = await queue.get()
+                    if url is None:
+                        return
+                    host = url.split('/')[2]
+                host_active[host] += 1
+                host_peak = max(host_peak, host_active[host])
+                start = time.perf_counter()
+                outcome = await loop.run_in_executor(executor, fetch, url)
+                seconds = time.perf_counter() - start
+                host_active[host] -= 1
+                latencies.append(seconds)
+                timeouts += outcome is None
+                if limiter:
+                    await limiter.release(host, started, seconds, bool(outcome), outcome is None)
+
+        async def main():
+            workers = max_workers if limiter else fixed_workers
+            if limiter:
+                queue = HostQueue()
+                for url in urls:
+                    queue.put(url.split('/')[2], url)
+            else:
+                queue = asyncio.Queue()
+                for url in urls:
+                    queue.put_nowait(url)
+                for _ in range(workers):
+                    queue.put_nowait(None)
+            await asyncio.gather(*(worker(queue) for _ in range(workers)))
+
+        # درخواست‌هایی که در اجرای قبلی timeout شدند هنوز روی سرورها در حال اجرا هستند
+        deadline = time.perf_counter() + 60
+        while sum(server.in_flight for server in servers) and time.perf_counter() < deadline:
+            time.sleep(0.1)
+        start = time.perf_counter()
+        asyncio.run(main())
+        elapsed = time.perf_counter() - start
+        executor.shutdown()
+        latencies.sort()
+        row = {
+            'mode': label, 'pages_s': jobs / elapsed, 'p50': latencies[len(latencies) // 2],
+            'p95': latencies[int(len(latencies) * 0.95)], 'timeouts': timeouts,
+            'host_peak': host_peak,
+        }
+        print(
+            f"{label:22s}: {row['pages_s']:6.1f} pages/s, latency p50 {row['p50']:.2f}s p95 {row['p95']:.2f}s, "
+            f"{timeouts} timeouts, peak per host {row['host_peak']}"
+        )
+        if limiter:
+            print(f"  {limiter.summary()}")
+        return row
+
+    with ExitStack() as stack:
+        servers = []
+
+        def latency(path):
+            overload = max(0, sum(server.in_flight for server in servers) - capacity)
+            return base_latency * (1 + overload)
+
+        servers.extend(stack.enter_context(LocalTestServer(latency=latency)) for _ in range(hosts))
+        results = [run(servers, f"fixed {fixed_workers} workers")]
+        limiter = AdaptiveLimiter(
+            min_limit=2, max_limit=max_workers, initial=5, target_latency=base_latency * 4,
+            timeout_rate=0.2, per_host=per_host, pressure=system_pressure if real_pressure else None
+        )
+        results.append(run(servers, "AIMD", limiter))
+    return results
+
+
+def bench_logging(records=20000):
+    """
+    هزینه هر رکورد لاگ در thread فراخواننده: handler های همزمان (با ColoredFormatter قبلی که
+    record.msg را تغییر می‌داد) در برابر QueueHandler با یک thread نویسنده، با فایل متنی و JSON-lines
+    """
+    import logging
+    import queue
+    from logging.handlers import QueueListener
+
+    from colorama import Style
+    from config import ColoredFormatter, JsonLinesFormatter, LazyQueueHandler
+
+    class LegacyColoredFormatter(ColoredFormatter):
+        def format(self, record):
+            if 'http' in str(record.msg) or 'www.' in str(record.msg):
+                color = self.COLOR_CODES['URL']
+            elif 'successfully' in str(record.msg).lower() or 'success' in str(record.msg).lower():
+                color = self.COLOR_CODES['SUCCESS']
+            elif 'keyword' in str(record.msg).lower():
+                color = self.COLOR_CODES['KEYWORD']
+            else:
+                color = self.COLOR_CODES.get(record.levelname, 'WHITE')
+            record.msg = f"{color}{record.msg}{Style.RESET_ALL}"
+            return logging.Formatter.format(self, record)
+
+    text_format = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    modes = (
+        ('sync, old formatter', LegacyColoredFormatter, text_format, False),
+        ('sync', ColoredFormatter, text_format, False),
+        ('queue', ColoredFormatter, text_format, True),
+        ('queue, json file', ColoredFormatter, JsonLinesFormatter(), True),
+    )
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp, open(os.devnull, 'w', encoding='utf-8') as devnull:
+        for label, console_formatter, file_formatter, queued in modes:
+            console = logging.StreamHandler(devnull)
+            console.setLevel(logging.INFO)
+            console.setFormatter(console_formatter('%(asctime)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S'))
+            log_file = os.path.join(tmp, f"{label.replace(' ', '_').replace(',', '')}.log")
+            file = logging.FileHandler(log_file, encoding='utf-8')
+            file.setLevel(logging.DEBUG)
+            file.setFormatter(file_formatter)
+
+            logger = logging.getLogger(f'benchmark.logging.{len(results)}')
+            logger.propagate = False
+            logger.setLevel(logging.DEBUG)
+            listener = None
+            if queued:
+                log_queue = queue.SimpleQueue()
+                listener = QueueListener(log_queue, console, file, respect_handler_level=True)
+                listener.start()
+                logger.addHandler(LazyQueueHandler(log_queue))
+            else:
+                logger.addHandler(console)
+                logger.addHandler(file)
+
+            # ترکیبی شبیه لاگ‌های هر URL در اسکرپ
+            start = time.perf_counter()
+            for i in range(records // 4):
+                url = f"https://example{i % 50}.com/page/{i}"
+                logger.info(f"Processing URL: {url}")
+                logger.debug(f"Fetched {url} in {0.25 + i % 7 / 10:.2f}s")
+                logger.info(f"Successfully processed {url}")
+                logger.warning(f"No tables found for keyword 'keyword {i % 100}'")
+            emitted = time.perf_counter() - start
+            if listener:
+                listener.stop()
+            drained = time.perf_counter() - start
+            for handler in list(logger.handlers):
+                logger.removeHandler(handler)
+            console.close()
+            file.close()
+
+            with open(log_file, encoding='utf-8') as f:
+                content = f.read()
+            count = records // 4 * 4
+            results[label] = {'us_per_record': emitted / count * 1e6, 'drained': drained}
+            print(
+                f"{label:20s}: {results[label]['us_per_record']:6.1f} us/record on the logging thread, "
+                f"all written after {drained:.2f}s, file {len(content) / 1024:.0f} KB, "
+                f"ANSI codes in file: {'yes' if chr(27) in content else 'no'}"
+            )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scraper performance benchmarks")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    fetch = sub.add_parser('fetch', help='async fetch engine throughput')
+    fetch.add_argument('--urls', type=int, default=200)
+    fetch.add_argument('--hosts', type=int, default=4)
+    fetch.add_argument('--latency', type=float, default=0.1)
+    fetch.add_argument('--per-host-delay', type=float, default=0.0)
+
+    session = sub.add_parser('session', help='connection reuse of the pooled HTTP session')
+    session.add_argument('--requests', type=int, default=200)
+
+    parse = sub.add_parser('parse', help='HTML parser backends on saved pages')
+    parse.add_argument('--corpus', default=None)
+    parse.add_argument('--repeat', type=int, default=3)
+
+    main_text = sub.add_parser('main-text', help='main-content extraction on deeply nested pages')
+    main_text.add_argument('--depths', type=int, nargs='+', default=[10, 100, 400, 1000])
+
+    tables = sub.add_parser('tables', help='native table extraction vs pd.read_html')
+    tables.add_argument('--tables', type=int, default=40)
+    tables.add_argument('--rows', type=int, default=30)
+    tables.add_argument('--repeat', type=int, default=3)
+
+    excel = sub.add_parser('excel', help='per-URL Excel rewrite vs append-only result sink')
+    excel.add_argument('--rows', type=int, nargs='+', default=[20, 200, 2000])
+    excel.add_argument('--content-kb', type=int, default=4)
+    excel.add_argument('--legacy-max', type=int, default=2000, help='skip the per-URL rewrite above this many rows')
+
+    db_insert = sub.add_parser('db-insert', help='SQLite insert throughput of DatabaseManager')
+    db_insert.add_argument('--rows', type=int, default=5000)
+
+    db_query = sub.add_parser('db-query', help='query latency of the urls schema on a synthetic database')
+    db_query.add_argument('--rows', type=int, default=10_000_000)
+    db_query.add_argument('--repeat', type=int, default=50)
+    db_query.add_argument('--db', default=None, help='reuse (or keep) a synthetic database at this path')
+
+    store = sub.add_parser('page-store', help='compression ratio and read speed of the page store')
+    store.add_argument('--pages', type=int, default=2000)
+    store.add_argument('--corpus', default=None, help='directory of saved pages instead of synthetic ones')
+    store.add_argument('--reads', type=int, default=2000)
+
+    scoring = sub.add_parser('scoring', help='vectorized batch scoring vs calculate_content_score')
+    scoring.add_argument('--rows', type=int, default=1_000_000)
+    scoring.add_argument('--scalar-rows', type=int, default=None, help='score only this many rows one by one')
+
+    assembly = sub.add_parser('assembly', help='combined SERP output: pd.concat per keyword vs one-pass assembly')
+    assembly.add_argument('--keywords', type=int, default=10_000)
+    assembly.add_argument('--results', type=int, default=20)
+    assembly.add_argument('--legacy-max', type=int, default=1000, help='cap the pd.concat loop at this many keywords')
+
+    serp = sub.add_parser('serp-pool', help='parallel headless browsers against a local search stand-in')
+    serp.add_argument('--keywords', type=int, default=20)
+    serp.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    serp.add_argument('--latency', type=float, default=0.2)
+    serp.add_argument('--max-searches', type=int, default=None, help='restart each browser after this many searches')
+
+    serp_waits = sub.add_parser('serp-waits', help='per-keyword search latency: fixed sleeps vs readiness waits')
+    serp_waits.add_argument('--keywords', type=int, default=5)
+    serp_waits.add_argument('--latency', type=float, default=0.2)
+
+    serp_parse = sub.add_parser('serp-parse', help='browser-free SERP parsing of saved result pages')
+    serp_parse.add_argument('--pages', type=int, default=200)
+    serp_parse.add_argument('--corpus', default=None, help='directory of saved SERP pages instead of synthetic ones')
+    serp_parse.add_argument('--padding-kb', type=int, default=200, help='inline script size of synthetic pages')
+
+    aimd = sub.add_parser('archive-aimd', help='fixed vs adaptive archive concurrency on overloaded local servers')
+    aimd.add_argument('--jobs', type=int, default=400)
+    aimd.add_argument('--hosts', type=int, default=8)
+    aimd.add_argument('--latency', type=float, default=0.2, help='response time without overload')
+    aimd.add_argument('--capacity', type=int, default=12, help='concurrent requests the servers absorb without slowing down')
+    aimd.add_argument('--timeout', type=float, default=2.0)
+    aimd.add_argument('--fixed-workers', type=int, default=10)
+    aimd.add_argument('--max-workers', type=int, default=32)
+    aimd.add_argument('--per-host', type=int, default=2)
+    aimd.add_argument('--real-pressure', action='store_true', help='also react to this machine\'s CPU and memory')
+
+    logs = sub.add_parser('logging', help='per-record logging overhead, synchronous vs queue handlers')
+    logs.add_argument('--records', type=int, default=20000)
+
+    args = parser.parse_args()
+    if args.command == 'fetch':
+        bench_fetch(args.urls, args.hosts, args.latency, args.per_host_delay)
+    elif args.command == 'session':
+        bench_session(args.requests)
+    elif args.command == 'parse':
+        bench_parse(args.corpus, args.repeat)
+    elif args.command == 'main-text':
+        bench_main_text(args.depths)
+    elif args.command == 'tables':
+        bench_tables(args.tables, args.rows, args.repeat)
+    elif args.command == 'excel':
+        bench_excel(args.rows, args.content_kb, args.legacy_max)
+    elif args.command == 'db-insert':
+        bench_db_insert(args.rows)
+    elif args.command == 'db-query':
+        bench_db_query(args.rows, args.repeat, args.db)
+    elif args.command == 'page-store':
+        bench_page_store(args.pages, args.corpus, args.reads)
+    elif args.command == 'scoring':
+        bench_scoring(args.rows, args.scalar_rows)
+    elif args.command == 'assembly':
+        bench_assembly(args.keywords, args.results, args.legacy_max)
+    elif args.command == 'serp-pool':
+        bench_serp_pool(args.keywords, args.workers, args.latency, args.max_searches)
+    elif args.command == 'serp-waits':
+        bench_serp_waits(args.keywords, args.latency)
+    elif args.command == 'serp-parse':
+        bench_serp_parse(args.pages, args.corpus, args.padding_kb)
+    elif args.command == 'archive-aimd':
+        bench_archive_aimd(args.jobs, args.hosts, args.latency, args.capacity, args.timeout, args.fixed_workers,
+                           args.max_workers, args.per_host, args.real_pressure)
+    elif args.command == 'logging':
+        bench_logging(args.records)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,9 @@
+import atexit
+import json
 import logging
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
+import queue
 import sys
 from datetime import datetime
 import os
@@ -10,7 +14,7 @@ init(autoreset=True)
 
 # Create custom logger formatter with colors
 class ColoredFormatter(logging.Formatter):
-    """Custom formatter with colored output"""
+    """Custom formatter with colored output (فقط برای کنسول؛ record تغییر نمی‌کند)"""
     
     COLOR_CODES = {
         'DEBUG': Fore.WHITE,
@@ -25,23 +29,50 @@ class ColoredFormatter(logging.Formatter):
         'KEYWORD': Fore.GREEN + Style.BRIGHT
     }
 
-    def format(self, record):
+    def color_for(self, message, levelname):
         # Add colors based on message content
-        if 'http' in str(record.msg) or 'www.' in str(record.msg):
-            color = self.COLOR_CODES['URL']
-        elif 'successfully' in str(record.msg).lower() or 'success' in str(record.msg).lower():
-            color = self.COLOR_CODES['SUCCESS']
-        elif 'keyword' in str(record.msg).lower():
-            color = self.COLOR_CODES['KEYWORD']
-        else:
-            # Default colors based on log level
-            color = self.COLOR_CODES.get(record.levelname, Fore.WHITE)
-
-        # Add color to the message
-        record.msg = f"{color}{record.msg}{Style.RESET_ALL}"
-        
-        # Use parent class formatting
-        return super().format(record)
+        if 'http' in message or 'www.' in message:
+            return self.COLOR_CODES['URL']
+        lowered = message.lower()
+        if 'success' in lowered:
+            return self.COLOR_CODES['SUCCESS']
+        if 'keyword' in lowered:
+            return self.COLOR_CODES['KEYWORD']
+        # Default colors based on log level
+        return self.COLOR_CODES.get(levelname, Fore.WHITE)
+
+    def formatMessage(self, record):
+        # رنگ روی کپی record اعمال می‌شود تا handler های دیگر (فایل) متن بدون ANSI بگیرند
+        colored = logging.makeLogRecord(record.__dict__)
+        colored.message = f"{self.color_for(record.message, record.levelname)}{record.message}{Style.RESET_ALL}"
+        return super().formatMessage(colored)
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """یک شیء JSON فشرده در هر خط: ts (زمان)، lvl، log (نام logger)، msg و exc (traceback در صورت وجود)"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'lvl': record.levelname,
+            'log': record.name,
+            'msg': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry['stack'] = self.formatStack(record.stack_info)
+        return json.dumps(entry, ensure_ascii=False, separators=(',', ':'), default=str)
+
+
+class LazyQueueHandler(QueueHandler):
+    """
+    QueueHandler بدون قالب‌بندی در thread فراخواننده: record همان‌طور که هست در صف می‌رود
+    و getMessage و رنگ و نوشتن فقط در thread نویسنده (QueueListener) انجام می‌شود.
+    """
+
+    def prepare(self, record):
+        return record
 
 # Base directories
 BASE_DIR = Path(__file__).parent
@@ -57,10 +88,94 @@ CONFIG = {
     'VERSION': '1.0.0',
     'USER': os.getenv('COMPUTERNAME', 'default_user'),
     'DEBUG': False,
+    'LOG_ASYNC': True,  # نوشتن لاگ در thread پس‌زمینه (QueueHandler/QueueListener)
+    'LOG_FILE_FORMAT': 'text',  # text (debug.log) | json (debug.jsonl، یک شیء JSON در هر خط)
     'MAX_RETRIES': 3,
     'TIMEOUT': 30,
     'OUTPUT_DIR': str(OUTPUT_DIR),
-    'DB_PATH': str(OUTPUT_DIR / 'seo_data.db')  # Add this line
+    'DB_PATH': str(OUTPUT_DIR / 'seo_data.db'),  # Add this line
+
+    # Content fetching
+    'MAX_CONCURRENT_FETCHES': 16,  # سقف کل درخواست‌های همزمان
+    'PER_HOST_CONCURRENCY': 2,  # سقف درخواست همزمان برای هر هاست
+    'PER_HOST_DELAY': 2.0,  # فاصله (ثانیه) بین درخواست‌های یک هاست
+
+    # HTTP connection pooling
+    'HTTP_POOL_CONNECTIONS': 64,  # تعداد هاست‌هایی که pool آن‌ها نگه داشته می‌شود
+    'HTTP_POOL_MAXSIZE': 4,  # اتصال‌های keep-alive برای هر هاست
+    'HTTP_POOL_MAXSIZE_PER_HOST': {},  # مثلا {'example.com': 8}
+
+    # On-disk page cache
+    'CACHE_ENABLED': True,
+    'CACHE_DIR': str(OUTPUT_DIR / 'page_cache'),
+    'CACHE_TTL': 24 * 3600,  # ثانیه؛ بعد از آن با ETag / Last-Modified اعتبارسنجی می‌شود
+    'CACHE_MAX_BYTES': 2 * 1024 ** 3,
+
+    # HTML parsing
+    'PARSER_BACKEND': 'auto',  # auto | lxml | bs4 (مرجع)
+    'MAIN_CONTENT_MODE': 'blocks',  # blocks (خطی، بدون تکرار) | legacy (get_text روی هر ظرف)
+
+    # Parse stage
+    'PARSE_WORKERS': max((os.cpu_count() or 2) - 1, 1),  # 0 = پارس روی همان thread دریافت
+    'PARSE_QUEUE_SIZE': 64,  # حداکثر صفحه در حال پارس یا منتظر نوشتن
+    'PARSE_POOL_RESTARTS': 3,  # ساخت دوباره ProcessPool بعد از مرگ یک پروسس پارس، در هر اجرا
+
+    # Table extraction
+    'TABLE_EXTRACTOR': 'native',  # native (روی درخت پارس‌شده) | pandas (pd.read_html برای هر جدول)
+    'MAX_TABLES_PER_PAGE': 50,
+    'MAX_TABLE_CELLS': 20000,  # جدول‌های بزرگ‌تر رد می‌شوند
+
+    # SQLite writes
+    'DB_JOURNAL_MODE': 'WAL',
+    'DB_SYNCHRONOUS': 'NORMAL',  # در WAL فقط checkpoint ها fsync می‌شوند
+    'DB_CACHE_SIZE_KB': 64 * 1024,
+    'DB_BATCH_SIZE': 500,  # commit بعد از این تعداد ردیف ...
+    'DB_BATCH_SECONDS': 2.0,  # ... یا بعد از این مدت، هر کدام زودتر برسد
+    'CHANGE_DETECTION': True,  # صفحه با اثر انگشت تکراری ردیف جدید نمی‌گیرد، فقط زمان مشاهده
+
+    # Job ledger (ادامه اجرای قطع‌شده و تلاش دوباره)
+    'LEDGER_PATH': str(OUTPUT_DIR / 'job_ledger.db'),
+    'LEDGER_MAX_ATTEMPTS': 3,  # تلاش برای هر کلمه کلیدی و هر URL
+    'LEDGER_BACKOFF_SECONDS': 60,  # فاصله تلاش دوباره؛ با هر شکست دو برابر می‌شود
+    'WRITE_PER_KEYWORD_FILES': False,  # فایل‌های results_<keyword>_<time>.xlsx/json تکراری WebScraper
+
+    # SERP browsers (WebScraperPool)
+    'SEARCH_URL': 'https://www.google.com',
+    'BROWSER_HEADLESS': False,
+    'SCRAPER_POOL_WORKERS': 2,  # تعداد مرورگرهای موازی
+    'SCRAPER_POOL_MAX_SEARCHES': 50,  # مرورگر بعد از این تعداد جستجو دوباره راه‌اندازی می‌شود
+    'SEARCH_RATE_PER_MINUTE': 6,  # سقف جستجو در دقیقه برای کل اجرا (همه مرورگرها)؛ 0 = بدون محدودیت
+    'SEARCH_RATE_JITTER': 0.3,  # نوسان تصادفی فاصله جستجوها (کسری از فاصله)
+    'SEARCH_FIXED_SLEEPS': False,  # True = تاخیرهای ثابت و تایپ حرف به حرف قبلی (فقط برای مقایسه)
+    'SERP_SELECTORS': {  # انتخابگرهای CSS نتایج در page_source صفحه جستجو
+        'result': 'div.g',
+        'title': 'h3',
+        'link': 'a',
+        'description': 'div.VwiC3b'
+    },
+    'SERP_SAVE_PAGES': False,  # ذخیره HTML صفحه‌های نتایج برای پارس دوباره با serp_parser.py
+    'SERP_PAGES_DIR': str(OUTPUT_DIR / 'serp_pages'),
+
+    # Page store (HTML خام و متن اصلی فشرده؛ دیتابیس فقط ارجاع نگه می‌دارد)
+    'PAGE_STORE_ENABLED': True,
+    'PAGE_STORE_DIR': OUTPUT_DIR / 'page_store',
+    'PAGE_STORE_SEGMENT_BYTES': 256 * 1024 * 1024,  # اندازه هر فایل segment
+    'PAGE_STORE_LEVEL': 9,  # سطح فشرده‌سازی zstd
+    'PAGE_STORE_DICT_SIZE': 112 * 1024,  # اندازه دیکشنری آموزش‌دیده zstd
+    'PAGE_STORE_DICT_SAMPLES': 200,  # تعداد بدنه هر نوع پیش از آموزش دیکشنری
+
+    # Rescore (استخراج و امتیازدهی دوباره از HTML ذخیره‌شده؛ تعداد پروسس از PARSE_WORKERS)
+    'RESCORE_CHUNK_SIZE': 32,  # تعداد صفحه در هر کار ارسالی به پروسس‌ها
+
+    # Content score (calculate_content_score و batch_scoring هر دو از همین وزن‌ها استفاده می‌کنند)
+    'SCORE_WEIGHTS': {
+        'rank_base': 21,  # امتیاز رتبه = (rank_base - رتبه) * rank
+        'rank': 5,
+        'meta_description': 10,
+        'headings': {'h1': 20, 'h2': 15, 'h3': 10, 'h4': 5, 'h5': 3, 'h6': 2},  # به ازای هر عنوان
+        'content_length': [(1000, 50), (500, 30), (200, 15)],  # (طول بیشتر از، امتیاز) از بزرگ به کوچک
+        'table': 15  # به ازای هر جدول
+    }
 }
 
 # Set up console logging with colors
@@ -73,19 +188,43 @@ colored_formatter = ColoredFormatter(
 console_handler.setFormatter(colored_formatter)
 
 # Set up file logging (without colors)
-file_handler = logging.FileHandler(LOG_DIR / 'debug.log', encoding='utf-8')
+if CONFIG['LOG_FILE_FORMAT'] == 'json':
+    file_handler = logging.FileHandler(LOG_DIR / 'debug.jsonl', encoding='utf-8')
+    file_format = JsonLinesFormatter()
+else:
+    file_handler = logging.FileHandler(LOG_DIR / 'debug.log', encoding='utf-8')
+    file_format = logging.Formatter(
+        '%(asctime)s - %(levelname)s - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
 file_handler.setLevel(logging.DEBUG)
-file_format = logging.Formatter(
-    '%(asctime)s - %(levelname)s - %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
 file_handler.setFormatter(file_format)
 
 # Configure root logger
 logger = logging.getLogger()
 logger.setLevel(logging.DEBUG)
-logger.addHandler(console_handler)
-logger.addHandler(file_handler)
+log_listener = None
+if CONFIG['LOG_ASYNC']:
+    # thread های اسکرپ فقط record را در صف می‌گذارند؛ یک thread پس‌زمینه قالب‌بندی می‌کند و می‌نویسد
+    log_queue = queue.SimpleQueue()
+    queue_handler = LazyQueueHandler(log_queue)
+    log_listener = QueueListener(log_queue, console_handler, file_handler, respect_handler_level=True)
+    logger.addHandler(queue_handler)
+    log_listener.start()
+    # قبل از logging.shutdown اجرا می‌شود (atexit به ترتیب معکوس)، پس صف کامل نوشته می‌شود
+    atexit.register(log_listener.stop)
+
+    def _direct_logging_in_child():
+        # پروسس fork شده thread نویسنده را ندارد؛ مستقیم در handler ها می‌نویسد
+        logger.removeHandler(queue_handler)
+        logger.addHandler(console_handler)
+        logger.addHandler(file_handler)
+
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=_direct_logging_in_child)
+else:
+    logger.addHandler(console_handler)
+    logger.addHandler(file_handler)
 
 def get_logger(name):
     return logging.getLogger(name)
\ No newline at end of file
@@ -1,72 +1,93 @@
-import requests
-from bs4 import BeautifulSoup
 import pandas as pd
 from datetime import datetime
 import logging
 import os
 from pathlib import Path
 import json
-import time
-import random
+from contextlib import nullcontext
 
 from config import CONFIG, get_logger
+from fetch_engine import AsyncFetchEngine
+from http_session import get_session, session_stats
+from page_cache import FetchedPage, get_page_cache
+from page_store import get_page_store
+from html_parsers import HEADING_TAGS, get_parser
+from table_extractor import TableTooLarge, extract_table_records, flatten_columns, table_html
+from parse_pipeline import ParsePipeline
+from result_sink import ResultSink
 
 logger = get_logger(__name__)
 
+# با هر تغییر در قواعد extract_content افزایش دهید تا خروجی‌های کش‌شده قدیمی استفاده نشوند
+EXTRACTION_VERSION = 3
+
 class ContentScraper:
-    def __init__(self):
+    def __init__(self, parser=None, offline=False):
+        """offline=True فقط برای استخراج/امتیازدهی است (مثلا در پروسس‌های پارس) و شبکه و کش ندارد"""
         self.output_dir = Path(CONFIG['OUTPUT_DIR'])
         self.content_dir = self.output_dir / "content"
         self.content_dir.mkdir(parents=True, exist_ok=True)
+        # تاخیر مودبانه به ازای هر هاست در موتور دریافت اعمال می‌شود، نه بعد از هر درخواست
+        self.fetch_engine = AsyncFetchEngine(self.fetch_page)
+        # Session مشترک با keep-alive تا URLهای یک دامنه handshake تکراری نداشته باشند
+        self.session = None if offline else get_session()
+        self.page_cache = None if offline else get_page_cache()
+        # HTML خام و متن اصلی فشرده برای استخراج دوباره بدون شبکه (نوشتن فقط در پروسس اصلی)
+        self.page_store = None if offline else get_page_store()
+        # بک‌اند پارس HTML (bs4 مرجع، lxml سریع)؛ پیش‌فرض از CONFIG['PARSER_BACKEND']
+        self.parser = parser or get_parser()
+        # مرحله پارس در ProcessPool؛ با اولین scrape_urls ساخته می‌شود
+        self.parse_workers = CONFIG['PARSE_WORKERS']
+        self.parse_pipeline = None
+        # یک sink فقط-افزودنی برای هر فایل اکسل خروجی؛ اکسل در پایان scrape_urls ساخته می‌شود
+        self.result_sinks = {}
+        # دفتر کارها (JobLedger) برای ثبت وضعیت هر URL در اجرای جاری scrape_urls
+        self.ledger = None
 
-    def fetch_page_content(self, url):
-        """دریافت محتوای صفحه از طریق URL"""
+    def fetch_page(self, url):
+        """دریافت صفحه (از کش در صورت فعال بودن) و برگرداندن FetchedPage بدون تاخیر"""
         try:
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-            }
-            # استفاده از پراکسی خالی برای جلوگیری از استفاده از پراکسی نامعتبر
-            response = requests.get(url, headers=headers, timeout=CONFIG['TIMEOUT'], proxies={})
+            if self.page_cache:
+                return self.page_cache.fetch(self.session, url, CONFIG['TIMEOUT'])
+            response = self.session.get(url, timeout=CONFIG['TIMEOUT'])
             response.raise_for_status()
-            time.sleep(random.uniform(1, 3))
-            return response.text
+            return FetchedPage(url, response.text, 'miss', None, len(response.content))
         except Exception as e:
             logger.error(f"Error fetching {url}: {str(e)}")
             return None
 
-    def calculate_content_score(self, content, google_rank):
-        """محاسبه امتیاز محتوا بر اساس فاکتورهای مختلف"""
+    def fetch_page_content(self, url):
+        """دریافت محتوای صفحه از طریق URL (بدون تاخیر؛ برای مودب بودن از fetch_engine استفاده کنید)"""
+        page = self.fetch_page(url)
+        return page.html if page else None
+
+    def calculate_content_score(self, content, google_rank, weights=None):
+        """محاسبه امتیاز محتوا بر اساس فاکتورهای مختلف (وزن‌ها از CONFIG['SCORE_WEIGHTS'])"""
         try:
+            weights = weights or CONFIG['SCORE_WEIGHTS']
             score = 0
             
             # امتیاز بر اساس رتبه گوگل (رتبه 1 بیشترین امتیاز)
-            rank_score = (21 - google_rank) * 5  # رتبه 1 = 100, رتبه 20 = 5
+            rank_score = (weights['rank_base'] - google_rank) * weights['rank']  # رتبه 1 = 100, رتبه 20 = 5
             score += rank_score
 
             # امتیاز برای متا دیسکریپشن
             if content.get('meta_description'):
-                score += 10
+                score += weights['meta_description']
 
             # امتیاز برای هدینگ‌ها
-            heading_weights = {
-                'h1': 20, 'h2': 15, 'h3': 10,
-                'h4': 5, 'h5': 3, 'h6': 2
-            }
-            
-            for h_type, weight in heading_weights.items():
+            for h_type, weight in weights['headings'].items():
                 score += len(content.get(h_type, [])) * weight
 
             # امتیاز برای محتوای اصلی (بر اساس طول)
             main_content_length = len(content.get('main_content', ''))
-            if main_content_length > 1000:
-                score += 50
-            elif main_content_length > 500:
-                score += 30
-            elif main_content_length > 200:
-                score += 15
+            for threshold, bonus in weights['content_length']:
+                if main_content_length > threshold:
+                    score += bonus
+                    break
 
             # امتیاز برای جداول
-            score += len(content.get('tables', [])) * 15
+            score += len(content.get('tables', [])) * weights['table']
 
             return round(score, 2)
             
@@ -75,58 +96,59 @@ class ContentScraper:
             return 0
 
     def extract_tables(self, table):
-        """استخراج جدول با استفاده از StringIO"""
+        """تبدیل یک جدول به لیست رکوردها (native روی درخت پارس‌شده یا pd.read_html)"""
         try:
-            from io import StringIO
-            table_html = str(table)
-            return pd.read_html(StringIO(table_html))[0]
+            if CONFIG['TABLE_EXTRACTOR'] == 'pandas':
+                from io import StringIO
+                return pd.read_html(StringIO(table_html(table)))[0].to_dict('records')
+            return extract_table_records(table)
+        except TableTooLarge:
+            logger.warning(f"Skipping table with more than {CONFIG['MAX_TABLE_CELLS']} cells")
+            return None
         except Exception as e:
             logger.error(f"Error extracting table: {str(e)}")
             return None
 
-    def extract_content(self, html_content, url, google_rank=0):
-        """استخراج محتوای صفحه از HTML با امتیازدهی"""
+    def extract_content(self, html_content, url, google_rank=0, html_ref=None):
+        """
+        استخراج محتوای صفحه از HTML با امتیازدهی.
+        با html_ref (ستون urls.html_ref) و html_content=None، HTML از page store خوانده می‌شود.
+        """
         try:
-            soup = BeautifulSoup(html_content, 'html.parser')
+            if html_content is None and html_ref:
+                store = self.page_store or get_page_store()
+                if store is None:
+                    logger.error(f"Page store is disabled, cannot read stored HTML for {url}")
+                    return None
+                html_content = store.get_text(html_ref)
+
+            parsed = self.parser.parse(html_content)
             
             content = {
                 'url': url,
-                'title': soup.title.string.strip() if soup.title else "No Title",
-                'meta_description': '',
+                'title': parsed['title'],
+                'meta_description': parsed['meta_description'],
                 'h1': [], 'h2': [], 'h3': [], 'h4': [], 'h5': [], 'h6': [],
                 'tables': [],
-                'main_content': '',
+                'main_content': parsed['main_content'],
                 'google_rank': google_rank
             }
             
-            # Extract meta description
-            meta_desc = soup.find('meta', {'name': ['description', 'Description']})
-            if meta_desc:
-                content['meta_description'] = meta_desc.get('content', '').strip()
-
             # Extract headings
-            for i in range(1, 7):
-                content[f'h{i}'] = [h.get_text().strip() for h in soup.find_all(f'h{i}') if h.get_text().strip()]
+            for tag in HEADING_TAGS:
+                content[tag] = parsed[tag]
 
             # Extract tables with new method
             tables = []
-            for table in soup.find_all('table'):
-                try:
-                    df = self.extract_tables(table)
-                    if df is not None:
-                        tables.append(df.to_dict('records'))
-                except:
-                    continue
+            max_tables = CONFIG['MAX_TABLES_PER_PAGE']
+            if len(parsed['tables']) > max_tables:
+                logger.warning(f"{url} has {len(parsed['tables'])} tables, extracting the first {max_tables}")
+            for table in parsed['tables'][:max_tables]:
+                records = self.extract_tables(table)
+                if records is not None:
+                    tables.append(flatten_columns(records))
             content['tables'] = tables
 
-            # Extract main content
-            main_content = []
-            for p in soup.find_all(['p', 'article', 'section', 'div']):
-                text = p.get_text().strip()
-                if text and len(text) > 50:
-                    main_content.append(text)
-            content['main_content'] = '\n\n'.join(main_content)
-
             # Calculate content score
             content['content_score'] = self.calculate_content_score(content, google_rank)
 
@@ -136,95 +158,236 @@ class ContentScraper:
             logger.error(f"Error extracting content from {url}: {str(e)}")
             return None
 
+    @staticmethod
+    def content_row(url, content):
+        """ردیف خروجی اکسل برای محتوای یک URL"""
+        return {
+            'URL': url,
+            'Google Rank': content.get('google_rank', 0),
+            'Content Score': content.get('content_score', 0),
+            'Title': content['title'],
+            'Meta Description': content['meta_description'],
+            'H1': ' | '.join(content['h1']),
+            'H2': ' | '.join(content['h2']),
+            'H3': ' | '.join(content['h3']),
+            'H4': ' | '.join(content['h4']),
+            'H5': ' | '.join(content['h5']),
+            'H6': ' | '.join(content['h6']),
+            'Main Content': content['main_content'],
+            'Tables': json.dumps(content['tables'], ensure_ascii=False),
+            'Timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+
+    def result_sink(self, excel_file):
+        sink = self.result_sinks.get(str(excel_file))
+        if sink is None:
+            sink = self.result_sinks[str(excel_file)] = ResultSink(excel_file)
+        return sink
+
     def save_content_to_excel(self, url, content, excel_file):
-        """ذخیره محتوا در اکسل با اضافه کردن رتبه و امتیاز"""
+        """
+        افزودن محتوا به sink فایل اکسل (هر رکورد یک بار نوشته می‌شود).
+        خود اکسل با build_workbook یک بار در پایان ساخته می‌شود.
+        """
         try:
             if not content:
                 logger.warning(f"No content to save for {url}")
                 return
 
-            data = {
-                'URL': [url],
-                'Google Rank': [content.get('google_rank', 0)],
-                'Content Score': [content.get('content_score', 0)],
-                'Title': [content['title']],
-                'Meta Description': [content['meta_description']],
-                'H1': [' | '.join(content['h1'])],
-                'H2': [' | '.join(content['h2'])],
-                'H3': [' | '.join(content['h3'])],
-                'H4': [' | '.join(content['h4'])],
-                'H5': [' | '.join(content['h5'])],
-                'H6': [' | '.join(content['h6'])],
-                'Main Content': [content['main_content']],
-                'Tables': [json.dumps(content['tables'], ensure_ascii=False)],
-                'Timestamp': [datetime.now().strftime('%Y-%m-%d %H:%M:%S')]
-            }
-            
-            df = pd.DataFrame(data)
-            
-            excel_path = Path(excel_file)
-            if (excel_path.exists()):
-                try:
-                    existing_df = pd.read_excel(excel_path)
-                    existing_df = existing_df[existing_df['URL'] != url]
-                    df = pd.concat([existing_df, df], ignore_index=True)
-                except Exception as e:
-                    logger.error(f"Error reading existing Excel file: {str(e)}")
-            
-            with pd.ExcelWriter(excel_path, engine='xlsxwriter') as writer:
-                df.to_excel(writer, index=False, sheet_name='Content')
-                
-                # Format worksheet
-                workbook = writer.book
-                worksheet = writer.sheets['Content']
-                
-                # Add formats
-                header_format = workbook.add_format({
-                    'bold': True,
-                    'text_wrap': True,
-                    'valign': 'top',
-                    'bg_color': '#D9EAD3',
-                    'border': 1
-                })
-                
-                # Format headers and column widths
-                for idx, col in enumerate(df.columns):
-                    worksheet.write(0, idx, col, header_format)
-                    if col in ['URL', 'Title', 'Meta Description']:
-                        worksheet.set_column(idx, idx, 40)
-                    elif col in ['Main Content']:
-                        worksheet.set_column(idx, idx, 60)
-                    else:
-                        worksheet.set_column(idx, idx, 30)
-
-            logger.info(f"Content saved to {excel_file}")
+            self.result_sink(excel_file).append(self.content_row(url, content))
+            logger.debug(f"Content for {url} appended to {excel_file}")
 
         except Exception as e:
             logger.error(f"Error saving content to Excel: {str(e)}")
 
+    def build_workbook(self, excel_file):
+        """ساخت اکسل قالب‌بندی‌شده از ردیف‌های sink؛ فایل sink بعد از آن بسته می‌شود (append بعدی بازش می‌کند)"""
+        sink = self.result_sink(excel_file)
+        try:
+            return sink.build_workbook()
+        except Exception as e:
+            logger.error(f"Error writing Excel file {excel_file}: {str(e)}")
+            return 0
+        finally:
+            sink.close()
+
+    def cached_content(self, page, google_rank=0):
+        """محتوای استخراج‌شده قبلی برای همین هش محتوا (صفحه تکراری یا 304)، یا None"""
+        cache = self.page_cache
+        if not (cache and page.content_hash):
+            return None
+        content = cache.get_extracted(page.content_hash, EXTRACTION_VERSION)
+        if content is not None:
+            content['url'] = page.url
+            content = self.with_rank(content, google_rank)
+        return content
+
+    def with_rank(self, content, google_rank):
+        """کپی محتوای استخراج‌شده با رتبه و امتیاز یک task (برای task های دیگر همان URL بدون پارس دوباره)"""
+        content = dict(content, google_rank=google_rank)
+        content['content_score'] = self.calculate_content_score(content, google_rank)
+        return content
+
+    def remember_content(self, page, content):
+        """ذخیره نتیجه استخراج در کش بر اساس هش محتوا"""
+        if content and self.page_cache and page.content_hash:
+            self.page_cache.put_extracted(page.content_hash, EXTRACTION_VERSION, content)
+
+    def extract_page(self, page, google_rank=0):
+        """استخراج محتوای FetchedPage؛ برای محتوای تکراری یا 304 از نتیجه کش‌شده استفاده می‌شود"""
+        content = self.cached_content(page, google_rank)
+        if content is None:
+            content = self.extract_content(page.html, page.url, google_rank)
+            self.remember_content(page, content)
+        return content
+
+    def store_content(self, url, content, excel_file, db_manager=None, keyword_id=None, google_rank=0, html=None,
+                      on_stored=None):
+        """
+        ذخیره محتوای استخراج‌شده در اکسل و دیتابیس (HTML خام در صورت وجود به page store می‌رود).
+        on_stored(error) بعد از commit ردیف دیتابیس صدا زده می‌شود (بدون دیتابیس، بعد از اکسل).
+        """
+        self.save_content_to_excel(url, content, excel_file)
+
+        # Save to database if database manager is provided
+        if db_manager and keyword_id:
+            logger.info(f"Saving to database: {url} (Keyword ID: {keyword_id}, Rank: {google_rank})")
+            if html and self.page_store:
+                # HTML بعد از مقایسه اثر انگشت و فقط برای ردیف تغییرکرده به page store می‌رود (url_data_row)
+                content = dict(content, html=html)
+            db_manager.insert_url_data(keyword_id, content, on_stored=on_stored)
+        else:
+            logger.warning("Database manager or keyword_id not provided")
+            if on_stored:
+                on_stored(None)
+
+    def store_tasks(self, tasks, page, content, excel_file, db_manager=None, error='extraction failed'):
+        """
+        ذخیره محتوای یک صفحه برای همه task های همان URL (هر task با رتبه و امتیاز خودش)؛
+        تعداد ذخیره‌شده‌ها را برمی‌گرداند. بدون محتوا همه task ها با error ناموفق ثبت می‌شوند.
+        """
+        stored = 0
+        for task in tasks:
+            if not content:
+                self.mark_task(task, 'failed', error)
+                continue
+            google_rank = task.get('google_rank', 0)
+            try:
+                self.mark_task(task, 'parsed')
+                self.store_content(
+                    page.url, self.with_rank(content, google_rank), excel_file, db_manager,
+                    task.get('keyword_id'), google_rank, html=page.html, on_stored=self.stored_callback(task)
+                )
+                stored += 1
+            except Exception as e:
+                logger.error(f"Error storing content from {task['url']}: {str(e)}")
+                self.mark_task(task, 'failed', e)
+        return stored
+
+    def process_page(self, url, page, excel_file, db_manager=None, keyword_id=None, google_rank=0):
+        """استخراج، ذخیره در اکسل و دیتابیس برای صفحه دریافت‌شده (FetchedPage یا متن HTML)"""
+        if not page:
+            return False
+        if isinstance(page, str):
+            page = FetchedPage(url, page, 'miss', None, len(page))
+        content = self.extract_page(page, google_rank)
+        if not content:
+            return False
+        self.store_content(url, content, excel_file, db_manager, keyword_id, google_rank, html=page.html)
+        return True
+
     def scrape_content_from_url(self, url, excel_file, db_manager=None, keyword_id=None, google_rank=0):
         """اسکرپ محتوای یک URL و ذخیره در اکسل و دیتابیس"""
         try:
             logger.info(f"Scraping content from: {url} (Rank: {google_rank})")
-            html_content = self.fetch_page_content(url)
-            if html_content:
-                content = self.extract_content(html_content, url, google_rank)
-                if content:
-                    self.save_content_to_excel(url, content, excel_file)
-                    
-                    # Save to database if database manager is provided
-                    if db_manager and keyword_id:
-                        logger.info(f"Saving to database: {url} (Keyword ID: {keyword_id}, Rank: {google_rank})")
-                        db_manager.insert_url_data(keyword_id, content)
-                    else:
-                        logger.warning("Database manager or keyword_id not provided")
-                    
-                    return True
-            return False
+            [(_, page)] = self.fetch_engine.run([url])
+            saved = self.process_page(url, page, excel_file, db_manager, keyword_id, google_rank)
+            if saved:
+                self.build_workbook(excel_file)
+            return saved
         except Exception as e:
             logger.error(f"Error scraping content from {url}: {str(e)}")
             return False
 
+    def mark_task(self, task, state, error=None):
+        """ثبت وضعیت کار در دفتر کارها (فقط task هایی که از JobLedger آمده‌اند کلید keyword دارند)"""
+        if self.ledger is not None and 'keyword' in task:
+            try:
+                self.ledger.mark_url(task, state, error)
+            except Exception as e:
+                logger.error(f"Error updating job ledger for {task['url']}: {str(e)}")
+
+    def stored_callback(self, task):
+        """
+        on_stored برای store_content: وضعیت stored فقط بعد از commit ردیف ثبت می‌شود تا
+        اگر پروسس وسط کار از بین برود، ادامه اجرا ردیف‌های commit نشده را دوباره انجام دهد
+        """
+        def on_stored(error):
+            if error is None:
+                self.mark_task(task, 'stored')
+            else:
+                self.mark_task(task, 'failed', error)
+        return on_stored
+
+    def _scrape_inline(self, tasks_by_url, excel_file, db_manager=None):
+        """پارس و ذخیره روی همان thread حلقه دریافت (بدون ProcessPool)"""
+        processed = 0
+
+        def handle_result(url, page):
+            nonlocal processed
+            tasks = tasks_by_url[url]
+            if not page:
+                self.store_tasks(tasks, page, None, excel_file, db_manager, 'fetch failed')
+                return
+            for task in tasks:
+                self.mark_task(task, 'fetched')
+            # هر URL یک بار پارس می‌شود، حتی اگر برای چند کلمه کلیدی آمده باشد
+            content, error = None, 'extraction failed'
+            try:
+                content = self.extract_page(page, tasks[0].get('google_rank', 0))
+            except Exception as e:
+                logger.error(f"Error scraping content from {url}: {str(e)}")
+                error = e
+            processed += self.store_tasks(tasks, page, content, excel_file, db_manager, error)
+
+        self.fetch_engine.run(list(tasks_by_url), on_result=handle_result)
+        return processed
+
+    def scrape_urls(self, tasks, excel_file, db_manager=None, ledger=None):
+        """
+        اسکرپ همزمان چند URL با موتور دریافت async.
+        tasks لیستی از دیکشنری‌ها با کلیدهای url، google_rank و keyword_id است؛
+        با ledger وضعیت هر task (fetched / parsed / stored / failed) در دفتر کارها ثبت می‌شود.
+        """
+        self.ledger = ledger
+        tasks_by_url = {}
+        for task in tasks:
+            tasks_by_url.setdefault(task['url'], []).append(task)
+
+        logger.info(f"Fetching {len(tasks_by_url)} unique URLs")
+        # ردیف‌های دیتابیس در یک thread نویسنده و به صورت دسته‌ای commit می‌شوند
+        with (db_manager.writer() if db_manager else nullcontext()) as db_writer:
+            if self.parse_workers:
+                if self.parse_pipeline is None:
+                    self.parse_pipeline = ParsePipeline(self)
+                processed = self.parse_pipeline.run(tasks_by_url, excel_file, db_writer)
+            else:
+                processed = self._scrape_inline(tasks_by_url, excel_file, db_writer)
+        if self.page_store:
+            # ارجاع html_ref بدون دیتابیس فقط در اکسل است
+            self.page_store.flush()
+        self.build_workbook(excel_file)
+
+        logger.info(self.fetch_engine.stats.summary())
+        logger.info(session_stats().summary())
+        if self.page_cache:
+            logger.info(self.page_cache.summary())
+        if self.page_store:
+            logger.info(self.page_store.summary())
+        if db_manager:
+            logger.info(db_manager.change_summary())
+        return processed
+
     def scrape_content_from_excel(self, input_excel_file, output_excel_file, db_manager=None):
         """اسکرپ محتوای لینک‌ها از فایل اکسل با پشتیبانی از دیتابیس"""
         try:
@@ -232,31 +395,42 @@ class ContentScraper:
             df = pd.read_excel(input_excel_file)
             
             if 'link' in df.columns and 'keyword' in df.columns:
-                unique_links = df[['link', 'keyword']].drop_duplicates()
+                unique_links = df.drop_duplicates(subset=['link', 'keyword'])
+                has_rank = 'google_rank' in df.columns
                 total_links = len(unique_links)
                 logger.info(f"Found {total_links} unique links to process")
                 
+                tasks = []
+                keyword_ids = {}
                 for _, row in unique_links.iterrows():
                     url = row['link']
                     keyword = row['keyword']
                     
                     # Get keyword_id if database manager is provided
-                    keyword_id = None
-                    if db_manager:
-                        keyword_id = db_manager.get_keyword_id(keyword)
+                    if db_manager and keyword not in keyword_ids:
+                        keyword_ids[keyword] = db_manager.get_keyword_id(keyword)
                     
                     logger.info(f"Processing link for keyword '{keyword}': {url}")
-                    self.scrape_content_from_url(
-                        url=url,
-                        excel_file=output_excel_file,
-                        db_manager=db_manager,
-                        keyword_id=keyword_id
-                    )
-                    time.sleep(random.uniform(2, 4))
+                    tasks.append({
+                        'url': url,
+                        'keyword_id': keyword_ids.get(keyword),
+                        'google_rank': int(row['google_rank']) if has_rank and pd.notna(row['google_rank']) else 0
+                    })
+
+                self.scrape_urls(tasks, output_excel_file, db_manager=db_manager)
                 
                 logger.info("Content scraping completed successfully")
             else:
                 logger.error("Required columns 'link' and 'keyword' not found in the Excel file")
                 
         except Exception as e:
-            logger.error(f"Error processing Excel file: {str(e)}")
\ No newline at end of file
+            logger.error(f"Error processing Excel file: {str(e)}")
+
+    def close(self):
+        """بستن پروسس‌های پارس و فایل‌های sink"""
+        if self.parse_pipeline is not None:
+            self.parse_pipeline.close()
+            self.parse_pipeline = None
+        for sink in self.result_sinks.values():
+            sink.close()
+        self.result_sinks = {}
\ No newline at end of file
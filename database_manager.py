@@ -1,26 +1,80 @@
 import sqlite3
+import queue
+import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
 import pandas as pd
-from typing import Optional
+from typing import Iterable, Optional, Tuple
 from config import CONFIG, get_logger
 import json  # اضافه شده برای تبدیل داده‌های headers به JSON
+import hashlib
+import schema
+from page_store import get_page_store, resolve_main_content
 
 logger = get_logger(__name__)
 
+INSERT_URL = '''
+    INSERT INTO urls
+    (keyword_id, url, title, meta_description, google_rank, content_score, main_content, html_ref, content_ref,
+     content_length, table_count, fingerprint)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+INSERT_HEADING = "INSERT INTO url_headings (url_id, level, position, text) VALUES (?, ?, ?, ?)"
+UPDATE_URL = '''
+    UPDATE urls
+    SET title = ?, meta_description = ?, content_score = ?, main_content = ?, content_ref = ?,
+        content_length = ?, table_count = ?, fingerprint = ?
+    WHERE id = ?
+'''
+# صفحه بدون تغییر: فقط رتبه، امتیاز و زمان مشاهده
+UPDATE_SEEN = '''
+    UPDATE urls SET google_rank = ?, content_score = ?, last_seen_at = CURRENT_TIMESTAMP
+    WHERE id = ?
+'''
+INSERT_SEEN = "INSERT OR REPLACE INTO url_seen (url_id, seen_at, google_rank) VALUES (?, CURRENT_TIMESTAMP, ?)"
+
+
+def content_fingerprint(content: dict) -> str:
+    """
+    هش محتوای نرمال‌شده (عنوان، توضیحات، عنوان‌ها، متن اصلی و جدول‌ها با فاصله‌های یکسان و حروف کوچک)؛
+    تغییرات قالب صفحه که متن استخراج‌شده را عوض نمی‌کنند اثر انگشت را هم عوض نمی‌کنند
+    """
+    parts = [content.get('title') or '', content.get('meta_description') or '']
+    for tag in schema.HEADING_LEVELS:
+        parts.append(' | '.join(content.get(tag) or []))
+    parts.append(content.get('main_content') or '')
+    parts.append(json.dumps(content.get('tables') or [], ensure_ascii=False, sort_keys=True, default=str))
+    normalized = '\x1f'.join(' '.join(part.split()).casefold() for part in parts)
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
 class DatabaseManager:
-    def __init__(self):
+    def __init__(self, db_path: Optional[str] = None):
         try:
             # خواندن مسیر دیتابیس از config
-            self.db_path = Path(CONFIG['DB_PATH'])
+            self.db_path = Path(db_path or CONFIG['DB_PATH'])
             self.db_path.parent.mkdir(parents=True, exist_ok=True)
             
-            # اتصال به دیتابیس
-            self.conn = sqlite3.connect(str(self.db_path))
+            # اتصال به دیتابیس؛ دسترسی از threadها (مثل DatabaseWriter) با self.lock سریال می‌شود
+            # schema.connect کلید خارجی را فعال و migration های باقی‌مانده را اجرا می‌کند
+            self.conn = schema.connect(self.db_path, check_same_thread=False)
             self.cursor = self.conn.cursor()
+            self.lock = threading.RLock()
             
-            # فعال‌سازی قوانین foreign key
-            self.cursor.execute("PRAGMA foreign_keys = ON")
-            self._create_tables()
+            # WAL: نوشتن بدون fsync برای هر commit و خواندن همزمان با نوشتن
+            self.cursor.execute(f"PRAGMA journal_mode = {CONFIG['DB_JOURNAL_MODE']}")
+            self.cursor.execute(f"PRAGMA synchronous = {CONFIG['DB_SYNCHRONOUS']}")
+            self.cursor.execute(f"PRAGMA cache_size = -{int(CONFIG['DB_CACHE_SIZE_KB'])}")
+            self.cursor.execute("PRAGMA temp_store = MEMORY")
+            
+            # HTML خام و متن اصلی فشرده در page store؛ ردیف فقط ارجاع را نگه می‌دارد
+            self.page_store = get_page_store()
+            
+            # آمار تشخیص تغییر: صفحه بدون تغییر فقط زمان مشاهده می‌گیرد
+            self.rows_written = 0
+            self.rows_unchanged = 0
+            self.bytes_skipped = 0
             
             logger.info(f"Database initialized at {self.db_path}")
             
@@ -30,54 +84,31 @@ class DatabaseManager:
             self.cursor = None
             raise
 
-    def _create_tables(self):
-        """ساخت جدول‌ها در صورت عدم وجود"""
-        # جدول keywords
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS keywords (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                keyword TEXT UNIQUE NOT NULL
-            )
-        ''')
-        
-        # جدول scraped_data
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS scraped_data (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                keyword_id INTEGER NOT NULL,
-                url TEXT NOT NULL,
-                title TEXT,
-                description TEXT,
-                headers TEXT,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (keyword_id) REFERENCES keywords(id) ON DELETE CASCADE
-            )
-        ''')
-        self.conn.commit()
-
     def get_keyword_id(self, keyword: str) -> int:
         """دریافت یا ایجاد شناسه برای کلمه کلیدی"""
-        self.cursor.execute('SELECT id FROM keywords WHERE keyword = ?', (keyword,))
-        result = self.cursor.fetchone()
-        if result:
-            return result[0]
-        else:
-            self.cursor.execute('INSERT INTO keywords (keyword) VALUES (?)', (keyword,))
-            self.conn.commit()
-            return self.cursor.lastrowid
+        with self.lock:
+            self.cursor.execute('SELECT id FROM keywords WHERE keyword = ?', (keyword,))
+            result = self.cursor.fetchone()
+            if result:
+                return result[0]
+            else:
+                self.cursor.execute('INSERT INTO keywords (keyword) VALUES (?)', (keyword,))
+                self.conn.commit()
+                return self.cursor.lastrowid
 
     def insert_keyword(self, keyword: str) -> int:
         """درج کلمه کلیدی جدید و برگرداندن شناسه آن"""
-        try:
-            self.cursor.execute('INSERT INTO keywords (keyword) VALUES (?)', (keyword,))
-            self.conn.commit()
-            return self.cursor.lastrowid
-        except sqlite3.IntegrityError:  # اگر کلمه کلیدی تکراری باشد
-            self.cursor.execute('SELECT id FROM keywords WHERE keyword = ?', (keyword,))
-            return self.cursor.fetchone()[0]
-        except Exception as e:
-            logger.error(f"Error inserting keyword: {str(e)}")
-            return None
+        with self.lock:
+            try:
+                self.cursor.execute('INSERT INTO keywords (keyword) VALUES (?)', (keyword,))
+                self.conn.commit()
+                return self.cursor.lastrowid
+            except sqlite3.IntegrityError:  # اگر کلمه کلیدی تکراری باشد
+                self.cursor.execute('SELECT id FROM keywords WHERE keyword = ?', (keyword,))
+                return self.cursor.fetchone()[0]
+            except Exception as e:
+                logger.error(f"Error inserting keyword: {str(e)}")
+                return None
 
     def insert_link_data(
         self, 
@@ -87,42 +118,236 @@ class DatabaseManager:
         description: Optional[str] = None, 
         headers: Optional[str] = None
     ):
-        """درج داده‌های استخراج‌شده"""
+        """درج داده‌های استخراج‌شده (headers رشته JSON عنوان‌ها به شکل {'h1': [...], ...})"""
+        try:
+            headings = json.loads(headers) if headers else {}
+        except ValueError:
+            headings = {}
+        row = (keyword_id, url, title, description, None, None, None, None, None, None, None, None)
         try:
-            self.cursor.execute('''
-                INSERT INTO scraped_data 
-                (keyword_id, url, title, description, headers)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (keyword_id, url, title, description, headers))
-            self.conn.commit()
+            self._insert_rows([(row, headings)])
             logger.info(f"Data inserted for URL: {url}")
         except sqlite3.Error as e:
             logger.error(f"Database error: {str(e)}")
-            self.conn.rollback()
 
-    def insert_url_data(self, keyword_id: int, content: dict):
-        """درج داده‌های لینک استخراج‌شده در دیتابیس"""
+    def url_data_row(self, keyword_id: int, content: dict) -> Tuple[tuple, dict]:
+        """
+        ردیف urls و عنوان‌های محتوای استخراج‌شده یک لینک.
+        با page store فعال، main_content و HTML خام (کلید 'html') فشرده ذخیره و فقط ارجاعشان درج می‌شود
+        (ارجاع‌های آماده در html_ref / content_ref همان‌طور درج می‌شوند).
+        """
+        main_content = content.get('main_content')
+        # ویژگی‌های امتیاز که از url_headings به دست نمی‌آیند (batch_scoring)
+        content_length = len(main_content) if main_content is not None else None
+        table_count = len(content['tables']) if content.get('tables') is not None else None
+        html_ref = content.get('html_ref')
+        content_ref = content.get('content_ref')
+        if self.page_store:
+            if content.get('html') and not html_ref:
+                html_ref = str(self.page_store.put(content['html'], 'html'))
+            if main_content and not content_ref:
+                content_ref = str(self.page_store.put(main_content, 'text'))
+        if content_ref:
+            main_content = None
+        row = (
+            keyword_id,
+            content.get('url', ''),
+            content.get('title', ''),
+            content.get('meta_description', ''),
+            content.get('google_rank'),
+            content.get('content_score'),
+            main_content,
+            html_ref,
+            content_ref,
+            content_length,
+            table_count,
+            content.get('fingerprint') or content_fingerprint(content)
+        )
+        headings = {tag: content.get(tag, []) for tag in schema.HEADING_LEVELS}
+        return row, headings
+
+    def _commit(self):
+        """commit ردیف‌ها؛ index بدنه‌هایی که ارجاعشان در این ردیف‌هاست پیش از آن commit می‌شود"""
+        if self.page_store:
+            self.page_store.flush()
+        self.conn.commit()
+
+    def _insert_rows(self, rows) -> int:
+        """درج ردیف‌های (row, headings) در urls و url_headings در یک تراکنش؛ در خطا rollback و sqlite3.Error"""
+        if not rows:
+            return 0
+        with self.lock:
+            try:
+                self.cursor.executemany(INSERT_URL, [row for row, _ in rows])
+                # شناسه‌ها در همین تراکنش نوشتن پشت سر هم هستند (max(id) + 1 برای هر ردیف)
+                last_id = self.cursor.execute("SELECT MAX(id) FROM urls").fetchone()[0]
+                first_id = last_id - len(rows) + 1
+                heading_rows = []
+                for offset, (_, headings) in enumerate(rows):
+                    heading_rows.extend(schema.heading_rows(first_id + offset, headings))
+                self.cursor.executemany(INSERT_HEADING, heading_rows)
+                self._commit()
+                return len(rows)
+            except sqlite3.Error:
+                self.conn.rollback()
+                raise
+
+    def _split_unchanged(self, items):
+        """
+        جدا کردن محتواهایی که اثر انگشتشان با آخرین نسخه همان URL و کلمه کلیدی یکی است.
+        خروجی: (تغییرکرده‌ها با کلید fingerprint، [(url_id, google_rank, content_score), ...])
+        """
+        changed = []
+        seen = []
+        batch_fingerprints = {}
+        with self.lock:
+            for keyword_id, content in items:
+                fingerprint = content_fingerprint(content)
+                key = (content.get('url', ''), keyword_id)
+                if key in batch_fingerprints:
+                    previous = (None, batch_fingerprints[key])
+                else:
+                    try:
+                        previous = self.cursor.execute(schema.LATEST_FINGERPRINT_QUERY, key).fetchone()
+                    except sqlite3.Error as e:
+                        # مثلا database is locked وقتی rescore یا batch_scoring دیتابیس را گرفته؛ ردیف تغییرکرده حساب می‌شود
+                        logger.error(f"Database error: {str(e)}")
+                        previous = None
+                batch_fingerprints[key] = fingerprint
+                if CONFIG['CHANGE_DETECTION'] and previous and previous[1] == fingerprint:
+                    self.rows_unchanged += 1
+                    self.bytes_skipped += len(content.get('main_content') or '') + len(content.get('html') or '')
+                    if previous[0] is not None:
+                        seen.append((previous[0], content.get('google_rank'), content.get('content_score')))
+                    continue
+                changed.append((keyword_id, dict(content, fingerprint=fingerprint)))
+        return changed, seen
+
+    def _mark_seen(self, seen) -> int:
+        """ثبت مشاهده صفحه‌های بدون تغییر (رتبه و امتیاز فعلی، بدون ردیف جدید)؛ در خطا rollback و sqlite3.Error"""
+        if not seen:
+            return 0
+        with self.lock:
+            try:
+                self.cursor.executemany(UPDATE_SEEN, [(rank, score, url_id) for url_id, rank, score in seen])
+                self.cursor.executemany(INSERT_SEEN, [(url_id, rank) for url_id, rank, _ in seen])
+                self.conn.commit()
+                return len(seen)
+            except sqlite3.Error:
+                self.conn.rollback()
+                raise
+
+    def _write_url_data(self, items) -> int:
+        """درج نسخه‌های تغییرکرده و ثبت مشاهده بقیه؛ تعداد ردیف‌های درج‌شده را برمی‌گرداند"""
+        changed, seen = self._split_unchanged(items)
+        self._mark_seen(seen)
+        inserted = self._insert_rows([self.url_data_row(keyword_id, content) for keyword_id, content in changed])
+        self.rows_written += inserted
+        return inserted
+
+    def insert_url_data(self, keyword_id: int, content: dict, on_stored=None):
+        """
+        درج داده‌های لینک استخراج‌شده در دیتابیس (صفحه بدون تغییر فقط زمان مشاهده می‌گیرد).
+        on_stored(error) بعد از commit با None و در صورت خطا با همان خطا صدا زده می‌شود.
+        """
         try:
-            url = content.get('url', '')
-            title = content.get('title', '')
-            description = content.get('meta_description', '')
-            headers = json.dumps({
-                'h1': content.get('h1', []),
-                'h2': content.get('h2', []),
-                'h3': content.get('h3', []),
-                'h4': content.get('h4', []),
-                'h5': content.get('h5', []),
-                'h6': content.get('h6', [])
-            }, ensure_ascii=False)
-            self.insert_link_data(keyword_id, url, title, description, headers)
+            if self._write_url_data([(keyword_id, content)]):
+                logger.info(f"Data inserted for URL: {content.get('url', '')}")
+            else:
+                logger.info(f"Unchanged since last run, marked as seen: {content.get('url', '')}")
         except Exception as e:
             logger.error(f"Error inserting URL data: {str(e)}")
+            _notify(on_stored, e)
+        else:
+            _notify(on_stored, None)
+
+    def bulk_insert_url_data(self, items: Iterable[Tuple[int, dict]]) -> int:
+        """
+        درج گروهی (keyword_id, content) در یک تراکنش؛ تعداد ردیف‌های درج‌شده را برمی‌گرداند.
+        خطای دیتابیس (بعد از rollback) به فراخواننده می‌رسد.
+        """
+        inserted = self._write_url_data(list(items))
+        if inserted:
+            logger.info(f"Data inserted for {inserted} URLs")
+        return inserted
+
+    def changed_since(self, since) -> pd.DataFrame:
+        """نسخه‌های جدید (صفحه تازه یا محتوای تغییرکرده) از زمان since ('YYYY-MM-DD[ HH:MM:SS]' به UTC)"""
+        with self.lock:
+            return pd.read_sql_query(schema.CHANGED_SINCE_QUERY, self.conn, params=(str(since),))
+
+    def change_summary(self) -> str:
+        total = self.rows_written + self.rows_unchanged
+        return (
+            f"Change detection: {self.rows_written} new or changed rows written, "
+            f"{self.rows_unchanged} of {total} pages unchanged and only marked as seen "
+            f"({self.bytes_skipped / 1024 / 1024:.1f} MB of main text not stored again)"
+        )
+
+    def bulk_update_url_data(self, items: Iterable[Tuple[int, dict]]) -> int:
+        """
+        به‌روزرسانی گروهی (url_id, content) بعد از استخراج دوباره در یک تراکنش:
+        عنوان، توضیحات، امتیاز، متن اصلی و عنوان‌ها جایگزین می‌شوند (رتبه و html_ref ثابت می‌مانند)
+        """
+        updates = []
+        heading_rows = []
+        for url_id, content in items:
+            row, headings = self.url_data_row(None, content)
+            _, _, title, meta_description, _, content_score, main_content, _, content_ref, length, tables, fp = row
+            updates.append((
+                title, meta_description, content_score, main_content, content_ref, length, tables, fp, url_id
+            ))
+            heading_rows.extend(schema.heading_rows(url_id, headings))
+        if not updates:
+            return 0
+        with self.lock:
+            try:
+                self.cursor.executemany(UPDATE_URL, updates)
+                self.cursor.executemany(
+                    "DELETE FROM url_headings WHERE url_id = ?", [(update[-1],) for update in updates]
+                )
+                self.cursor.executemany(INSERT_HEADING, heading_rows)
+                self._commit()
+                return len(updates)
+            except sqlite3.Error as e:
+                logger.error(f"Database error: {str(e)}")
+                self.conn.rollback()
+                return 0
+
+    @contextmanager
+    def batch(self, size: Optional[int] = None, seconds: Optional[float] = None):
+        """
+        درج دسته‌ای روی همان thread:
+            with db_manager.batch() as batch:
+                batch.insert_url_data(keyword_id, content)
+        در رسیدن به size ردیف یا گذشت seconds ثانیه و در پایان بلوک commit می‌شود.
+        """
+        batch = InsertBatch(self, size, seconds)
+        try:
+            yield batch
+        finally:
+            batch.flush()
+
+    @contextmanager
+    def writer(self, size: Optional[int] = None, seconds: Optional[float] = None):
+        """
+        نویسنده اختصاصی در thread جدا برای خط لوله همزمان:
+            with db_manager.writer() as db_writer:
+                db_writer.insert_url_data(keyword_id, content)  # از هر thread
+        """
+        db_writer = DatabaseWriter(self, size, seconds)
+        try:
+            yield db_writer
+        finally:
+            db_writer.close()
 
     def export_to_excel(self):
         """خروجی اکسل از دیتابیس"""
         try:
-            keywords_df = pd.read_sql_query("SELECT * FROM keywords", self.conn)
-            scraped_df = pd.read_sql_query("SELECT * FROM scraped_data", self.conn)
+            with self.lock:
+                keywords_df = pd.read_sql_query("SELECT * FROM keywords", self.conn)
+                scraped_df = pd.read_sql_query(schema.URLS_EXPORT_QUERY, self.conn)
+            scraped_df = resolve_main_content(scraped_df, self.page_store)
             
             with pd.ExcelWriter(CONFIG['DB_EXPORT_PATH']) as writer:
                 keywords_df.to_excel(writer, sheet_name='Keywords', index=False)
@@ -138,10 +363,135 @@ class DatabaseManager:
         """بستن امن اتصال"""
         try:
             if self.conn:
-                self.conn.close()
+                with self.lock:
+                    self.conn.close()
+                self.conn = None
                 logger.info("Database connection closed")
         except Exception as e:
             logger.error(f"Error closing database: {str(e)}")
 
     def __del__(self):
         self.close()
+
+
+def _notify(on_stored, error):
+    if on_stored is None:
+        return
+    try:
+        on_stored(error)
+    except Exception as e:
+        logger.error(f"Error in on_stored callback: {str(e)}")
+
+
+class InsertBatch:
+    """
+    جمع کردن ردیف‌ها و commit با آستانه تعداد یا زمان (روی thread فراخواننده).
+    on_stored هر ردیف بعد از commit دسته (یا شکست قطعی آن ردیف) صدا زده می‌شود.
+    """
+
+    def __init__(self, db_manager: DatabaseManager, size: Optional[int] = None, seconds: Optional[float] = None):
+        self.db_manager = db_manager
+        self.size = size or CONFIG['DB_BATCH_SIZE']
+        self.seconds = CONFIG['DB_BATCH_SECONDS'] if seconds is None else seconds
+        self.pending = []
+        self.started = time.monotonic()
+        self.inserted = 0
+        self.commits = 0
+        self.failed = 0
+
+    def insert_url_data(self, keyword_id: int, content: dict, on_stored=None):
+        self.pending.append((keyword_id, content, on_stored))
+        if self.due():
+            self.flush()
+
+    def due(self) -> bool:
+        if not self.pending:
+            return False
+        return len(self.pending) >= self.size or time.monotonic() - self.started >= self.seconds
+
+    def flush(self):
+        """
+        نوشتن ردیف‌های در انتظار در یک تراکنش. اگر تراکنش شکست بخورد ردیف‌ها یکی یکی
+        دوباره نوشته می‌شوند تا یک ردیف خراب بقیه دسته را از بین نبرد؛ ردیف‌های ناموفق شمرده و لاگ می‌شوند.
+        """
+        items, self.pending = self.pending, []
+        self.started = time.monotonic()
+        if not items:
+            return
+        try:
+            self.inserted += self.db_manager.bulk_insert_url_data(
+                (keyword_id, content) for keyword_id, content, _ in items
+            )
+            self.commits += 1
+        except Exception as e:
+            logger.error(f"Batch insert of {len(items)} rows failed, retrying row by row: {str(e)}")
+        else:
+            for _, _, on_stored in items:
+                _notify(on_stored, None)
+            return
+        for keyword_id, content, on_stored in items:
+            try:
+                self.inserted += self.db_manager.bulk_insert_url_data([(keyword_id, content)])
+                self.commits += 1
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Dropped row for URL {content.get('url', '')}: {str(e)}")
+                _notify(on_stored, e)
+            else:
+                _notify(on_stored, None)
+
+
+class DatabaseWriter:
+    """
+    تنها thread نویسنده: ردیف‌ها از هر thread در صف قرار می‌گیرند و این thread
+    آن‌ها را دسته‌ای (با همان آستانه‌های InsertBatch) در دیتابیس می‌نویسد.
+    """
+
+    _STOP = object()
+
+    def __init__(self, db_manager: DatabaseManager, size: Optional[int] = None, seconds: Optional[float] = None):
+        self.batch = InsertBatch(db_manager, size, seconds)
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+        self.thread.start()
+
+    def insert_url_data(self, keyword_id: int, content: dict, on_stored=None):
+        """on_stored(error) روی thread نویسنده، بعد از commit ردیف صدا زده می‌شود"""
+        self.queue.put((keyword_id, content, on_stored))
+
+    def _run(self):
+        batch = self.batch
+        while True:
+            timeout = max(batch.seconds - (time.monotonic() - batch.started), 0.01) if batch.pending else None
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if item is self._STOP:
+                # close() منتظر پایان thread است؛ حتی با خطای flush باید برگردیم
+                try:
+                    batch.flush()
+                except Exception as e:
+                    logger.error(f"Database writer error: {str(e)}")
+                return
+            try:
+                if item is not None:
+                    batch.pending.append(item)
+                if batch.due():
+                    batch.flush()
+            except Exception as e:
+                logger.error(f"Database writer error: {str(e)}")
+                batch.pending = []
+
+    @property
+    def inserted(self) -> int:
+        return self.batch.inserted
+
+    @property
+    def failed(self) -> int:
+        return self.batch.failed
+
+    def close(self):
+        """نوشتن ردیف‌های باقی‌مانده و توقف thread"""
+        self.queue.put(self._STOP)
+        self.thread.join()
@@ -1,18 +1,24 @@
-import sqlite3
+from contextlib import closing
 import pandas as pd
 from pathlib import Path
 from config import CONFIG, get_logger
+import schema
+from page_store import resolve_main_content
 
 logger = get_logger(__name__)
 
 class DatabaseViewer:
     def __init__(self):
-        self.db_path = Path(CONFIG['OUTPUT_DIR']) / 'seo_data.db'
+        self.db_path = Path(CONFIG['DB_PATH'])
+
+    def _connect(self):
+        """اتصال با schema به‌روز (migration ها در صورت نیاز اجرا می‌شوند)"""
+        return closing(schema.connect(self.db_path))
         
     def view_keywords(self):
         """نمایش تمام کلمات کلیدی"""
         try:
-            with sqlite3.connect(str(self.db_path)) as conn:
+            with self._connect() as conn:
                 query = '''
                 SELECT id, keyword, created_at 
                 FROM keywords 
@@ -27,31 +33,14 @@ class DatabaseViewer:
     def view_urls_for_keyword(self, keyword_id):
         """نمایش تمام URL‌های مربوط به یک کلمه کلیدی"""
         try:
-            with sqlite3.connect(str(self.db_path)) as conn:
-                query = '''
-                SELECT 
-                    u.url,
-                    u.title,
-                    u.meta_description,
-                    u.google_rank,
-                    u.content_score,
-                    u.h1,
-                    u.h2,
-                    u.h3,
-                    u.main_content,
-                    k.keyword,
-                    u.created_at
-                FROM urls u
-                JOIN keywords k ON u.keyword_id = k.id
-                WHERE k.id = ?
-                ORDER BY u.google_rank
-                '''
-                df = pd.read_sql_query(query, conn, params=(keyword_id,))
+            with self._connect() as conn:
+                df = pd.read_sql_query(schema.URLS_FOR_KEYWORD_QUERY, conn, params=(keyword_id,))
                 
-                # تبدیل JSON strings به لیست‌های قابل خواندن
+                # عنوان‌ها از url_headings به صورت 'a | b' برمی‌گردند
                 for col in ['h1', 'h2', 'h3']:
-                    df[col] = df[col].apply(lambda x: json.loads(x) if x else [])
-                    df[col] = df[col].apply(lambda x: ' | '.join(x) if x else '')
+                    df[col] = df[col].fillna('')
+                # متن اصلی از page store خوانده می‌شود (ستون content_ref)
+                df = resolve_main_content(df)
                 
                 # کوتاه کردن متن‌های طولانی برای نمایش بهتر
                 df['meta_description'] = df['meta_description'].str[:100] + '...'
@@ -65,28 +54,15 @@ class DatabaseViewer:
     def export_to_excel(self, keyword_id=None):
         """صدور اطلاعات به اکسل"""
         try:
-            with sqlite3.connect(str(self.db_path)) as conn:
+            with self._connect() as conn:
                 # Get all data with keyword information
-                query = '''
-                SELECT 
-                    k.keyword,
-                    u.url,
-                    u.title,
-                    u.description,
-                    u.meta_description,
-                    u.google_rank,
-                    u.content_score,
-                    u.h1,
-                    u.h2,
-                    u.created_at
-                FROM urls u
-                JOIN keywords k ON u.keyword_id = k.id
-                '''
+                query = schema.URLS_EXPORT_QUERY
                 if keyword_id:
-                    query += ' WHERE k.id = ?'
+                    query += ' WHERE u.keyword_id = ?'
                     df = pd.read_sql_query(query, conn, params=(keyword_id,))
                 else:
                     df = pd.read_sql_query(query, conn)
+                df = resolve_main_content(df)
 
                 # Save to Excel
                 output_file = Path(CONFIG['OUTPUT_DIR']) / 'database_export.xlsx'
@@ -97,10 +73,19 @@ class DatabaseViewer:
             logger.error(f"Error exporting data: {str(e)}")
             return None
 
+    def view_changed_since(self, since):
+        """صفحه‌های تازه یا دارای محتوای تغییرکرده از تاریخ since (صفحه‌های بدون تغییر ردیف جدید ندارند)"""
+        try:
+            with self._connect() as conn:
+                return pd.read_sql_query(schema.CHANGED_SINCE_QUERY, conn, params=(since,))
+        except Exception as e:
+            logger.error(f"Error viewing changes since {since}: {str(e)}")
+            return None
+
     def get_keyword_id(self, keyword):
         """دریافت شناسه کلمه کلیدی با استفاده از متن کلمه"""
         try:
-            with sqlite3.connect(str(self.db_path)) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 cursor.execute('SELECT id FROM keywords WHERE keyword = ?', (keyword,))
                 result = cursor.fetchone()
@@ -136,7 +121,8 @@ def main():
         print("1. نمایش تمام کلمات کلیدی")
         print("2. نمایش URL‌های یک کلمه کلیدی")
         print("3. صدور به اکسل")
-        print("4. خروج")
+        print("4. صفحه‌های تغییرکرده از یک تاریخ")
+        print("5. خروج")
         print("-" * 80)
         
         choice = input("\nلطفاً یک گزینه را انتخاب کنید: ")
@@ -205,6 +191,16 @@ def main():
                 print(f"\nداده‌ها در فایل زیر ذخیره شدند:\n{output_file}")
         
         elif choice == "4":
+            since = input("\nتاریخ را وارد کنید (YYYY-MM-DD): ").strip()
+            changes = viewer.view_changed_since(since)
+            if changes is not None and not changes.empty:
+                print(f"\n{len(changes)} نسخه جدید از {since}:")
+                print("-" * 80)
+                print(viewer.format_dataframe(changes))
+            else:
+                print("از این تاریخ تغییری ثبت نشده است!")
+        
+        elif choice == "5":
             break
 
 if __name__ == "__main__":
@@ -0,0 +1,165 @@
+"""
+Async fetch engine with a global concurrency limit and per-host politeness budgets
+"""
+
+import asyncio
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from config import CONFIG, get_logger
+
+logger = get_logger(__name__)
+
+
+class FetchStats:
+    """آمار توان عملیاتی یک اجرای موتور دریافت"""
+
+    def __init__(self):
+        self.started_at = None
+        self.finished_at = None
+        self.requested = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.bytes = 0
+        self.per_host = defaultdict(int)
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    @property
+    def elapsed(self):
+        if self.started_at is None:
+            return 0.0
+        end = self.finished_at if self.finished_at is not None else time.perf_counter()
+        return end - self.started_at
+
+    @property
+    def pages_per_second(self):
+        elapsed = self.elapsed
+        return self.succeeded / elapsed if elapsed > 0 else 0.0
+
+    def as_dict(self):
+        return {
+            'requested': self.requested,
+            'succeeded': self.succeeded,
+            'failed': self.failed,
+            'bytes': self.bytes,
+            'hosts': len(self.per_host),
+            'peak_in_flight': self.peak_in_flight,
+            'elapsed': round(self.elapsed, 3),
+            'pages_per_second': round(self.pages_per_second, 2),
+        }
+
+    def summary(self):
+        return (
+            f"Fetched {self.succeeded}/{self.requested} pages from {len(self.per_host)} hosts "
+            f"in {self.elapsed:.1f}s ({self.pages_per_second:.2f} pages/s, "
+            f"{self.bytes / 1024 / 1024:.2f} MB, peak concurrency {self.peak_in_flight}, "
+            f"{self.failed} failed)"
+        )
+
+
+class AsyncFetchEngine:
+    """
+    دریافت همزمان URLها با سقف همزمانی کلی و بودجه همزمانی/تاخیر برای هر هاست.
+    fetch_func یک تابع blocking است که URL را می‌گیرد و نتیجه (یا None) برمی‌گرداند
+    و در یک thread pool اجرا می‌شود.
+    """
+
+    def __init__(self, fetch_func, max_concurrency=None, per_host_concurrency=None, per_host_delay=None):
+        self.fetch_func = fetch_func
+        self.max_concurrency = max_concurrency or CONFIG['MAX_CONCURRENT_FETCHES']
+        self.per_host_concurrency = per_host_concurrency or CONFIG['PER_HOST_CONCURRENCY']
+        self.per_host_delay = CONFIG['PER_HOST_DELAY'] if per_host_delay is None else per_host_delay
+        # زمان شروع آخرین درخواست هر هاست؛ بین اجراها حفظ می‌شود تا تاخیر هاست رعایت شود
+        self._last_request = {}
+        self.stats = FetchStats()
+
+    @staticmethod
+    def host_of(url):
+        return urlparse(url).netloc.lower()
+
+    async def _wait_for_host(self, host, lock):
+        """رعایت فاصله زمانی بین درخواست‌های یک هاست"""
+        async with lock:
+            last = self._last_request.get(host)
+            now = time.monotonic()
+            if last is not None:
+                wait = last + self.per_host_delay - now
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                    now = time.monotonic()
+            self._last_request[host] = now
+
+    async def _fetch_one(self, url, global_sem, host_sems, host_locks, executor):
+        host = self.host_of(url)
+        loop = asyncio.get_running_loop()
+
+        # اول بودجه هاست، بعد سقف کلی؛ تا منتظرهای یک هاست ظرفیت کلی را اشغال نکنند
+        async with host_sems[host]:
+            await self._wait_for_host(host, host_locks[host])
+            async with global_sem:
+                self.stats.in_flight += 1
+                self.stats.peak_in_flight = max(self.stats.peak_in_flight, self.stats.in_flight)
+                try:
+                    result = await loop.run_in_executor(executor, self.fetch_func, url)
+                except Exception as e:
+                    logger.error(f"Error fetching {url}: {str(e)}")
+                    result = None
+                finally:
+                    self.stats.in_flight -= 1
+
+        if result is None:
+            self.stats.failed += 1
+        else:
+            self.stats.succeeded += 1
+            self.stats.per_host[host] += 1
+            if isinstance(result, (str, bytes)):
+                self.stats.bytes += len(result)
+            else:
+                self.stats.bytes += getattr(result, 'downloaded', 0) or 0
+        return url, result
+
+    async def fetch_all(self, urls, on_result=None):
+        """
+        دریافت همه URLها. اگر on_result داده شود، به ترتیب تکمیل با (url, result) صدا زده می‌شود
+        و نتایج نگه داشته نمی‌شوند؛ در غیر این صورت لیست (url, result) به ترتیب ورودی برمی‌گردد.
+        """
+        urls = list(urls)
+        self.stats = FetchStats()
+        self.stats.requested = len(urls)
+        self.stats.started_at = time.perf_counter()
+
+        global_sem = asyncio.Semaphore(self.max_concurrency)
+        host_sems = defaultdict(lambda: asyncio.Semaphore(self.per_host_concurrency))
+        host_locks = defaultdict(asyncio.Lock)
+        results = {} if on_result is None else None
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            tasks = [
+                asyncio.ensure_future(self._fetch_one(url, global_sem, host_sems, host_locks, executor))
+                for url in urls
+            ]
+            try:
+                for next_done in asyncio.as_completed(tasks):
+                    url, result = await next_done
+                    if on_result is not None:
+                        try:
+                            on_result(url, result)
+                        except Exception as e:
+                            logger.error(f"Error handling result for {url}: {str(e)}")
+                    else:
+                        results[url] = result
+            finally:
+                for task in tasks:
+                    task.cancel()
+                self.stats.finished_at = time.perf_counter()
+
+        if results is None:
+            return None
+        return [(url, results.get(url)) for url in urls]
+
+    def run(self, urls, on_result=None):
+        """نسخه همگام fetch_all برای کدهای غیر async"""
+        return asyncio.run(self.fetch_all(urls, on_result))
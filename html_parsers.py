@@ -0,0 +1,356 @@
+"""
+Pluggable HTML parsing backends for ContentScraper.extract_content
+
+BeautifulSoupParser is the reference implementation. LxmlParser produces the same
+fields from a single walk over a libxml2 tree.
+
+Main content is built from inline text runs between block boundaries (MainTextAccumulator):
+every text node is visited once, so extraction is linear in document size and nested
+containers no longer repeat their children's text. CONFIG['MAIN_CONTENT_MODE'] = 'legacy'
+restores the old per-container get_text output.
+"""
+
+import json
+import sys
+from pathlib import Path
+
+from bs4 import BeautifulSoup, NavigableString, CData
+
+from config import CONFIG, get_logger
+
+logger = get_logger(__name__)
+
+try:
+    from lxml import etree
+    from lxml import html as lxml_html
+    _HAS_LXML = True
+except ImportError:
+    _HAS_LXML = False
+
+HEADING_TAGS = ('h1', 'h2', 'h3', 'h4', 'h5', 'h6')
+MAIN_CONTENT_TAGS = ('p', 'article', 'section', 'div')
+MIN_BLOCK_LENGTH = 50
+
+# تگ‌هایی که متن را به بلوک‌های جدا تقسیم می‌کنند
+BLOCK_TAGS = frozenset((
+    'address', 'article', 'blockquote', 'body', 'dd', 'details', 'dialog', 'div', 'dl', 'dt',
+    'fieldset', 'figcaption', 'figure', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header', 'hr',
+    'li', 'main', 'ol', 'p', 'pre', 'section', 'summary', 'table', 'tbody', 'td', 'tfoot',
+    'th', 'thead', 'tr', 'ul',
+))
+# متن این تگ‌ها در get_text نیست (script/style/template/rt/rp) یا محتوای اصلی صفحه نیست
+MAIN_CONTENT_SKIP_TAGS = frozenset((
+    'head', 'script', 'style', 'template', 'rt', 'rp', 'noscript',
+    'nav', 'aside', 'footer', 'form', 'select', 'button',
+))
+MAX_LINK_DENSITY = 0.5
+
+
+class MainTextAccumulator:
+    """
+    جمع‌آوری متن اصلی در یک پیمایش: متن‌های پشت سر هم بین دو مرز بلوک یک قطعه می‌شوند،
+    قطعه‌های کوتاه، پر از لینک یا تکراری کنار گذاشته می‌شوند.
+    """
+
+    def __init__(self):
+        self.segments = []
+        self.seen = set()
+        self.parts = []
+        self.chars = 0
+        self.link_chars = 0
+
+    def add_text(self, text, in_link=False):
+        if not text:
+            return
+        self.parts.append(text)
+        self.chars += len(text)
+        if in_link:
+            self.link_chars += len(text)
+
+    def boundary(self):
+        if not self.parts:
+            return
+        text = ' '.join(''.join(self.parts).split())
+        link_density = self.link_chars / self.chars if self.chars else 0
+        self.parts = []
+        self.chars = 0
+        self.link_chars = 0
+        if len(text) <= MIN_BLOCK_LENGTH or link_density > MAX_LINK_DENSITY or text in self.seen:
+            return
+        self.seen.add(text)
+        self.segments.append(text)
+
+    def result(self):
+        self.boundary()
+        return '\n\n'.join(self.segments)
+
+
+def empty_result():
+    result = {
+        'title': "No Title",
+        'meta_description': '',
+        'tables': [],
+        'main_content': '',
+    }
+    for tag in HEADING_TAGS:
+        result[tag] = []
+    return result
+
+
+def _main_text_soup(soup):
+    """متن اصلی از درخت BeautifulSoup با پیمایش تکراری (بدون بازگشت) روی contents"""
+    acc = MainTextAccumulator()
+    link_depth = 0
+    # هر عنصر پشته: (گره، True اگر رویداد پایان تگ باشد)
+    stack = [(soup, False)]
+    while stack:
+        node, closing = stack.pop()
+        if closing:
+            if node.name == 'a':
+                link_depth -= 1
+            if node.name in BLOCK_TAGS:
+                acc.boundary()
+            continue
+        if isinstance(node, NavigableString):
+            # Comment، Doctype و ... زیرکلاس NavigableString هستند و کنار گذاشته می‌شوند
+            if type(node) in (NavigableString, CData):
+                acc.add_text(str(node), link_depth > 0)
+            continue
+        if node.name in MAIN_CONTENT_SKIP_TAGS:
+            continue
+        if node.name in BLOCK_TAGS:
+            acc.boundary()
+        elif node.name == 'br':
+            acc.add_text(' ')
+        if node.name == 'a':
+            link_depth += 1
+        stack.append((node, True))
+        stack.extend((child, False) for child in reversed(node.contents))
+    return acc.result()
+
+
+class BeautifulSoupParser:
+    """مسیر مرجع: BeautifulSoup با html.parser"""
+
+    name = 'bs4'
+
+    def __init__(self, main_content_mode=None):
+        self.main_content_mode = main_content_mode or CONFIG['MAIN_CONTENT_MODE']
+
+    def parse(self, html_content):
+        soup = BeautifulSoup(html_content, 'html.parser')
+        result = empty_result()
+        result['title'] = soup.title.string.strip() if soup.title else "No Title"
+
+        meta_desc = soup.find('meta', {'name': ['description', 'Description']})
+        if meta_desc:
+            result['meta_description'] = meta_desc.get('content', '').strip()
+
+        for tag in HEADING_TAGS:
+            result[tag] = [h.get_text().strip() for h in soup.find_all(tag) if h.get_text().strip()]
+
+        # جدول‌ها به صورت Tag برمی‌گردند و ContentScraper.extract_tables آن‌ها را تبدیل می‌کند
+        result['tables'] = soup.find_all('table')
+
+        if self.main_content_mode == 'legacy':
+            # get_text روی هر ظرف؛ برای ظرف‌های تو در تو درجه دو است
+            main_content = []
+            for p in soup.find_all(list(MAIN_CONTENT_TAGS)):
+                text = p.get_text().strip()
+                if text and len(text) > MIN_BLOCK_LENGTH:
+                    main_content.append(text)
+            result['main_content'] = '\n\n'.join(main_content)
+        else:
+            result['main_content'] = _main_text_soup(soup)
+        return result
+
+
+if _HAS_LXML:
+    # get_text در BeautifulSoup متن داخل script/style/template و rt/rp را نادیده می‌گیرد
+    _TEXT_XPATH = etree.XPath(
+        './/text()[not(ancestor::script or ancestor::style or ancestor::template'
+        ' or ancestor::rt or ancestor::rp)]',
+        smart_strings=False
+    )
+
+
+def _element_string(el):
+    """معادل Tag.string در BeautifulSoup: متن تنها فرزند، وگرنه None"""
+    children = list(el)
+    if not children:
+        return el.text
+    if len(children) == 1 and not el.text and not children[0].tail:
+        child = children[0]
+        if not isinstance(child.tag, str):
+            return child.text
+        return _element_string(child)
+    return None
+
+
+class LxmlParser:
+    """بک‌اند سریع بر پایه lxml که همه فیلدها را در یک پیمایش درخت جمع می‌کند"""
+
+    name = 'lxml'
+
+    def __init__(self, main_content_mode=None):
+        if not _HAS_LXML:
+            raise ImportError("lxml is not installed")
+        self.main_content_mode = main_content_mode or CONFIG['MAIN_CONTENT_MODE']
+        # huge_tree برای صفحه‌های خیلی تو در تو (محدودیت عمق 256 در libxml2)
+        self._parser = lxml_html.HTMLParser(huge_tree=True)
+        self._bytes_parser = lxml_html.HTMLParser(encoding='utf-8', huge_tree=True)
+
+    @staticmethod
+    def _text(el):
+        return ''.join(_TEXT_XPATH(el))
+
+    def _build_tree(self, html_content):
+        try:
+            return lxml_html.document_fromstring(html_content, parser=self._parser)
+        except ValueError:
+            # رشته یونیکد با اعلان encoding (مثلا <?xml encoding=...?>) را lxml نمی‌پذیرد
+            data = html_content.encode('utf-8') if isinstance(html_content, str) else html_content
+            return lxml_html.document_fromstring(data, parser=self._bytes_parser)
+
+    def parse(self, html_content):
+        result = empty_result()
+        if not html_content or not html_content.strip():
+            return result
+        try:
+            root = self._build_tree(html_content)
+        except etree.ParserError:
+            return result
+
+        legacy = self.main_content_mode == 'legacy'
+        title_seen = False
+        meta_seen = False
+        tables = []
+        legacy_blocks = []
+        acc = MainTextAccumulator()
+        link_depth = 0
+        # عمق زیردرخت‌هایی که متنشان در محتوای اصلی نمی‌آید (nav، script و ...)
+        skip_depth = 0
+
+        walker = etree.iterwalk(root, events=('start', 'end', 'comment', 'pi'))
+        for event, el in walker:
+            if event in ('comment', 'pi'):
+                if not skip_depth:
+                    acc.add_text(el.tail, link_depth > 0)
+                continue
+
+            tag = el.tag
+            if event == 'end':
+                if tag in MAIN_CONTENT_SKIP_TAGS:
+                    skip_depth -= 1
+                elif not skip_depth:
+                    if tag == 'a':
+                        link_depth -= 1
+                    if tag in BLOCK_TAGS:
+                        acc.boundary()
+                if not skip_depth:
+                    acc.add_text(el.tail, link_depth > 0)
+                continue
+
+            # event == 'start'
+            if tag in HEADING_TAGS:
+                text = self._text(el).strip()
+                if text:
+                    result[tag].append(text)
+            elif tag == 'table':
+                # خود عنصر برمی‌گردد؛ table_extractor مستقیما روی درخت کار می‌کند
+                tables.append(el)
+            elif tag == 'title' and not title_seen:
+                title_seen = True
+                # مثل مرجع: title بدون متن یکتا خطا می‌دهد و صفحه رد می‌شود
+                result['title'] = _element_string(el).strip()
+            elif tag == 'meta' and not meta_seen and el.get('name') in ('description', 'Description'):
+                meta_seen = True
+                result['meta_description'] = el.get('content', '').strip()
+            elif legacy and tag in MAIN_CONTENT_TAGS:
+                text = self._text(el).strip()
+                if text and len(text) > MIN_BLOCK_LENGTH:
+                    legacy_blocks.append(text)
+
+            if legacy:
+                continue
+            if tag in MAIN_CONTENT_SKIP_TAGS:
+                skip_depth += 1
+            elif not skip_depth:
+                if tag in BLOCK_TAGS:
+                    acc.boundary()
+                elif tag == 'br':
+                    acc.add_text(' ')
+                if tag == 'a':
+                    link_depth += 1
+                acc.add_text(el.text, link_depth > 0)
+
+        result['tables'] = tables
+        result['main_content'] = '\n\n'.join(legacy_blocks) if legacy else acc.result()
+        return result
+
+
+PARSERS = {
+    'bs4': BeautifulSoupParser,
+    'lxml': LxmlParser,
+}
+
+
+def get_parser(name=None):
+    """ساخت بک‌اند پارسر؛ auto یعنی lxml در صورت نصب بودن و در غیر این صورت bs4"""
+    name = name or CONFIG['PARSER_BACKEND']
+    if name == 'auto':
+        name = 'lxml' if _HAS_LXML else 'bs4'
+    if name not in PARSERS:
+        raise ValueError(f"Unknown parser backend: {name}")
+    return PARSERS[name]()
+
+
+def iter_corpus(corpus):
+    """مسیر فایل‌های HTML یک پوشه (بازگشتی) یا یک فایل"""
+    corpus = Path(corpus)
+    if corpus.is_file():
+        yield corpus
+        return
+    for path in sorted(corpus.rglob('*')):
+        if path.is_file() and path.suffix.lower() in ('.html', '.htm'):
+            yield path
+
+
+def _canonical(value):
+    return json.dumps(value, ensure_ascii=False, sort_keys=True, default=str)
+
+
+def check_parity(corpus=None, reference='bs4', candidate='lxml'):
+    """
+    اجرای extract_content با هر دو بک‌اند روی صفحات ذخیره‌شده و برگرداندن اختلاف‌ها
+    به صورت لیست (مسیر فایل، نام فیلدها). پیش‌فرض پوشه بدنه‌های کش صفحات است.
+    """
+    from content_scraper import ContentScraper
+
+    corpus = corpus or Path(CONFIG['CACHE_DIR']) / 'blobs'
+    reference_scraper = ContentScraper(parser=get_parser(reference))
+    candidate_scraper = ContentScraper(parser=get_parser(candidate))
+
+    checked = 0
+    mismatches = []
+    for path in iter_corpus(corpus):
+        html_content = path.read_text(encoding='utf-8', errors='replace')
+        expected = reference_scraper.extract_content(html_content, str(path))
+        actual = candidate_scraper.extract_content(html_content, str(path))
+        checked += 1
+        # مقایسه روی JSON تا NaN خانه‌های خالی جدول‌ها برابر حساب شوند
+        if _canonical(expected) == _canonical(actual):
+            continue
+        if expected is None or actual is None:
+            fields = ['<all>']
+        else:
+            fields = [key for key in expected if _canonical(expected[key]) != _canonical(actual.get(key))]
+        mismatches.append((str(path), fields))
+        logger.warning(f"Parser mismatch in {path}: {', '.join(fields)}")
+
+    logger.info(f"Parser parity: {checked - len(mismatches)}/{checked} pages identical ({reference} vs {candidate})")
+    return mismatches
+
+
+if __name__ == "__main__":
+    sys.exit(1 if check_parity(sys.argv[1] if len(sys.argv) > 1 else None) else 0)
@@ -0,0 +1,203 @@
+"""
+Shared pooled HTTP session with keep-alive, compression and connection reuse counters
+"""
+
+import threading
+import time
+from collections import defaultdict
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.poolmanager import PoolManager
+
+from config import CONFIG, get_logger
+
+logger = get_logger(__name__)
+
+# urllib3 فقط وقتی brotli را باز می‌کند که یکی از این پکیج‌ها نصب باشد
+try:
+    import brotli  # noqa: F401
+    _HAS_BROTLI = True
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        _HAS_BROTLI = True
+    except ImportError:
+        _HAS_BROTLI = False
+
+ACCEPT_ENCODING = 'gzip, deflate, br' if _HAS_BROTLI else 'gzip, deflate'
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Encoding": ACCEPT_ENCODING,
+    "Connection": "keep-alive",
+}
+
+
+class SessionStats:
+    """شمارنده‌های استفاده مجدد از اتصال و زمان handshake"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+        self.handshake_seconds = 0.0
+        self.connections_per_host = defaultdict(int)
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def record_connection(self, host, seconds):
+        with self._lock:
+            self.new_connections += 1
+            self.handshake_seconds += seconds
+            self.connections_per_host[host] += 1
+
+    @property
+    def reused_connections(self):
+        return max(self.requests - self.new_connections, 0)
+
+    @property
+    def reuse_ratio(self):
+        return self.reused_connections / self.requests if self.requests else 0.0
+
+    @property
+    def avg_handshake_ms(self):
+        return self.handshake_seconds / self.new_connections * 1000 if self.new_connections else 0.0
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.new_connections = 0
+            self.handshake_seconds = 0.0
+            self.connections_per_host.clear()
+
+    def as_dict(self):
+        return {
+            'requests': self.requests,
+            'new_connections': self.new_connections,
+            'reused_connections': self.reused_connections,
+            'reuse_ratio': round(self.reuse_ratio, 3),
+            'handshake_seconds': round(self.handshake_seconds, 3),
+            'avg_handshake_ms': round(self.avg_handshake_ms, 1),
+        }
+
+    def summary(self):
+        return (
+            f"HTTP: {self.requests} requests over {self.new_connections} new connections "
+            f"({self.reused_connections} reused, {self.reuse_ratio:.0%}), "
+            f"handshakes {self.handshake_seconds:.2f}s total, {self.avg_handshake_ms:.1f} ms avg"
+        )
+
+
+SESSION_STATS = SessionStats()
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            SESSION_STATS.record_connection(self.host, time.perf_counter() - start)
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        # شامل TCP و TLS handshake
+        start = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            SESSION_STATS.record_connection(self.host, time.perf_counter() - start)
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _InstrumentedPoolManager(PoolManager):
+    """PoolManager با اتصال‌های زمان‌سنجی‌شده و اندازه pool جداگانه برای هر هاست"""
+
+    def __init__(self, *args, host_maxsize=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.host_maxsize = host_maxsize or {}
+        self.pool_classes_by_scheme = {
+            'http': _TimedHTTPConnectionPool,
+            'https': _TimedHTTPSConnectionPool,
+        }
+
+    def _new_pool(self, scheme, host, port, request_context=None):
+        if request_context is None:
+            request_context = self.connection_pool_kw.copy()
+        maxsize = self.host_maxsize.get(host)
+        if maxsize:
+            request_context = dict(request_context, maxsize=maxsize)
+        return super()._new_pool(scheme, host, port, request_context)
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter با شمارش درخواست‌ها و pool قابل تنظیم برای هر هاست"""
+
+    def __init__(self, host_maxsize=None, **kwargs):
+        # init_poolmanager داخل HTTPAdapter.__init__ صدا زده می‌شود
+        self.host_maxsize = host_maxsize or {}
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        self._pool_connections = connections
+        self._pool_maxsize = maxsize
+        self._pool_block = block
+        self.poolmanager = _InstrumentedPoolManager(
+            num_pools=connections,
+            maxsize=maxsize,
+            block=block,
+            host_maxsize=self.host_maxsize,
+            **pool_kwargs
+        )
+
+    def send(self, request, **kwargs):
+        SESSION_STATS.record_request()
+        return super().send(request, **kwargs)
+
+
+def create_session(pool_connections=None, pool_maxsize=None, host_maxsize=None):
+    """ساخت یک Session جدید با pool اتصال و هدرهای پیش‌فرض"""
+    adapter = PooledHTTPAdapter(
+        host_maxsize=CONFIG['HTTP_POOL_MAXSIZE_PER_HOST'] if host_maxsize is None else host_maxsize,
+        pool_connections=pool_connections or CONFIG['HTTP_POOL_CONNECTIONS'],
+        pool_maxsize=pool_maxsize or CONFIG['HTTP_POOL_MAXSIZE'],
+    )
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update(DEFAULT_HEADERS)
+    # مثل قبل از پراکسی‌های محیطی استفاده نمی‌کنیم
+    session.trust_env = False
+    return session
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Session مشترک بین ContentScraper و آرشیوکننده"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = create_session()
+    return _session
+
+
+def session_stats():
+    return SESSION_STATS
@@ -0,0 +1,272 @@
+"""
+Durable job ledger for keyword runs
+
+Every keyword of a run and every URL task of a keyword has a state in SQLite, so a crashed
+or interrupted run resumes where it stopped: finished keywords and stored URLs are skipped,
+failed ones are retried with exponential backoff up to LEDGER_MAX_ATTEMPTS, and the SERP
+results of each keyword are kept for the combined output.
+
+Keyword states: pending -> searched -> done (or failed)
+URL states:     pending -> fetched -> parsed -> stored (or failed)
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from config import CONFIG, get_logger
+
+logger = get_logger(__name__)
+
+KEYWORD_STATES = ('pending', 'searched', 'done', 'failed')
+URL_STATES = ('pending', 'fetched', 'parsed', 'stored', 'failed')
+
+
+class JobLedger:
+    """
+    دفتر کارهای یک اجرا. آخرین اجرای ناتمام ادامه داده می‌شود و اگر همه اجراها تمام شده باشند
+    اجرای جدیدی شروع می‌شود (resume=False همیشه اجرای جدید می‌سازد).
+    """
+
+    def __init__(self, path=None, resume=True, max_attempts=None, backoff_seconds=None):
+        self.path = Path(path or CONFIG['LEDGER_PATH'])
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_attempts = max_attempts or CONFIG['LEDGER_MAX_ATTEMPTS']
+        self.backoff_seconds = CONFIG['LEDGER_BACKOFF_SECONDS'] if backoff_seconds is None else backoff_seconds
+
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS runs (
+                id INTEGER PRIMARY KEY,
+                started_at REAL NOT NULL,
+                finished_at REAL
+            );
+            CREATE TABLE IF NOT EXISTS keyword_jobs (
+                run_id INTEGER NOT NULL REFERENCES runs(id),
+                keyword TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                keyword_id INTEGER,
+                state TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL DEFAULT 0,
+                last_error TEXT,
+                updated_at REAL,
+                PRIMARY KEY (run_id, keyword)
+            );
+            CREATE TABLE IF NOT EXISTS url_tasks (
+                run_id INTEGER NOT NULL,
+                keyword TEXT NOT NULL,
+                url TEXT NOT NULL,
+                google_rank INTEGER,
+                keyword_id INTEGER,
+                state TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL DEFAULT 0,
+                last_error TEXT,
+                updated_at REAL,
+                PRIMARY KEY (run_id, keyword, url)
+            );
+            CREATE INDEX IF NOT EXISTS idx_url_tasks_url ON url_tasks (run_id, url);
+            CREATE TABLE IF NOT EXISTS serp_results (
+                run_id INTEGER NOT NULL,
+                keyword TEXT NOT NULL,
+                google_rank INTEGER NOT NULL,
+                result TEXT NOT NULL,
+                PRIMARY KEY (run_id, keyword, google_rank)
+            );
+        ''')
+        self.conn.commit()
+
+        row = self.conn.execute("SELECT id FROM runs WHERE finished_at IS NULL ORDER BY id DESC LIMIT 1").fetchone()
+        if resume and row:
+            self.run_id = row[0]
+            self.resumed = True
+            logger.info(f"Resuming run {self.run_id} from {self.path}")
+        else:
+            self.run_id = self.conn.execute("INSERT INTO runs (started_at) VALUES (?)", (time.time(),)).lastrowid
+            self.conn.commit()
+            self.resumed = False
+            logger.info(f"Started run {self.run_id} in {self.path}")
+
+    def _backoff(self, attempts):
+        return time.time() + self.backoff_seconds * 2 ** max(attempts - 1, 0)
+
+    # ---------------------- Keywords ----------------------
+    def add_keywords(self, keywords):
+        """افزودن کلمات کلیدی به اجرا (کلمات موجود دست نمی‌خورند)"""
+        with self._lock:
+            start = self.conn.execute(
+                "SELECT COALESCE(MAX(position), -1) + 1 FROM keyword_jobs WHERE run_id = ?", (self.run_id,)
+            ).fetchone()[0]
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO keyword_jobs (run_id, keyword, position) VALUES (?, ?, ?)",
+                [(self.run_id, keyword, start + i) for i, keyword in enumerate(keywords)]
+            )
+            self.conn.commit()
+
+    def keyword_state(self, keyword):
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT state FROM keyword_jobs WHERE run_id = ? AND keyword = ?", (self.run_id, keyword)
+            ).fetchone()
+        return row[0] if row else None
+
+    def due_keywords(self):
+        """
+        کلمات کلیدی که باید (دوباره) اجرا شوند، به ترتیب فایل ورودی.
+        main.py این فهرست را یک بار در شروع اجرا می‌گیرد؛ کلمه‌ای که وسط اجرا ناموفق شود
+        در اجرای بعدی (بعد از backoff) دوباره تلاش می‌شود، نه در همین اجرا.
+        """
+        with self._lock:
+            rows = self.conn.execute('''
+                SELECT keyword FROM keyword_jobs
+                WHERE run_id = ? AND state != 'done' AND attempts < ? AND next_attempt_at <= ?
+                ORDER BY position
+            ''', (self.run_id, self.max_attempts, time.time())).fetchall()
+        return [keyword for (keyword,) in rows]
+
+    def record_serp(self, keyword, keyword_id, results):
+        """ذخیره نتایج جستجو و ساخت کارهای URL (وضعیت searched)"""
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                "DELETE FROM serp_results WHERE run_id = ? AND keyword = ?", (self.run_id, keyword)
+            )
+            self.conn.executemany(
+                "INSERT INTO serp_results (run_id, keyword, google_rank, result) VALUES (?, ?, ?, ?)",
+                [(self.run_id, keyword, result['google_rank'], json.dumps(result, ensure_ascii=False))
+                 for result in results]
+            )
+            self.conn.executemany('''
+                INSERT OR IGNORE INTO url_tasks (run_id, keyword, url, google_rank, keyword_id, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', [(self.run_id, keyword, result['link'], result['google_rank'], keyword_id, now) for result in results])
+            self.conn.execute('''
+                UPDATE keyword_jobs SET state = 'searched', keyword_id = ?, last_error = NULL, updated_at = ?
+                WHERE run_id = ? AND keyword = ?
+            ''', (keyword_id, now, self.run_id, keyword))
+            self.conn.commit()
+
+    def serp_results(self, keyword):
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT result FROM serp_results WHERE run_id = ? AND keyword = ? ORDER BY google_rank",
+                (self.run_id, keyword)
+            ).fetchall()
+        return [json.loads(result) for (result,) in rows]
+
+    def fail_keyword(self, keyword, error):
+        with self._lock:
+            attempts = self.conn.execute(
+                "SELECT attempts FROM keyword_jobs WHERE run_id = ? AND keyword = ?", (self.run_id, keyword)
+            ).fetchone()[0] + 1
+            self.conn.execute('''
+                UPDATE keyword_jobs SET state = 'failed', attempts = ?, next_attempt_at = ?, last_error = ?,
+                    updated_at = ?
+                WHERE run_id = ? AND keyword = ?
+            ''', (attempts, self._backoff(attempts), str(error), time.time(), self.run_id, keyword))
+            self.conn.commit()
+        logger.warning(f"Keyword '{keyword}' failed (attempt {attempts}/{self.max_attempts}): {error}")
+
+    def finish_keyword(self, keyword):
+        """done وقتی همه URLها ذخیره یا بی‌نتیجه شده باشند؛ وگرنه failed با backoff برای تلاش بعدی"""
+        with self._lock:
+            remaining = self.conn.execute('''
+                SELECT COUNT(*) FROM url_tasks
+                WHERE run_id = ? AND keyword = ? AND state != 'stored' AND attempts < ?
+            ''', (self.run_id, keyword, self.max_attempts)).fetchone()[0]
+        if remaining:
+            self.fail_keyword(keyword, f"{remaining} URLs not stored yet")
+            return False
+        with self._lock:
+            self.conn.execute('''
+                UPDATE keyword_jobs SET state = 'done', last_error = NULL, updated_at = ?
+                WHERE run_id = ? AND keyword = ?
+            ''', (time.time(), self.run_id, keyword))
+            self.conn.commit()
+        return True
+
+    # ---------------------- URL tasks ----------------------
+    def due_url_tasks(self, keyword):
+        """کارهای URL ذخیره‌نشده که زمان تلاش دوباره‌شان رسیده (به شکل task های scrape_urls)"""
+        with self._lock:
+            rows = self.conn.execute('''
+                SELECT url, google_rank, keyword_id FROM url_tasks
+                WHERE run_id = ? AND keyword = ? AND state != 'stored' AND attempts < ? AND next_attempt_at <= ?
+                ORDER BY google_rank
+            ''', (self.run_id, keyword, self.max_attempts, time.time())).fetchall()
+        return [
+            {'url': url, 'google_rank': google_rank, 'keyword_id': keyword_id, 'keyword': keyword}
+            for url, google_rank, keyword_id in rows
+        ]
+
+    def mark_url(self, task, state, error=None):
+        """ثبت وضعیت یک کار URL؛ failed تعداد تلاش را زیاد و تلاش بعدی را با backoff زمان‌بندی می‌کند"""
+        now = time.time()
+        key = (self.run_id, task['keyword'], task['url'])
+        with self._lock:
+            if state == 'failed':
+                self.conn.execute('''
+                    UPDATE url_tasks SET state = 'failed', attempts = attempts + 1, last_error = ?, updated_at = ?,
+                        next_attempt_at = ? + ? * (1 << attempts)
+                    WHERE run_id = ? AND keyword = ? AND url = ?
+                ''', (str(error) if error else None, now, now, self.backoff_seconds, *key))
+            else:
+                self.conn.execute(
+                    "UPDATE url_tasks SET state = ?, updated_at = ? WHERE run_id = ? AND keyword = ? AND url = ?",
+                    (state, now, *key)
+                )
+            self.conn.commit()
+
+    # ---------------------- Run ----------------------
+    def iter_serp_rows(self):
+        """ردیف‌های نتایج جستجوی همه کلمات کلیدی اجرا (با ستون keyword) به ترتیب فایل ورودی"""
+        with self._lock:
+            rows = self.conn.execute('''
+                SELECT s.keyword, s.result FROM serp_results s
+                JOIN keyword_jobs k ON k.run_id = s.run_id AND k.keyword = s.keyword
+                WHERE s.run_id = ?
+                ORDER BY k.position, s.google_rank
+            ''', (self.run_id,)).fetchall()
+        for keyword, result in rows:
+            row = json.loads(result)
+            row['keyword'] = keyword
+            yield row
+
+    def counts(self):
+        """{'keywords': {state: n}, 'urls': {state: n}}"""
+        with self._lock:
+            keywords = dict(self.conn.execute(
+                "SELECT state, COUNT(*) FROM keyword_jobs WHERE run_id = ? GROUP BY state", (self.run_id,)
+            ).fetchall())
+            urls = dict(self.conn.execute(
+                "SELECT state, COUNT(*) FROM url_tasks WHERE run_id = ? GROUP BY state", (self.run_id,)
+            ).fetchall())
+        return {'keywords': keywords, 'urls': urls}
+
+    def finish_run(self):
+        """بستن اجرا وقتی کار قابل تلاشی باقی نمانده؛ True اگر اجرا بسته شد"""
+        with self._lock:
+            open_jobs = self.conn.execute('''
+                SELECT COUNT(*) FROM keyword_jobs WHERE run_id = ? AND state != 'done' AND attempts < ?
+            ''', (self.run_id, self.max_attempts)).fetchone()[0]
+            if open_jobs:
+                return False
+            self.conn.execute("UPDATE runs SET finished_at = ? WHERE id = ?", (time.time(), self.run_id))
+            self.conn.commit()
+        return True
+
+    def summary(self):
+        counts = self.counts()
+        keywords = ', '.join(f"{n} {state}" for state, n in sorted(counts['keywords'].items())) or 'none'
+        urls = ', '.join(f"{n} {state}" for state, n in sorted(counts['urls'].items())) or 'none'
+        return f"Run {self.run_id}: keywords {keywords}; URLs {urls}"
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
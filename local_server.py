@@ -0,0 +1,148 @@
+"""
+Local HTTP stand-in server for exercising the scrapers without touching real sites
+"""
+
+import hashlib
+import html
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+def default_page(path):
+    """صفحه HTML ساختگی برای مسیرهای تعریف‌نشده"""
+    paragraphs = ''.join(
+        f"<p>Paragraph {i} for {path}: lorem ipsum dolor sit amet, consectetur adipiscing elit.</p>"
+        for i in range(5)
+    )
+    return (
+        f"<html><head><title>Page {path}</title>"
+        f'<meta name="description" content="Stand-in page {path}"></head>'
+        f"<body><h1>Heading {path}</h1><h2>Section</h2><div>{paragraphs}</div></body></html>"
+    )
+
+
+def serp_page(path, results_per_page=10, pages=2):
+    """
+    صفحه جستجوی ساختگی با همان ساختار نتایج گوگل که WebScraper می‌خواند:
+    '/' فرم جستجو (input name=q) و '/search?q=...&start=N' نتایج div.g و دکمه pnnext
+    """
+    parts = urlsplit(path)
+    if parts.path != '/search':
+        return (
+            "<html><head><title>Search</title></head><body>"
+            '<form action="/search" method="get"><input type="text" name="q"></form>'
+            "</body></html>"
+        )
+    params = parse_qs(parts.query)
+    query = params.get('q', [''])[0]
+    start = int(params.get('start', ['0'])[0])
+    slug = '-'.join(query.split()) or 'empty'
+    results = ''.join(
+        f'<div class="g"><a href="https://site{i}.example/{html.escape(slug)}/{i}"><h3>Result {i + 1} for {html.escape(query)}</h3></a>'
+        f'<div class="VwiC3b">Snippet {i + 1} about {html.escape(query)}</div></div>'
+        for i in range(start, start + results_per_page)
+    )
+    next_link = ''
+    if start + results_per_page < results_per_page * pages:
+        next_link = f'<a id="pnnext" href="/search?q={html.escape(query)}&amp;start={start + results_per_page}">Next</a>'
+    return (
+        f"<html><head><title>{html.escape(query)} - Search</title></head>"
+        f'<body><form action="/search"><input type="text" name="q" value="{html.escape(query)}"></form>'
+        f'<div id="search">{results}</div>{next_link}</body></html>'
+    )
+
+
+class LocalTestServer:
+    """
+    سرور HTTP محلی با تاخیر قابل تنظیم.
+    pages نگاشت مسیر به متن HTML است؛ مسیرهای دیگر با fallback (پیش‌فرض default_page)
+    ساخته می‌شوند، مثلا serp_page برای صفحه جستجوی ساختگی.
+    پاسخ‌ها ETag دارند و If-None-Match منطبق با 304 جواب داده می‌شود.
+    تعداد درخواست‌ها، پاسخ‌های 304 و بیشترین درخواست همزمان ثبت می‌شود.
+    """
+
+    def __init__(self, pages=None, latency=0.0, host='127.0.0.1', port=0, fallback=None):
+        self.pages = pages or {}
+        self.fallback = fallback or default_page
+        self.latency = latency
+        self.requests = []
+        self.not_modified = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def url(self, path='/'):
+        return self.base_url + path
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # بدون این، هر پاسخ keep-alive پشت Nagle و delayed ACK حدود ۴۰ms منتظر می‌ماند
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                with server._lock:
+                    server.requests.append(self.path)
+                    server.in_flight += 1
+                    server.peak_in_flight = max(server.peak_in_flight, server.in_flight)
+                try:
+                    latency = server.latency(self.path) if callable(server.latency) else server.latency
+                    if latency:
+                        time.sleep(latency)
+                    page = server.pages.get(self.path)
+                    if page is None:
+                        page = server.fallback(self.path)
+                    body = page.encode('utf-8')
+                    etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+                    if self.headers.get('If-None-Match') == etag:
+                        with server._lock:
+                            server.not_modified += 1
+                        self.send_response(304)
+                        self.send_header('ETag', etag)
+                        self.send_header('Content-Length', '0')
+                        self.end_headers()
+                        return
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'text/html; charset=utf-8')
+                    self.send_header('ETag', etag)
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    # کلاینت بعد از timeout اتصال را بسته است
+                    self.close_connection = True
+                finally:
+                    with server._lock:
+                        server.in_flight -= 1
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
@@ -1,17 +1,18 @@
-import json
-import pandas as pd
+import itertools
 from pathlib import Path
-import time
 from datetime import datetime
 from tqdm import tqdm
 from config import CONFIG, get_logger
-from web_scraper import WebScraper
+from scraper_pool import WebScraperPool
 from content_scraper import ContentScraper
 from database_manager import DatabaseManager
+from job_ledger import JobLedger
+from output_assembly import SerpAssembler
 
 logger = get_logger(__name__)
 
 def main():
+    content_scraper = None
     try:
         # تعریف output_dir در ابتدای تابع
         output_dir = Path(CONFIG['OUTPUT_DIR'])
@@ -31,77 +32,86 @@ def main():
             keywords = [line.strip() for line in f if line.strip()]
         logger.info(f"Loaded {len(keywords)} keywords")
 
-        # Initialize scraper
-        logger.info("Initializing scraper...")
-        scraper = WebScraper()
-        
         # Initialize database manager
         db_manager = DatabaseManager()
         
         # Process keywords
-        all_results = {}
-        for keyword in tqdm(keywords, desc="Processing keywords"):
-            try:
-                # Store keyword in database
-                keyword_id = db_manager.insert_keyword(keyword)
-                
-                results = scraper.search_google(keyword)
-                if results:
-                    # Add Google ranking to results
-                    for rank, result in enumerate(results, 1):
-                        result['google_rank'] = rank
-                    
-                    all_results[keyword] = results
-                    
-                    # Scrape content for each result with rank information
-                    content_scraper = ContentScraper()
-                    output_excel_file = output_dir / f'content_results_{keyword}.xlsx'
-                    
-                    for result in results:
-                        url = result['link']
-                        google_rank = result['google_rank']  # Get the rank
-                        content_scraper.scrape_content_from_url(
-                            url=url,
+        # وضعیت هر کلمه کلیدی و URL در دفتر کارها ثبت می‌شود؛ اجرای قطع‌شده از همان‌جا ادامه می‌یابد
+        ledger = JobLedger()
+        ledger.add_keywords(keywords)
+        content_scraper = ContentScraper()
+
+        # Initialize browser pool
+        # مرورگرها داخل try ساخته می‌شوند تا با هر خطایی finally آن‌ها را ببندد
+        logger.info("Initializing scraper...")
+        pool = WebScraperPool()
+        try:
+            pool.start()
+
+            # نتایج جستجوی ثبت‌شده در اجرای قطع‌شده دوباره جستجو نمی‌شوند؛ بقیه به صف مرورگرها می‌روند
+            ready = []
+            for keyword in ledger.due_keywords():
+                if ledger.serp_results(keyword):
+                    ready.append((keyword, None))
+                else:
+                    pool.submit(keyword)
+
+            # هر کلمه‌ای که جستجویش تمام شد ذخیره و محتوایش دریافت می‌شود، در حالی که مرورگرها کلمات بعدی را جستجو می‌کنند
+            keyword_results = itertools.chain(ready, pool.completed())
+            for keyword, results in tqdm(keyword_results, total=len(ready) + pool.submitted, desc="Processing keywords"):
+                try:
+                    # Store keyword in database
+                    keyword_id = db_manager.insert_keyword(keyword)
+
+                    if results is not None:
+                        if not results:
+                            ledger.fail_keyword(keyword, "no search results")
+                            continue
+                        # Add Google ranking to results
+                        for rank, result in enumerate(results, 1):
+                            result['google_rank'] = rank
+                        ledger.record_serp(keyword, keyword_id, results)
+
+                    # Scrape content for URLs not stored yet, with rank information
+                    tasks = ledger.due_url_tasks(keyword)
+                    if tasks:
+                        output_excel_file = output_dir / f'content_results_{keyword}.xlsx'
+                        content_scraper.scrape_urls(
+                            tasks,
                             excel_file=str(output_excel_file),
                             db_manager=db_manager,
-                            keyword_id=keyword_id,
-                            google_rank=google_rank  # Pass the rank to the scraper
+                            ledger=ledger
                         )
-                        time.sleep(2)
-                
-                time.sleep(2)
-            except Exception as e:
-                logger.error(f"Error processing keyword '{keyword}': {str(e)}")
-                continue
+                    ledger.finish_keyword(keyword)
+                except Exception as e:
+                    logger.error(f"Error processing keyword '{keyword}': {str(e)}")
+                    ledger.fail_keyword(keyword, e)
+                    continue
+        finally:
+            pool.close()
+
+        logger.info(ledger.summary())
+        if not ledger.finish_run():
+            logger.warning("Some keywords or URLs failed; run main.py again to retry them")
 
-        # Save combined results
-        if all_results:
+        # Save combined results (از دفتر کارها، شامل کلمات کلیدی اجراهای قطع‌شده قبلی)
+        assembler = SerpAssembler()
+        assembler.add_rows(ledger.iter_serp_rows())
+        if assembler.rows:
             # Save to Excel
-            output_excel_file = output_dir / 'results_keywords.xlsx'
-            all_df = pd.DataFrame()
-            
-            for keyword, results in all_results.items():
-                df = pd.DataFrame(results)
-                df['keyword'] = keyword
-                all_df = pd.concat([all_df, df], ignore_index=True)
-            
-            all_df.to_excel(output_excel_file, index=False)
-            logger.info(f"Results saved to {output_excel_file}")
+            assembler.write_excel(output_dir / 'results_keywords.xlsx')
 
             # Save to JSON
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            output_json_file = output_dir / f'results_{timestamp}.json'
-            with open(output_json_file, 'w', encoding='utf-8') as f:
-                json.dump(all_results, f, ensure_ascii=False, indent=4)
-            logger.info(f"Results saved to {output_json_file}")
+            assembler.write_json(output_dir / f'results_{timestamp}.json')
         else:
             logger.warning("No results were collected")
+        ledger.close()
 
         # Ask user about content scraping
         scrape_content = input("\nDo you want to scrape content from links? (yes/no): ").strip().lower()
         
         if scrape_content == 'yes':
-            content_scraper = ContentScraper()
             input_excel_file = str(output_dir / 'results_keywords.xlsx')
             output_excel_file = str(output_dir / 'content_results.xlsx')
             # ارسال دیتابیس منیجر برای ذخیره در دیتابیس
@@ -116,6 +126,9 @@ def main():
         logger.error(f"An unexpected error occurred: {str(e)}")
     
     finally:
+        # پروسس‌های پارس و فایل‌های sink حتی بعد از خطا بسته می‌شوند
+        if content_scraper is not None:
+            content_scraper.close()
         try:
             input("\nPress Enter to exit...")
         except EOFError:
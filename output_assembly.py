@@ -0,0 +1,98 @@
+"""
+One-pass assembly of the combined SERP output
+
+SERP rows are appended to a columnar buffer (one Python list per column) and the
+DataFrame for results_keywords.xlsx is built once from it, instead of growing a frame
+with pd.concat per keyword (which copies everything collected so far every time).
+The JSON output is written keyword by keyword from the same buffer, with only the keys
+each result actually had.
+"""
+
+import json
+
+import pandas as pd
+
+from config import get_logger
+
+logger = get_logger(__name__)
+
+
+class SerpAssembler:
+    """
+    بافر ستونی ردیف‌های نتایج جستجو: add هر نتیجه را به لیست ستون‌ها اضافه می‌کند و
+    to_frame یک بار DataFrame می‌سازد. ستون‌ها به ترتیب اولین مشاهده می‌مانند
+    (همان ترتیب DataFrame(results) با ستون keyword در انتها).
+    """
+
+    def __init__(self):
+        self.columns = {}
+        self.rows = 0
+        # ستون‌های خود هر ردیف (tuple های یکسان مشترک‌اند) برای خروجی JSON بدون کلیدهای پرشده با None
+        self.row_columns = []
+        self._layouts = {}
+
+    def _append(self, row):
+        layout = tuple(row)
+        self.row_columns.append(self._layouts.setdefault(layout, layout))
+        for column, value in row.items():
+            values = self.columns.get(column)
+            if values is None:
+                # ستون جدید برای ردیف‌های قبلی خالی است
+                values = self.columns[column] = [None] * self.rows
+            values.append(value)
+        self.rows += 1
+        for values in self.columns.values():
+            if len(values) < self.rows:
+                values.append(None)
+
+    def add(self, keyword, results):
+        """افزودن نتایج یک کلمه کلیدی"""
+        for result in results:
+            self._append({**result, 'keyword': keyword})
+
+    def add_rows(self, rows):
+        """افزودن ردیف‌هایی که خودشان ستون keyword دارند (مثل JobLedger.iter_serp_rows)"""
+        for row in rows:
+            self._append(row)
+
+    def to_frame(self):
+        columns = [column for column in self.columns if column != 'keyword']
+        if 'keyword' in self.columns:
+            columns.append('keyword')
+        return pd.DataFrame({column: self.columns[column] for column in columns}, columns=columns)
+
+    def iter_keyword_results(self):
+        """
+        (keyword, [نتایج بدون ستون keyword]) یک بار برای هر کلمه کلیدی به ترتیب اولین مشاهده،
+        حتی اگر ردیف‌هایش پشت سر هم نباشند؛ هر نتیجه فقط کلیدهای خودش را دارد
+        """
+        keywords = self.columns.get('keyword', [None] * self.rows)
+        groups = {}
+        for i, keyword in enumerate(keywords):
+            groups.setdefault(keyword, []).append(i)
+        for keyword, rows in groups.items():
+            yield keyword, [
+                {column: self.columns[column][i] for column in self.row_columns[i] if column != 'keyword'}
+                for i in rows
+            ]
+
+    def write_excel(self, output_file):
+        self.to_frame().to_excel(output_file, index=False)
+        logger.info(f"Results saved to {output_file}")
+
+    def write_json(self, output_file):
+        """
+        {keyword: [results]} با همان قالب json.dump(..., indent=4)، ولی کلمه به کلمه
+        (بدون ساخت دیکشنری کامل در حافظه)
+        """
+        with open(output_file, 'w', encoding='utf-8') as f:
+            f.write('{')
+            written = 0
+            for keyword, results in self.iter_keyword_results():
+                # کلید غیررشته‌ای مثل json.dump به رشته تبدیل می‌شود (None -> "null")
+                key = keyword if isinstance(keyword, str) else json.dumps(keyword)
+                body = json.dumps(results, ensure_ascii=False, indent=4).replace('\n', '\n    ')
+                f.write(f"{',' if written else ''}\n    {json.dumps(key, ensure_ascii=False)}: {body}")
+                written += 1
+            f.write('\n}' if written else '}')
+        logger.info(f"Results saved to {output_file}")
@@ -0,0 +1,291 @@
+"""
+Content-addressed on-disk HTML cache with conditional revalidation (ETag / Last-Modified)
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from pathlib import Path
+
+from config import CONFIG, get_logger
+
+logger = get_logger(__name__)
+
+CacheEntry = namedtuple('CacheEntry', 'url content_hash etag last_modified fetched_at')
+
+
+class FetchedPage(namedtuple('FetchedPage', 'url html status content_hash downloaded')):
+    """
+    نتیجه دریافت یک صفحه. status یکی از این‌هاست:
+    hit (تازه، بدون شبکه)، revalidated (پاسخ 304)، miss (دانلود کامل)
+    """
+    __slots__ = ()
+
+    @property
+    def from_cache(self):
+        return self.status in ('hit', 'revalidated')
+
+
+def content_hash(data):
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    return hashlib.sha256(data).hexdigest()
+
+
+class PageCache:
+    """
+    کش HTML روی دیسک: ایندکس URL در SQLite و بدنه‌ها بر اساس هش محتوا (بدون تکرار).
+    ورودی‌های قدیمی‌تر از ttl با If-None-Match / If-Modified-Since دوباره اعتبارسنجی می‌شوند
+    و وقتی حجم کل از max_bytes بیشتر شود، کم‌استفاده‌ترین URLها (LRU) حذف می‌شوند.
+    """
+
+    def __init__(self, root=None, ttl=None, max_bytes=None):
+        self.root = Path(root or CONFIG['CACHE_DIR'])
+        self.blob_dir = self.root / 'blobs'
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        self.ttl = CONFIG['CACHE_TTL'] if ttl is None else ttl
+        self.max_bytes = CONFIG['CACHE_MAX_BYTES'] if max_bytes is None else max_bytes
+
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.root / 'index.db'), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS blobs (
+                content_hash TEXT PRIMARY KEY,
+                size INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS entries (
+                url TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL REFERENCES blobs(content_hash),
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries(accessed_at);
+            CREATE INDEX IF NOT EXISTS idx_entries_hash ON entries(content_hash);
+            CREATE TABLE IF NOT EXISTS extracted (
+                content_hash TEXT NOT NULL,
+                version TEXT NOT NULL,
+                content TEXT NOT NULL,
+                PRIMARY KEY (content_hash, version)
+            );
+        ''')
+        self.conn.commit()
+        self.total_bytes = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.evictions = 0
+        self.extracted_hits = 0
+
+    # ---------------------- Blob storage ----------------------
+    def _blob_path(self, digest):
+        return self.blob_dir / digest[:2] / f"{digest}.html"
+
+    def read_blob(self, digest):
+        with open(self._blob_path(digest), 'r', encoding='utf-8') as f:
+            return f.read()
+
+    def _stage_blob(self, digest, data):
+        """نوشتن بدنه در فایل موقت کنار مسیر نهایی (بیرون از قفل)؛ مسیر فایل موقت"""
+        path = self._blob_path(digest)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        return tmp_path
+
+    def _count(self, counter):
+        """افزایش شمارنده آمار (fetch از چند thread صدا زده می‌شود)"""
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _drop_blob_if_unused(self, digest):
+        """حذف بدنه‌ای که دیگر هیچ URLای به آن اشاره نمی‌کند (با قفل صدا زده می‌شود)"""
+        if self.conn.execute("SELECT 1 FROM entries WHERE content_hash = ? LIMIT 1", (digest,)).fetchone():
+            return
+        row = self.conn.execute("SELECT size FROM blobs WHERE content_hash = ?", (digest,)).fetchone()
+        if not row:
+            return
+        self.conn.execute("DELETE FROM blobs WHERE content_hash = ?", (digest,))
+        self.conn.execute("DELETE FROM extracted WHERE content_hash = ?", (digest,))
+        self.total_bytes -= row[0]
+        try:
+            os.remove(self._blob_path(digest))
+        except OSError:
+            pass
+
+    # ---------------------- Index ----------------------
+    def lookup(self, url):
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT url, content_hash, etag, last_modified, fetched_at FROM entries WHERE url = ?",
+                (url,)
+            ).fetchone()
+        return CacheEntry(*row) if row else None
+
+    def is_fresh(self, entry):
+        return time.time() - entry.fetched_at < self.ttl
+
+    @staticmethod
+    def conditional_headers(entry):
+        headers = {}
+        if entry.etag:
+            headers['If-None-Match'] = entry.etag
+        if entry.last_modified:
+            headers['If-Modified-Since'] = entry.last_modified
+        return headers
+
+    def touch(self, url, refreshed=False, etag=None, last_modified=None):
+        """به‌روزرسانی زمان دسترسی (و در صورت 304، زمان اعتبارسنجی)"""
+        now = time.time()
+        with self._lock:
+            if refreshed:
+                self.conn.execute('''
+                    UPDATE entries SET accessed_at = ?, fetched_at = ?,
+                        etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified)
+                    WHERE url = ?
+                ''', (now, now, etag, last_modified, url))
+            else:
+                self.conn.execute("UPDATE entries SET accessed_at = ? WHERE url = ?", (now, url))
+            self.conn.commit()
+
+    def store(self, url, html, etag=None, last_modified=None):
+        """ذخیره بدنه صفحه و برگرداندن هش محتوا"""
+        data = html.encode('utf-8')
+        digest = content_hash(data)
+        now = time.time()
+        path = self._blob_path(digest)
+        tmp_path = None if path.exists() else self._stage_blob(digest, data)
+        with self._lock:
+            # دوباره زیر قفل: thread دیگری ممکن است همین بدنه را در این فاصله evict کرده باشد
+            if not path.exists():
+                os.replace(tmp_path or self._stage_blob(digest, data), path)
+            elif tmp_path:
+                os.remove(tmp_path)
+            previous = self.conn.execute("SELECT content_hash FROM entries WHERE url = ?", (url,)).fetchone()
+            cursor = self.conn.execute(
+                "INSERT OR IGNORE INTO blobs (content_hash, size) VALUES (?, ?)", (digest, len(data))
+            )
+            if cursor.rowcount:
+                self.total_bytes += len(data)
+            self.conn.execute('''
+                INSERT OR REPLACE INTO entries (url, content_hash, etag, last_modified, fetched_at, accessed_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (url, digest, etag, last_modified, now, now))
+            if previous and previous[0] != digest:
+                self._drop_blob_if_unused(previous[0])
+            self._evict_if_needed()
+            self.conn.commit()
+        return digest
+
+    def _evict_if_needed(self):
+        """حذف LRU تا رسیدن به ۹۰٪ سقف حجم (با قفل صدا زده می‌شود)"""
+        if self.total_bytes <= self.max_bytes:
+            return
+        target = self.max_bytes * 0.9
+        rows = self.conn.execute("SELECT url, content_hash FROM entries ORDER BY accessed_at").fetchall()
+        for url, digest in rows:
+            self.conn.execute("DELETE FROM entries WHERE url = ?", (url,))
+            self._drop_blob_if_unused(digest)
+            self.evictions += 1
+            if self.total_bytes <= target:
+                break
+
+    # ---------------------- Extracted content ----------------------
+    def get_extracted(self, digest, version):
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT content FROM extracted WHERE content_hash = ? AND version = ?", (digest, str(version))
+            ).fetchone()
+            if row:
+                self.extracted_hits += 1
+        if not row:
+            return None
+        return json.loads(row[0])
+
+    def put_extracted(self, digest, version, content):
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO extracted (content_hash, version, content) VALUES (?, ?, ?)",
+                (digest, str(version), json.dumps(content, ensure_ascii=False, default=str))
+            )
+            self.conn.commit()
+
+    # ---------------------- Fetch ----------------------
+    def fetch(self, session, url, timeout=None):
+        """
+        دریافت URL از طریق کش: ورودی تازه بدون شبکه برمی‌گردد، ورودی کهنه به صورت شرطی
+        درخواست می‌شود و پاسخ 304 از بدنه ذخیره‌شده استفاده می‌کند.
+        """
+        entry = self.lookup(url)
+        if entry and self._blob_path(entry.content_hash).exists():
+            if self.is_fresh(entry):
+                self._count('hits')
+                self.touch(url)
+                return FetchedPage(url, self.read_blob(entry.content_hash), 'hit', entry.content_hash, 0)
+            headers = self.conditional_headers(entry)
+        else:
+            entry = None
+            headers = {}
+
+        response = session.get(url, headers=headers, timeout=timeout or CONFIG['TIMEOUT'])
+        if response.status_code == 304 and entry:
+            self._count('revalidated')
+            self.touch(url, refreshed=True,
+                       etag=response.headers.get('ETag'),
+                       last_modified=response.headers.get('Last-Modified'))
+            return FetchedPage(url, self.read_blob(entry.content_hash), 'revalidated', entry.content_hash, 0)
+
+        response.raise_for_status()
+        html = response.text
+        self._count('misses')
+        digest = self.store(
+            url, html,
+            etag=response.headers.get('ETag'),
+            last_modified=response.headers.get('Last-Modified')
+        )
+        return FetchedPage(url, html, 'miss', digest, len(response.content))
+
+    def as_dict(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'revalidated': self.revalidated,
+            'evictions': self.evictions,
+            'extracted_hits': self.extracted_hits,
+            'total_bytes': self.total_bytes,
+        }
+
+    def summary(self):
+        return (
+            f"Cache: {self.hits} hits, {self.revalidated} revalidated (304), {self.misses} misses, "
+            f"{self.extracted_hits} extractions reused, {self.evictions} evictions, "
+            f"{self.total_bytes / 1024 / 1024:.1f} MB on disk"
+        )
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_page_cache():
+    """کش مشترک صفحات، یا None اگر در CONFIG غیرفعال شده باشد"""
+    global _cache
+    if not CONFIG['CACHE_ENABLED']:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = PageCache()
+    return _cache
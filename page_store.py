@@ -0,0 +1,332 @@
+"""
+Compressed, append-only storage for raw HTML and extracted text
+
+Bodies are compressed (zstd with a dictionary trained on our own pages when the
+zstandard package is installed, zlib otherwise) and appended to segment files.
+Callers keep only a small reference "segment:offset:length:dict_id"; reads slice a
+memory-mapped segment and decompress straight from it. Identical bodies are stored once.
+
+Each process appends only to segments it created itself, so several processes can
+share one store directory. The index is committed by flush(), which callers run
+together with their own database commit.
+"""
+
+import atexit
+import hashlib
+import mmap
+import os
+import sqlite3
+import threading
+import zlib
+from collections import namedtuple
+from pathlib import Path
+
+from config import CONFIG, get_logger
+
+logger = get_logger(__name__)
+
+try:
+    import zstandard
+    _HAS_ZSTD = True
+except ImportError:
+    _HAS_ZSTD = False
+
+# dict_id صفر یعنی zlib (وقتی zstandard نصب نیست)، یک یعنی zstd بدون دیکشنری
+ZLIB_DICT_ID = 0
+ZSTD_PLAIN_ID = 1
+
+
+class StoreRef(namedtuple('StoreRef', 'segment offset length dict_id')):
+    """محل یک بدنه فشرده در فایل‌های segment"""
+    __slots__ = ()
+
+    def __str__(self):
+        return f"{self.segment}:{self.offset}:{self.length}:{self.dict_id}"
+
+    @classmethod
+    def parse(cls, value):
+        if isinstance(value, cls):
+            return value
+        return cls(*(int(part) for part in str(value).split(':')))
+
+
+class PageStore:
+    """
+    فایل‌های segment فقط-افزودنی برای HTML خام ('html') و متن استخراج‌شده ('text').
+    بعد از dict_samples بدنه از هر نوع، یک دیکشنری zstd روی همان نمونه‌ها آموزش داده
+    می‌شود و نوشتن‌های بعدی آن نوع با دیکشنری فشرده می‌شوند.
+    """
+
+    KINDS = ('html', 'text')
+
+    def __init__(self, root=None, segment_bytes=None, level=None, dict_size=None, dict_samples=None):
+        self.root = Path(root or CONFIG['PAGE_STORE_DIR'])
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.segment_bytes = segment_bytes or CONFIG['PAGE_STORE_SEGMENT_BYTES']
+        self.level = level or CONFIG['PAGE_STORE_LEVEL']
+        self.dict_size = dict_size or CONFIG['PAGE_STORE_DICT_SIZE']
+        self.dict_samples = dict_samples or CONFIG['PAGE_STORE_DICT_SAMPLES']
+
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.root / 'index.db'), timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS records (
+                content_hash TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                ref TEXT NOT NULL,
+                raw_size INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS dictionaries (
+                dict_id INTEGER PRIMARY KEY,
+                kind TEXT NOT NULL,
+                size INTEGER NOT NULL
+            );
+        ''')
+        self.conn.commit()
+
+        # segment فعال این پروسس (در اولین نوشتن ساخته می‌شود) و mmap های باز برای خواندن
+        self._segment = None
+        self._writer = None
+        self._writer_pid = None
+        self._maps = {}
+
+        self._dicts = {}
+        self._codecs = threading.local()
+        self._active_dict = {}
+        for dict_id, kind in self.conn.execute("SELECT dict_id, kind FROM dictionaries ORDER BY dict_id"):
+            self._active_dict[kind] = dict_id
+        self._samples = {kind: [] for kind in self.KINDS}
+
+        self.writes = 0
+        self.dedup_hits = 0
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+
+    # ---------------------- Segments ----------------------
+    def _segment_path(self, segment):
+        return self.root / f"segment-{segment:06d}.seg"
+
+    def _last_segment(self):
+        segments = sorted(self.root.glob('segment-*.seg'))
+        return int(segments[-1].stem.split('-')[1]) if segments else 0
+
+    def _claim_segment(self):
+        """
+        ساخت segment تازه برای این پروسس. ساخت انحصاری فایل ('xb') بین پروسس‌ها اتمیک است،
+        پس هیچ دو پروسسی در یک segment نمی‌نویسند و offset از tell() درست است.
+        """
+        if self._writer is not None and self._writer_pid == os.getpid():
+            self._writer.close()
+        segment = self._last_segment() + 1
+        while True:
+            try:
+                writer = open(self._segment_path(segment), 'xb')
+                break
+            except FileExistsError:
+                segment += 1
+        self._segment, self._writer, self._writer_pid = segment, writer, os.getpid()
+
+    def _append(self, data):
+        """افزودن به segment فعال این پروسس (با قفل صدا زده می‌شود)"""
+        # بعد از fork، فرزند segment خودش را می‌گیرد
+        if self._writer is None or self._writer_pid != os.getpid():
+            self._claim_segment()
+        offset = self._writer.tell()
+        if offset and offset + len(data) > self.segment_bytes:
+            self._claim_segment()
+            offset = 0
+        self._writer.write(data)
+        self._writer.flush()
+        return self._segment, offset
+
+    def _view(self, ref):
+        """memoryview روی بایت‌های یک رکورد در mmap بدون کپی"""
+        with self._lock:
+            mapped = self._maps.get(ref.segment)
+            if mapped is None or len(mapped) < ref.offset + ref.length:
+                # segment فعال رشد کرده؛ دوباره map می‌شود (map قبلی با آزاد شدن viewهای بازش بسته می‌شود)
+                with open(self._segment_path(ref.segment), 'rb') as f:
+                    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self._maps[ref.segment] = mapped
+        return memoryview(mapped)[ref.offset:ref.offset + ref.length]
+
+    # ---------------------- Dictionaries ----------------------
+    def _dict_path(self, dict_id):
+        return self.root / f"dict-{dict_id}.zdict"
+
+    def _dictionary(self, dict_id):
+        if dict_id not in self._dicts:
+            with open(self._dict_path(dict_id), 'rb') as f:
+                self._dicts[dict_id] = zstandard.ZstdCompressionDict(f.read())
+        return self._dicts[dict_id]
+
+    def _codec(self, kind, dict_id):
+        """compressor/decompressor آماده برای هر thread (اشیای zstandard thread-safe نیستند)"""
+        codecs = self._codecs.__dict__.setdefault('cache', {})
+        codec = codecs.get((kind, dict_id))
+        if codec is None:
+            dict_data = None if dict_id == ZSTD_PLAIN_ID else self._dictionary(dict_id)
+            if kind == 'compress':
+                codec = zstandard.ZstdCompressor(level=self.level, dict_data=dict_data)
+            else:
+                codec = zstandard.ZstdDecompressor(dict_data=dict_data)
+            codecs[(kind, dict_id)] = codec
+        return codec
+
+    def train_dictionary(self, kind, samples=None):
+        """آموزش دیکشنری zstd برای یک نوع بدنه؛ شناسه دیکشنری جدید یا None"""
+        if not _HAS_ZSTD:
+            return None
+        samples = samples if samples is not None else self._samples[kind]
+        try:
+            trained = zstandard.train_dictionary(self.dict_size, samples)
+        except zstandard.ZstdError as e:
+            logger.warning(f"Could not train {kind} dictionary on {len(samples)} samples: {str(e)}")
+            return None
+        with self._lock:
+            row = self.conn.execute("SELECT COALESCE(MAX(dict_id), ?) + 1 FROM dictionaries", (ZSTD_PLAIN_ID,))
+            dict_id = row.fetchone()[0]
+            with open(self._dict_path(dict_id), 'wb') as f:
+                f.write(trained.as_bytes())
+            self.conn.execute(
+                "INSERT INTO dictionaries (dict_id, kind, size) VALUES (?, ?, ?)",
+                (dict_id, kind, len(trained.as_bytes()))
+            )
+            self.conn.commit()
+            self._dicts[dict_id] = trained
+            self._active_dict[kind] = dict_id
+        logger.info(f"Trained {kind} dictionary {dict_id} ({len(trained.as_bytes()) / 1024:.0f} KB) on {len(samples)} samples")
+        return dict_id
+
+    # ---------------------- Read / write ----------------------
+    def _compress(self, kind, data):
+        if not _HAS_ZSTD:
+            return ZLIB_DICT_ID, zlib.compress(data, 6)
+        dict_id = self._active_dict.get(kind, ZSTD_PLAIN_ID)
+        return dict_id, self._codec('compress', dict_id).compress(data)
+
+    def put(self, data, kind='html'):
+        """
+        ذخیره بدنه (str یا bytes) و برگرداندن StoreRef؛ بدنه تکراری دوباره نوشته نمی‌شود.
+        ردیف index تا flush() بعدی commit نمی‌شود (بدنه خودش همان لحظه در segment است).
+        """
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            row = self.conn.execute("SELECT ref FROM records WHERE content_hash = ?", (digest,)).fetchone()
+            if row:
+                self.dedup_hits += 1
+        if row:
+            return StoreRef.parse(row[0])
+
+        dict_id, compressed = self._compress(kind, data)
+        with self._lock:
+            segment, offset = self._append(compressed)
+            ref = StoreRef(segment, offset, len(compressed), dict_id)
+            self.conn.execute(
+                "INSERT OR IGNORE INTO records (content_hash, kind, ref, raw_size) VALUES (?, ?, ?, ?)",
+                (digest, kind, str(ref), len(data))
+            )
+            self.writes += 1
+            self.raw_bytes += len(data)
+            self.stored_bytes += len(compressed)
+
+        if _HAS_ZSTD and kind not in self._active_dict:
+            samples = self._samples[kind]
+            samples.append(data)
+            if len(samples) >= self.dict_samples:
+                if self.train_dictionary(kind) is None:
+                    # نمونه کم یا کوچک بود؛ با نمونه‌های بیشتر دوباره امتحان می‌شود
+                    self.dict_samples *= 2
+                else:
+                    self._samples[kind] = []
+        return ref
+
+    def get(self, ref):
+        """بایت‌های اصلی یک رکورد (از mmap، بدون کپی میانی)"""
+        ref = StoreRef.parse(ref)
+        view = self._view(ref)
+        try:
+            if ref.dict_id == ZLIB_DICT_ID:
+                return zlib.decompress(view)
+            return self._codec('decompress', ref.dict_id).decompress(view)
+        finally:
+            view.release()
+
+    def get_text(self, ref):
+        return self.get(ref).decode('utf-8')
+
+    def as_dict(self):
+        return {
+            'writes': self.writes,
+            'dedup_hits': self.dedup_hits,
+            'raw_bytes': self.raw_bytes,
+            'stored_bytes': self.stored_bytes,
+            'ratio': self.raw_bytes / self.stored_bytes if self.stored_bytes else 0.0,
+        }
+
+    def summary(self):
+        stats = self.as_dict()
+        return (
+            f"Page store: {stats['writes']} bodies written ({stats['dedup_hits']} deduplicated), "
+            f"{stats['raw_bytes'] / 1024 / 1024:.1f} MB -> {stats['stored_bytes'] / 1024 / 1024:.1f} MB "
+            f"({stats['ratio']:.1f}x, {'zstd' if _HAS_ZSTD else 'zlib'})"
+        )
+
+    def flush(self):
+        """commit ردیف‌های index نوشته‌شده از آخرین flush (همراه commit دسته فراخواننده)"""
+        with self._lock:
+            if self._writer is not None and self._writer_pid == os.getpid():
+                self._writer.flush()
+            if self.conn.in_transaction:
+                self.conn.commit()
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            if self._writer is not None:
+                self._writer.close()
+            for mapped in self._maps.values():
+                mapped.close()
+            self._maps = {}
+            self.conn.close()
+
+
+def resolve_main_content(df, store=None):
+    """
+    پر کردن main_content ردیف‌هایی که متنشان در page store است (ستون content_ref)
+    و حذف ستون‌های ارجاع از DataFrame خروجی
+    """
+    if 'content_ref' not in df.columns:
+        return df
+    store = store or get_page_store() or PageStore()
+    texts = []
+    for text, ref in zip(df['main_content'], df['content_ref']):
+        if ref and not text:
+            try:
+                text = store.get_text(ref)
+            except Exception as e:
+                logger.error(f"Error reading stored content {ref}: {str(e)}")
+        texts.append(text)
+    df['main_content'] = texts
+    return df.drop(columns=[c for c in ('content_ref', 'html_ref') if c in df.columns])
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_page_store():
+    """ذخیره‌ساز مشترک بدنه‌ها، یا None اگر در CONFIG غیرفعال شده باشد"""
+    global _store
+    if not CONFIG['PAGE_STORE_ENABLED']:
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = PageStore()
+                # ردیف‌های index که هنوز commit نشده‌اند در خروج برنامه
+                atexit.register(_store.flush)
+    return _store
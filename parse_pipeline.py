@@ -0,0 +1,200 @@
+"""
+Process-pool parse stage decoupled from network I/O
+
+Fetched pages go to a ProcessPoolExecutor for extract_content/calculate_content_score while
+the async fetch engine keeps downloading. Parsed results flow back through a bounded queue to
+a single writer (the calling thread), which saves them to Excel and the database.
+Each URL is parsed once; tasks that share it (same URL for several keywords) only get
+their own rank and score. If a parse worker dies the pool is recreated (up to
+CONFIG['PARSE_POOL_RESTARTS'] times per run); after that the run is aborted with an error.
+"""
+
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from config import CONFIG, get_logger
+
+logger = get_logger(__name__)
+
+_DONE = object()
+
+# ContentScraper هر پروسس پارس (در initializer ساخته می‌شود)
+_worker_scraper = None
+
+
+def _init_worker(parser_name, main_content_mode):
+    global _worker_scraper
+    from content_scraper import ContentScraper
+    from html_parsers import PARSERS
+
+    _worker_scraper = ContentScraper(
+        parser=PARSERS[parser_name](main_content_mode=main_content_mode),
+        offline=True
+    )
+
+
+def worker_context():
+    """
+    زمینه multiprocessing پروسس‌های پارس. pool وقتی thread های دریافت در حال اجرا هستند پروسس
+    می‌سازد و fork در آن حالت قفل‌های گرفته‌شده را کپی می‌کند؛ forkserver (یا spawn) این مشکل را ندارد.
+    """
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return multiprocessing.get_context(method)
+
+
+def _extract_in_worker(html_content, url, google_rank):
+    """extract_content (شامل calculate_content_score) داخل پروسس پارس"""
+    return _worker_scraper.extract_content(html_content, url, google_rank)
+
+
+class ParsePipeline:
+    """
+    خط لوله دریافت -> پارس -> نوشتن.
+    حداکثر queue_size صفحه می‌تواند در حال پارس یا منتظر نوشتن باشد؛ وقتی این ظرفیت پر شود
+    موتور دریافت متوقف می‌ماند (backpressure) تا نویسنده عقب نماند و حافظه رشد نکند.
+    """
+
+    def __init__(self, scraper, workers=None, queue_size=None):
+        self.scraper = scraper
+        self.workers = workers or CONFIG['PARSE_WORKERS'] or os.cpu_count() or 1
+        self.queue_size = queue_size or CONFIG['PARSE_QUEUE_SIZE']
+        self.executor = self._start_executor()
+        self.parsed = 0
+        self.reused = 0
+        self.restarts = 0
+        self.backpressure_seconds = 0.0
+
+    def _start_executor(self):
+        parser = self.scraper.parser
+        executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=worker_context(),
+            initializer=_init_worker,
+            initargs=(parser.name, parser.main_content_mode)
+        )
+        # پروسس‌ها پیش از شروع دریافت بالا می‌آیند (خطای initializer هم همین‌جا دیده می‌شود)
+        wait([executor.submit(os.getpid) for _ in range(self.workers)])
+        return executor
+
+    def _submit(self, *args):
+        """ارسال به ProcessPool؛ اگر پروسسی مرده باشد (OOM یا kill) pool دوباره ساخته می‌شود"""
+        try:
+            return self.executor.submit(_extract_in_worker, *args)
+        except BrokenProcessPool:
+            if self.restarts >= CONFIG['PARSE_POOL_RESTARTS']:
+                raise
+            self.restarts += 1
+            logger.warning(f"Parse worker died, restarting the process pool ({self.restarts}/{CONFIG['PARSE_POOL_RESTARTS']})")
+            self.executor.shutdown(wait=False)
+            self.executor = self._start_executor()
+            return self.executor.submit(_extract_in_worker, *args)
+
+    def _feed(self, tasks_by_url, results, slots, errors):
+        """thread تغذیه: دریافت async و ارسال صفحه‌ها به ProcessPool"""
+        futures = []
+        # خطای ساخت دوباره pool؛ بعد از آن صفحه‌های باقی‌مانده بدون پارس ناموفق ثبت می‌شوند
+        aborted = []
+
+        def on_page(url, page):
+            # یک پارس برای هر URL؛ همه task های آن URL با نتیجه همان پارس ذخیره می‌شوند
+            tasks = tasks_by_url[url]
+            waited = time.perf_counter()
+            slots.acquire()
+            self.backpressure_seconds += time.perf_counter() - waited
+
+            # هر slot گرفته‌شده دقیقا یک مورد در results می‌گذارد (نویسنده آن را آزاد می‌کند)،
+            # وگرنه بعد از queue_size خطا دریافت برای همیشه منتظر می‌ماند
+            try:
+                if not page:
+                    results.put((tasks, None, None))
+                    return
+                if aborted:
+                    raise aborted[0]
+                for task in tasks:
+                    self.scraper.mark_task(task, 'fetched')
+                google_rank = tasks[0].get('google_rank', 0)
+                content = self.scraper.cached_content(page, google_rank)
+                if content is not None:
+                    self.reused += 1
+                    results.put((tasks, page, content))
+                    return
+                future = self._submit(page.html, url, google_rank)
+            except Exception as e:
+                if isinstance(e, BrokenProcessPool) and not aborted:
+                    logger.error(f"Parse process pool keeps failing, aborting the run: {str(e)}")
+                    aborted.append(e)
+                results.put((tasks, page, e))
+                return
+            future.add_done_callback(lambda f, tasks=tasks, page=page: results.put((tasks, page, f)))
+            futures.append(future)
+
+        try:
+            self.scraper.fetch_engine.run(list(tasks_by_url), on_result=on_page)
+            wait(futures)
+        except BaseException as e:
+            errors.append(e)
+        finally:
+            errors.extend(aborted)
+            results.put(_DONE)
+
+    def run(self, tasks_by_url, excel_file, db_manager=None):
+        """اجرای خط لوله برای {url: [task, ...]} و برگرداندن تعداد صفحه‌های ذخیره‌شده"""
+        results = queue.Queue(maxsize=self.queue_size)
+        slots = threading.BoundedSemaphore(self.queue_size)
+        errors = []
+        self.parsed = 0
+        self.reused = 0
+        self.restarts = 0
+        self.backpressure_seconds = 0.0
+        feeder = threading.Thread(
+            target=self._feed, args=(tasks_by_url, results, slots, errors), name='parse-feeder', daemon=True
+        )
+        feeder.start()
+
+        processed = 0
+        start = time.perf_counter()
+        # نویسنده واحد: فقط همین thread به اکسل و دیتابیس دسترسی دارد
+        while True:
+            item = results.get()
+            if item is _DONE:
+                break
+            tasks, page, outcome = item
+            try:
+                if page is None:
+                    self.scraper.store_tasks(tasks, page, None, excel_file, db_manager, 'fetch failed')
+                    continue
+                if isinstance(outcome, Exception):
+                    raise outcome
+                if isinstance(outcome, dict):
+                    content = outcome
+                else:
+                    content = outcome.result()
+                    self.parsed += 1
+                    self.scraper.remember_content(page, content)
+                processed += self.scraper.store_tasks(tasks, page, content, excel_file, db_manager)
+            except Exception as e:
+                logger.error(f"Error processing {tasks[0]['url']}: {str(e)}")
+                for task in tasks:
+                    self.scraper.mark_task(task, 'failed', e)
+            finally:
+                slots.release()
+
+        feeder.join()
+        if errors:
+            raise errors[0]
+
+        elapsed = time.perf_counter() - start
+        logger.info(
+            f"Parse pipeline: {processed} pages stored in {elapsed:.1f}s with {self.workers} workers "
+            f"({self.parsed} parsed, {self.reused} reused from cache, {self.restarts} pool restarts, "
+            f"fetch stalled {self.backpressure_seconds:.1f}s on backpressure)"
+        )
+        return processed
+
+    def close(self):
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,242 @@
+"""
+Offline re-extraction and re-scoring of stored pages
+
+Re-runs extract_content / calculate_content_score over HTML that is already on disk, either
+the page store (urls.html_ref) or an advanced_archiver output directory, on all cores, and
+updates the urls rows in bulk. No SERP searches and no page fetches.
+
+Usage:
+    python rescore.py                              # every row with stored HTML
+    python rescore.py --keyword "seo tools"
+    python rescore.py --archive-dir OUTPUT         # advanced_archiver output (manifest or archive_pages files)
+"""
+
+import argparse
+import os
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+from config import CONFIG, get_logger
+from parse_pipeline import worker_context
+
+logger = get_logger(__name__)
+
+# archive_pages در advanced_archiver: archive_{url بدون scheme با '/' -> '_'}_{%Y%m%d_%H%M%S}.html
+_ARCHIVE_NAME_RE = re.compile(r'^archive_(.+)_(\d{8}_\d{6})\.html$')
+
+# ContentScraper هر پروسس (در initializer ساخته می‌شود)
+_worker_scraper = None
+
+
+def archive_key(url):
+    """بخش URL در نام فایل‌های archive_pages"""
+    return url.split('//')[-1].replace('/', '_')
+
+
+def index_archive_dir(archive_dir):
+    """{archive_key: مسیر جدیدترین فایل آرشیو} برای فایل‌های archive_pages"""
+    latest = {}
+    for entry in os.scandir(archive_dir):
+        match = _ARCHIVE_NAME_RE.match(entry.name)
+        if not match:
+            continue
+        key, timestamp = match.groups()
+        if key not in latest or timestamp > latest[key][0]:
+            latest[key] = (timestamp, entry.path)
+    return {key: path for key, (_, path) in latest.items()}
+
+
+def _init_worker(parser_name, main_content_mode):
+    global _worker_scraper
+    from content_scraper import ContentScraper
+    from html_parsers import PARSERS
+
+    _worker_scraper = ContentScraper(
+        parser=PARSERS[parser_name](main_content_mode=main_content_mode),
+        offline=True
+    )
+
+
+def _extract_chunk(chunk):
+    """
+    استخراج یک دسته از صفحه‌ها داخل پروسس: هر عضو (source, url) است که source
+    یا ارجاع page store است یا مسیر فایل آرشیو. خروجی [(source, content یا None), ...]
+    """
+    results = []
+    for source, url in chunk:
+        try:
+            if source.endswith('.html'):
+                with open(source, 'r', encoding='utf-8', errors='replace') as f:
+                    content = _worker_scraper.extract_content(f.read(), url)
+            else:
+                content = _worker_scraper.extract_content(None, url, html_ref=source)
+        except Exception as e:
+            logger.error(f"Error re-extracting {url}: {str(e)}")
+            content = None
+        results.append((source, content))
+    return results
+
+
+class Rescorer:
+    """
+    خواندن ردیف‌های urls، گروه‌بندی بر اساس منبع HTML (هر صفحه یک بار پارس می‌شود)،
+    پارس در ProcessPool و به‌روزرسانی دسته‌ای دیتابیس روی همین thread.
+    """
+
+    def __init__(self, db_manager, workers=None, chunk_size=None):
+        from content_scraper import ContentScraper
+
+        self.db_manager = db_manager
+        self.workers = workers or CONFIG['PARSE_WORKERS'] or os.cpu_count() or 1
+        self.chunk_size = chunk_size or CONFIG['RESCORE_CHUNK_SIZE']
+        # امتیاز به رتبه هر ردیف بستگی دارد و در پروسس اصلی حساب می‌شود
+        self.scorer = ContentScraper(offline=True)
+        self.page_store = db_manager.page_store
+
+        self.pages = 0
+        self.failed = 0
+        self.updated = 0
+        self.score_changed = 0
+        self.unmatched = 0
+        self.elapsed = 0.0
+
+    def _rows(self, keyword_id=None):
+        query = "SELECT id, url, google_rank, content_score, html_ref FROM urls"
+        params = ()
+        if keyword_id:
+            query += " WHERE keyword_id = ?"
+            params = (keyword_id,)
+        with self.db_manager.lock:
+            return self.db_manager.cursor.execute(query, params).fetchall()
+
+    def groups_from_store(self, keyword_id=None):
+        """{html_ref: [(url_id, url, google_rank, old_score), ...]}"""
+        groups = {}
+        for url_id, url, google_rank, old_score, html_ref in self._rows(keyword_id):
+            if html_ref:
+                groups.setdefault(html_ref, []).append((url_id, url, google_rank, old_score))
+            else:
+                self.unmatched += 1
+        return groups
+
+    def groups_from_archive(self, archive_dir, keyword_id=None):
+        """
+        {مسیر فایل آرشیو: [(url_id, url, google_rank, old_score), ...]}؛ فایل هر URL از manifest
+        آرشیو (archive_manifest.db) و در غیر این صورت از نام فایل‌های archive_pages پیدا می‌شود
+        """
+        from archive_manifest import ArchiveManifest, normalize_url
+
+        files = index_archive_dir(archive_dir)
+        manifest_files = {}
+        manifest_path = Path(archive_dir) / 'archive_manifest.db'
+        if manifest_path.exists():
+            manifest = ArchiveManifest(str(manifest_path))
+            manifest_files = manifest.files_by_key()
+            manifest.close()
+        groups = {}
+        for url_id, url, google_rank, old_score, _ in self._rows(keyword_id):
+            file_name = manifest_files.get(normalize_url(url))
+            path = str(Path(archive_dir) / file_name) if file_name else files.get(archive_key(url))
+            if path:
+                groups.setdefault(path, []).append((url_id, url, google_rank, old_score))
+            else:
+                self.unmatched += 1
+        return groups
+
+    def _apply(self, groups, results, pending):
+        """محاسبه امتیاز هر ردیف و افزودن به دسته به‌روزرسانی"""
+        for source, content in results:
+            self.pages += 1
+            if not content:
+                self.failed += 1
+                continue
+            if self.page_store and content.get('main_content'):
+                # متن هر صفحه یک بار در store نوشته می‌شود (متن بدون تغییر فقط dedup است)
+                content['content_ref'] = str(self.page_store.put(content['main_content'], 'text'))
+            for url_id, url, google_rank, old_score in groups[source]:
+                score = self.scorer.calculate_content_score(content, google_rank or 0)
+                if score != old_score:
+                    self.score_changed += 1
+                pending.append((url_id, dict(content, url=url, google_rank=google_rank, content_score=score)))
+
+    def run(self, groups):
+        """پارس و به‌روزرسانی همه گروه‌ها؛ تعداد ردیف‌های به‌روزشده را برمی‌گرداند"""
+        sources = [(source, rows[0][1]) for source, rows in groups.items()]
+        chunks = [sources[i:i + self.chunk_size] for i in range(0, len(sources), self.chunk_size)]
+        parser = self.scorer.parser
+        start = time.perf_counter()
+        pending = []
+        # حداکثر دو دسته برای هر worker در جریان است تا حافظه با تعداد صفحه‌ها رشد نکند
+        window = self.workers * 2
+        # بدون fork: پروسس اصلی اتصال SQLite، mmap های page store و thread لاگ را نگه می‌دارد
+        with ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=worker_context(),
+            initializer=_init_worker,
+            initargs=(parser.name, parser.main_content_mode)
+        ) as executor:
+            remaining = iter(chunks)
+            in_flight = set()
+            while True:
+                for chunk in remaining:
+                    in_flight.add(executor.submit(_extract_chunk, chunk))
+                    if len(in_flight) >= window:
+                        break
+                if not in_flight:
+                    break
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    self._apply(groups, future.result(), pending)
+                if len(pending) >= CONFIG['DB_BATCH_SIZE']:
+                    self.updated += self.db_manager.bulk_update_url_data(pending)
+                    pending = []
+        self.updated += self.db_manager.bulk_update_url_data(pending)
+
+        self.elapsed = time.perf_counter() - start
+        logger.info(self.summary())
+        return self.updated
+
+    def summary(self):
+        rate = self.pages / self.elapsed if self.elapsed else 0.0
+        return (
+            f"Rescore: {self.pages} pages re-extracted in {self.elapsed:.1f}s ({rate:.0f} pages/s, "
+            f"{self.workers} workers), {self.updated} rows updated, {self.score_changed} scores changed, "
+            f"{self.failed} failed, {self.unmatched} rows without stored HTML"
+        )
+
+
+def main():
+    from database_manager import DatabaseManager
+
+    parser = argparse.ArgumentParser(description="Re-extract and re-score stored pages without fetching")
+    parser.add_argument('--db', default=None, help="database path (default: CONFIG['DB_PATH'])")
+    parser.add_argument('--archive-dir', default=None, help='advanced_archiver output instead of the page store')
+    parser.add_argument('--keyword', default=None, help='only rows of this keyword')
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    db_manager = DatabaseManager(args.db)
+    try:
+        keyword_id = None
+        if args.keyword:
+            row = db_manager.cursor.execute('SELECT id FROM keywords WHERE keyword = ?', (args.keyword,)).fetchone()
+            if not row:
+                logger.error(f"Keyword not found: {args.keyword}")
+                return
+            keyword_id = row[0]
+        rescorer = Rescorer(db_manager, workers=args.workers)
+        if args.archive_dir:
+            groups = rescorer.groups_from_archive(Path(args.archive_dir), keyword_id)
+        else:
+            groups = rescorer.groups_from_store(keyword_id)
+        logger.info(f"Re-scoring {sum(len(rows) for rows in groups.values())} rows from {len(groups)} stored pages")
+        rescorer.run(groups)
+        print(rescorer.summary())
+    finally:
+        db_manager.close()
+
+
+if __name__ == "__main__":
+    main()
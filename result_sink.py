@@ -0,0 +1,148 @@
+"""
+Append-only result sink for scraped content
+
+Each record is written once as a JSON line next to the target workbook
+(content_results_x.xlsx -> content_results_x.jsonl). The formatted Excel workbook is
+built from the sink in a single pass at the end of a keyword or run, instead of being
+read and rewritten for every URL.
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+from config import get_logger
+
+logger = get_logger(__name__)
+
+CONTENT_COLUMNS = [
+    'URL', 'Google Rank', 'Content Score', 'Title', 'Meta Description',
+    'H1', 'H2', 'H3', 'H4', 'H5', 'H6', 'Main Content', 'Tables', 'Timestamp'
+]
+
+
+def write_content_workbook(df, excel_file):
+    """نوشتن DataFrame محتوا در اکسل با قالب‌بندی سرستون و عرض ستون‌ها"""
+    with pd.ExcelWriter(excel_file, engine='xlsxwriter') as writer:
+        df.to_excel(writer, index=False, sheet_name='Content')
+
+        # Format worksheet
+        workbook = writer.book
+        worksheet = writer.sheets['Content']
+
+        # Add formats
+        header_format = workbook.add_format({
+            'bold': True,
+            'text_wrap': True,
+            'valign': 'top',
+            'bg_color': '#D9EAD3',
+            'border': 1
+        })
+
+        # Format headers and column widths
+        for idx, col in enumerate(df.columns):
+            worksheet.write(0, idx, col, header_format)
+            if col in ['URL', 'Title', 'Meta Description']:
+                worksheet.set_column(idx, idx, 40)
+            elif col in ['Main Content']:
+                worksheet.set_column(idx, idx, 60)
+            else:
+                worksheet.set_column(idx, idx, 30)
+
+
+class ResultSink:
+    """
+    فایل JSONL فقط-افزودنی برای یک فایل اکسل خروجی.
+    append هر رکورد را یک بار می‌نویسد؛ build_workbook اکسل را از روی آن می‌سازد
+    (برای URL تکراری آخرین رکورد می‌ماند، مثل رفتار قبلی جایگزینی ردیف).
+    فایل در اولین append باز می‌شود و بعد از close با append بعدی دوباره باز می‌شود.
+    """
+
+    def __init__(self, excel_file):
+        self.excel_path = Path(excel_file)
+        self.path = self.excel_path.with_suffix('.jsonl')
+        self._lock = threading.Lock()
+        self.appended = 0
+        if not self.path.exists() and self.excel_path.exists():
+            self._seed_from_workbook()
+        self._file = None
+
+    def _seed_from_workbook(self):
+        """یک بار: ردیف‌های اکسل قدیمی (ساخته‌شده پیش از sink) به JSONL منتقل می‌شوند"""
+        try:
+            existing_df = pd.read_excel(self.excel_path)
+            existing_df = existing_df.astype(object).where(existing_df.notna(), None)
+            with open(self.path, 'w', encoding='utf-8') as f:
+                for row in existing_df.to_dict('records'):
+                    f.write(json.dumps(row, ensure_ascii=False, default=str) + '\n')
+            logger.info(f"Seeded {len(existing_df)} rows from {self.excel_path} into {self.path}")
+        except Exception as e:
+            logger.error(f"Error reading existing Excel file: {str(e)}")
+
+    def append(self, row):
+        line = json.dumps(row, ensure_ascii=False, default=str) + '\n'
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, 'a', encoding='utf-8')
+            self._file.write(line)
+            self._file.flush()
+            self.appended += 1
+
+    def iter_rows(self):
+        if not self.path.exists():
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # خط ناقص (مثلا قطع برنامه وسط نوشتن) نادیده گرفته می‌شود
+                    logger.warning(f"Skipping malformed line in {self.path}")
+
+    def latest_rows(self):
+        """ردیف‌ها به ترتیب آخرین نوشتن، یک ردیف برای هر URL"""
+        rows = {}
+        total = 0
+        for row in self.iter_rows():
+            total += 1
+            rows.pop(row.get('URL'), None)
+            rows[row.get('URL')] = row
+        return list(rows.values()), total
+
+    def compact(self, rows):
+        """بازنویسی JSONL فقط با ردیف‌های نهایی (وقتی رکوردهای جایگزین‌شده زیاد شوند)"""
+        tmp_path = self.path.with_suffix('.jsonl.tmp')
+        with self._lock:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for row in rows:
+                    f.write(json.dumps(row, ensure_ascii=False, default=str) + '\n')
+            self._close_file()
+            os.replace(tmp_path, self.path)
+
+    def build_workbook(self):
+        """ساخت اکسل قالب‌بندی‌شده از روی sink در یک مرحله؛ تعداد ردیف‌ها را برمی‌گرداند"""
+        rows, total = self.latest_rows()
+        if not rows:
+            return 0
+        columns = CONTENT_COLUMNS + [c for c in rows[0] if c not in CONTENT_COLUMNS]
+        df = pd.DataFrame(rows, columns=columns)
+        write_content_workbook(df, self.excel_path)
+        if total > 2 * len(rows):
+            self.compact(rows)
+        logger.info(f"Content saved to {self.excel_path} ({len(rows)} rows)")
+        return len(rows)
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def close(self):
+        with self._lock:
+            self._close_file()
@@ -0,0 +1,299 @@
+"""
+Versioned SQLite schema for the SEO database
+
+Migrations are applied in order and tracked in PRAGMA user_version, so any existing
+database (including the original scraped_data layout) is upgraded in place on connect.
+
+Usage:
+    python schema.py            # migrate CONFIG['DB_PATH'] and print the version
+    python schema.py --db path/to/seo_data.db
+"""
+
+import argparse
+import json
+import sqlite3
+from pathlib import Path
+
+from config import CONFIG, get_logger
+
+logger = get_logger(__name__)
+
+HEADING_LEVELS = {f'h{level}': level for level in range(1, 7)}
+
+
+# ---------------------- Migrations ----------------------
+def _columns(conn, table):
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def _v1_base_tables(conn):
+    """جدول‌های اولیه (همان ساختار قبلی DatabaseManager) به اضافه created_at برای keywords"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS keywords (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            keyword TEXT UNIQUE NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    if 'created_at' not in _columns(conn, 'keywords'):
+        # ALTER TABLE مقدار پیش‌فرض غیرثابت نمی‌پذیرد
+        conn.execute("ALTER TABLE keywords ADD COLUMN created_at DATETIME")
+        conn.execute("UPDATE keywords SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL")
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS scraped_data (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            keyword_id INTEGER NOT NULL,
+            url TEXT NOT NULL,
+            title TEXT,
+            description TEXT,
+            headers TEXT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (keyword_id) REFERENCES keywords(id) ON DELETE CASCADE
+        )
+    ''')
+
+
+def _v2_urls(conn):
+    """
+    جدول urls با رتبه و امتیاز عددی، عنوان‌ها در جدول فرزند url_headings و ایندکس‌های پوشا.
+    ردیف‌های scraped_data منتقل و جدول قدیمی حذف می‌شود.
+    """
+    conn.execute('''
+        CREATE TABLE urls (
+            id INTEGER PRIMARY KEY,
+            keyword_id INTEGER NOT NULL REFERENCES keywords(id) ON DELETE CASCADE,
+            url TEXT NOT NULL,
+            title TEXT,
+            meta_description TEXT,
+            google_rank INTEGER,
+            content_score REAL,
+            main_content TEXT,
+            created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE url_headings (
+            url_id INTEGER NOT NULL REFERENCES urls(id) ON DELETE CASCADE,
+            level INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            text TEXT NOT NULL,
+            PRIMARY KEY (url_id, level, position)
+        ) WITHOUT ROWID
+    ''')
+    # "URLهای یک کلمه کلیدی به ترتیب رتبه": فقط از ایندکس خوانده می‌شود
+    conn.execute('''
+        CREATE INDEX idx_urls_keyword_rank
+        ON urls (keyword_id, google_rank, url, content_score, created_at)
+    ''')
+    # "آخرین نسخه هر URL": عمدا پوشا نیست؛ با LIMIT 1 فقط یک ردیف از جدول خوانده می‌شود و
+    # افزودن title و ستون‌های دیگر LATEST_SNAPSHOT_QUERY آن‌ها را برای هر نسخه در ایندکس تکرار می‌کرد
+    conn.execute("CREATE INDEX idx_urls_url_created ON urls (url, created_at)")
+
+    rows = conn.execute('''
+        SELECT id, keyword_id, url, title, description, headers, timestamp FROM scraped_data
+    ''').fetchall()
+    headings = []
+    for row_id, keyword_id, url, title, description, headers, timestamp in rows:
+        conn.execute('''
+            INSERT INTO urls (id, keyword_id, url, title, meta_description, created_at)
+            VALUES (?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+        ''', (row_id, keyword_id, url, title, description, timestamp))
+        try:
+            parsed = json.loads(headers) if headers else {}
+        except ValueError:
+            parsed = {}
+        headings.extend(heading_rows(row_id, parsed))
+    conn.executemany("INSERT INTO url_headings (url_id, level, position, text) VALUES (?, ?, ?, ?)", headings)
+    conn.execute("DROP TABLE scraped_data")
+    if rows:
+        logger.info(f"Migrated {len(rows)} rows from scraped_data to urls")
+
+
+def _v3_store_refs(conn):
+    """
+    ارجاع به page store: html_ref برای HTML خام و content_ref برای متن اصلی.
+    وقتی content_ref پر باشد main_content در خود ردیف NULL است.
+    """
+    conn.execute("ALTER TABLE urls ADD COLUMN html_ref TEXT")
+    conn.execute("ALTER TABLE urls ADD COLUMN content_ref TEXT")
+
+
+def _v4_score_features(conn):
+    """
+    ستون‌های ویژگی امتیاز که در url_headings نیستند (برای batch_scoring).
+    طول متن ردیف‌هایی که main_content در خود جدول دارند پر می‌شود؛ بقیه با rescore.
+    """
+    conn.execute("ALTER TABLE urls ADD COLUMN content_length INTEGER")
+    conn.execute("ALTER TABLE urls ADD COLUMN table_count INTEGER")
+    conn.execute("UPDATE urls SET content_length = length(main_content) WHERE main_content IS NOT NULL")
+
+
+def _v5_change_detection(conn):
+    """
+    اثر انگشت محتوا و زمان آخرین مشاهده: صفحه بدون تغییر ردیف جدید نمی‌گیرد و فقط
+    در url_seen ثبت می‌شود. ایندکس created_at برای پرس‌وجوی «تغییرکرده از تاریخ».
+    """
+    conn.execute("ALTER TABLE urls ADD COLUMN fingerprint TEXT")
+    conn.execute("ALTER TABLE urls ADD COLUMN last_seen_at DATETIME")
+    conn.execute('''
+        CREATE TABLE url_seen (
+            url_id INTEGER NOT NULL REFERENCES urls(id) ON DELETE CASCADE,
+            seen_at DATETIME NOT NULL,
+            google_rank INTEGER,
+            PRIMARY KEY (url_id, seen_at)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute("CREATE INDEX idx_urls_created ON urls (created_at)")
+
+
+MIGRATIONS = [
+    (1, 'base tables', _v1_base_tables),
+    (2, 'typed urls table, url_headings and covering indexes', _v2_urls),
+    (3, 'page store references for raw HTML and main content', _v3_store_refs),
+    (4, 'content_length and table_count score features', _v4_score_features),
+    (5, 'content fingerprints and seen timestamps', _v5_change_detection),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    """اجرای migration های باقی‌مانده، هر کدام در یک تراکنش؛ نسخه نهایی را برمی‌گرداند"""
+    version = schema_version(conn)
+    if version > SCHEMA_VERSION:
+        raise RuntimeError(f"Database schema version {version} is newer than this code ({SCHEMA_VERSION})")
+    for target, description, apply in MIGRATIONS:
+        if target <= version:
+            continue
+        try:
+            conn.execute("BEGIN")
+            apply(conn)
+            conn.execute(f"PRAGMA user_version = {target}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        logger.info(f"Database schema migrated to version {target}: {description}")
+        version = target
+    return version
+
+
+def connect(db_path=None, **kwargs):
+    """اتصال به دیتابیس با foreign key فعال و schema به‌روز"""
+    db_path = Path(db_path or CONFIG['DB_PATH'])
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(db_path), **kwargs)
+    conn.execute("PRAGMA foreign_keys = ON")
+    migrate(conn)
+    return conn
+
+
+# ---------------------- Row helpers & shared queries ----------------------
+def heading_rows(url_id, headings):
+    """{'h1': [...], ...} -> ردیف‌های (url_id, level, position, text) برای url_headings"""
+    rows = []
+    for tag, level in HEADING_LEVELS.items():
+        for position, text in enumerate(headings.get(tag) or []):
+            rows.append((url_id, level, position, text))
+    return rows
+
+
+def headings_sql(level, alias='u'):
+    """عبارت SQL برای عنوان‌های یک سطح به صورت رشته 'a | b'"""
+    return f'''(
+        SELECT group_concat(text, ' | ') FROM (
+            SELECT text FROM url_headings WHERE url_id = {alias}.id AND level = {level} ORDER BY position
+        )
+    )'''
+
+
+URLS_FOR_KEYWORD_QUERY = f'''
+    SELECT
+        u.url,
+        u.title,
+        u.meta_description,
+        u.google_rank,
+        u.content_score,
+        {headings_sql(1)} AS h1,
+        {headings_sql(2)} AS h2,
+        {headings_sql(3)} AS h3,
+        u.main_content,
+        u.content_ref,
+        k.keyword,
+        u.created_at
+    FROM urls u
+    JOIN keywords k ON u.keyword_id = k.id
+    WHERE u.keyword_id = ?
+    ORDER BY u.google_rank
+'''
+
+URLS_EXPORT_QUERY = f'''
+    SELECT
+        k.keyword,
+        u.url,
+        u.title,
+        u.meta_description,
+        u.google_rank,
+        u.content_score,
+        {headings_sql(1)} AS h1,
+        {headings_sql(2)} AS h2,
+        {headings_sql(3)} AS h3,
+        u.main_content,
+        u.content_ref,
+        u.created_at
+    FROM urls u
+    JOIN keywords k ON u.keyword_id = k.id
+'''
+
+LATEST_SNAPSHOT_QUERY = '''
+    SELECT id, keyword_id, url, title, google_rank, content_score, html_ref, content_ref, created_at
+    FROM urls
+    WHERE url = ?
+    ORDER BY created_at DESC
+    LIMIT 1
+'''
+
+# آخرین نسخه یک URL برای یک کلمه کلیدی (شناسه‌ها به ترتیب درج هستند)
+LATEST_FINGERPRINT_QUERY = '''
+    SELECT id, fingerprint
+    FROM urls
+    WHERE url = ? AND keyword_id = ?
+    ORDER BY id DESC
+    LIMIT 1
+'''
+
+# نسخه‌های جدید (صفحه تازه یا محتوای تغییرکرده) از یک زمان به بعد
+CHANGED_SINCE_QUERY = '''
+    SELECT
+        k.keyword,
+        u.url,
+        u.google_rank,
+        u.content_score,
+        u.created_at,
+        (
+            SELECT MAX(p.created_at) FROM urls p
+            WHERE p.url = u.url AND p.keyword_id = u.keyword_id AND p.id < u.id
+        ) AS previous_version_at,
+        COALESCE(u.last_seen_at, u.created_at) AS last_seen_at
+    FROM urls u
+    JOIN keywords k ON u.keyword_id = k.id
+    WHERE u.created_at >= ?
+    ORDER BY u.created_at
+'''
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate the SEO database schema")
+    parser.add_argument('--db', default=None, help="database path (default: CONFIG['DB_PATH'])")
+    args = parser.parse_args()
+
+    conn = connect(args.db)
+    print(f"Schema version: {schema_version(conn)} (latest {SCHEMA_VERSION})")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+"""
+Parallel SERP collection with a pool of browser workers
+
+Each worker thread owns one WebScraper (one Chrome instance). Keywords are fed into a shared
+queue and (keyword, results) pairs come back in completion order, so main.py can store and
+scrape one keyword while the browsers are already searching the next ones. A browser is
+restarted after SCRAPER_POOL_MAX_SEARCHES searches (bounded lifetime) and when it stops
+responding, in which case the keyword is searched again on the fresh browser. Searches of all
+workers are paced by one shared RateLimiter (SEARCH_RATE_PER_MINUTE).
+"""
+
+import queue
+import random
+import threading
+import time
+
+from config import CONFIG, get_logger
+
+logger = get_logger(__name__)
+
+_STOP = object()
+
+# undetected_chromedriver یک فایل chromedriver مشترک را patch می‌کند؛ شروع همزمان چند مرورگر
+# (text file busy یا driver نیمه‌patch شده) خطای تصادفی می‌دهد، پس ساخت مرورگرها پشت سر هم انجام می‌شود
+_LAUNCH_LOCK = threading.Lock()
+
+
+class RateLimiter:
+    """
+    حداقل فاصله بین شروع دو جستجو در کل اجرا (مشترک بین همه workerها)، با نوسان تصادفی
+    jitter به اندازه کسری از فاصله. per_minute صفر یعنی بدون محدودیت.
+    """
+
+    def __init__(self, per_minute=None, jitter=None):
+        per_minute = CONFIG['SEARCH_RATE_PER_MINUTE'] if per_minute is None else per_minute
+        self.interval = 60.0 / per_minute if per_minute else 0.0
+        self.jitter = CONFIG['SEARCH_RATE_JITTER'] if jitter is None else jitter
+        self.waits = 0
+        self.waited_seconds = 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """صبر تا نوبت جستجوی بعدی؛ مدت انتظار را برمی‌گرداند"""
+        if not self.interval:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+            wait = slot - now
+            if wait > 0:
+                self.waits += 1
+                self.waited_seconds += wait
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class WorkerMetrics:
+    """آمار یک worker مرورگر"""
+
+    def __init__(self, index):
+        self.index = index
+        self.searches = 0
+        self.results = 0
+        self.empty = 0
+        self.crashes = 0
+        self.restarts = 0
+        self.start_failures = 0
+        self.browser_searches = 0  # جستجوهای مرورگر فعلی (برای عمر محدود)
+        self.search_seconds = 0.0
+        self.slowest_search = 0.0
+        self.rate_wait_seconds = 0.0
+        self.startup_seconds = 0.0
+
+    def as_dict(self):
+        return {
+            'worker': self.index,
+            'searches': self.searches,
+            'results': self.results,
+            'empty': self.empty,
+            'crashes': self.crashes,
+            'restarts': self.restarts,
+            'start_failures': self.start_failures,
+            'search_seconds': self.search_seconds,
+            'avg_search_seconds': self.search_seconds / self.searches if self.searches else 0.0,
+            'slowest_search': self.slowest_search,
+            'rate_wait_seconds': self.rate_wait_seconds,
+            'startup_seconds': self.startup_seconds,
+            'keywords_per_minute': self.searches * 60 / self.search_seconds if self.search_seconds else 0.0,
+        }
+
+    def summary(self):
+        stats = self.as_dict()
+        return (
+            f"worker {self.index}: {stats['searches']} searches ({stats['empty']} empty, {stats['results']} results) "
+            f"in {stats['search_seconds']:.1f}s, {stats['keywords_per_minute']:.1f} keywords/min, "
+            f"{stats['avg_search_seconds']:.2f}s/keyword (slowest {stats['slowest_search']:.2f}s), "
+            f"rate limit wait {stats['rate_wait_seconds']:.1f}s, {stats['restarts']} restarts, {stats['crashes']} crashes, browser startup {stats['startup_seconds']:.1f}s"
+        )
+
+
+class WebScraperPool:
+    """
+    N مرورگر موازی برای search_google.
+    submit کلمه کلیدی را در صف می‌گذارد و completed نتایج را به ترتیب پایان جستجو برمی‌گرداند.
+    scraper_factory برای ساخت هر WebScraper است (پیش‌فرض با search_url و headless همین pool).
+    """
+
+    def __init__(self, workers=None, max_searches=None, search_url=None, headless=None,
+                 rate_limiter=None, scraper_factory=None):
+        self.workers = workers or CONFIG['SCRAPER_POOL_WORKERS']
+        self.max_searches = max_searches or CONFIG['SCRAPER_POOL_MAX_SEARCHES']
+        self.search_url = search_url
+        self.headless = headless
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.scraper_factory = scraper_factory or self._default_factory
+
+        self.tasks = queue.Queue()
+        self.results = queue.Queue()
+        self.metrics = [WorkerMetrics(i) for i in range(self.workers)]
+        self.submitted = 0
+        self.returned = 0
+        self.elapsed = 0.0
+        self._started_at = None
+        self._threads = []
+
+    def _default_factory(self):
+        from web_scraper import WebScraper
+
+        return WebScraper(search_url=self.search_url, headless=self.headless)
+
+    # ---------------------- Lifecycle ----------------------
+    def start(self):
+        self._started_at = time.perf_counter()
+        for metrics in self.metrics:
+            thread = threading.Thread(
+                target=self._worker, args=(metrics,), name=f'serp-worker-{metrics.index}', daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def close(self):
+        """توقف workerها بعد از کارهای باقی‌مانده در صف و بستن مرورگرها"""
+        for _ in self._threads:
+            self.tasks.put(_STOP)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        if self._started_at is not None:
+            self.elapsed = time.perf_counter() - self._started_at
+            self._started_at = None
+        logger.info(self.summary())
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # ---------------------- Work queue ----------------------
+    def submit(self, keyword):
+        self.tasks.put(keyword)
+        self.submitted += 1
+
+    def completed(self):
+        """(keyword, results) برای هر کلمه ارسال‌شده، به ترتیب پایان جستجو"""
+        while self.returned < self.submitted:
+            item = self.results.get()
+            self.returned += 1
+            yield item
+
+    def search_all(self, keywords):
+        """{keyword: results} برای لیست کلمات کلیدی"""
+        for keyword in keywords:
+            self.submit(keyword)
+        return dict(self.completed())
+
+    # ---------------------- Workers ----------------------
+    def _launch(self, metrics):
+        """ساخت مرورگر جدید؛ None اگر بعد از MAX_RETRIES تلاش بالا نیاید"""
+        for attempt in range(1, CONFIG['MAX_RETRIES'] + 1):
+            start = time.perf_counter()
+            try:
+                with _LAUNCH_LOCK:
+                    scraper = self.scraper_factory()
+                metrics.startup_seconds += time.perf_counter() - start
+                metrics.browser_searches = 0
+                return scraper
+            except Exception as e:
+                metrics.start_failures += 1
+                logger.error(f"Worker {metrics.index}: browser start failed (attempt {attempt}): {str(e)}")
+                time.sleep(attempt)
+        return None
+
+    @staticmethod
+    def _shutdown(scraper):
+        try:
+            scraper.close_browser()
+        except Exception as e:
+            logger.error(f"Error closing browser: {str(e)}")
+
+    def _search(self, metrics, scraper, keyword):
+        """جستجو با مرورگر فعلی؛ اگر مرورگر از کار افتاده باشد با مرورگر تازه تکرار می‌شود"""
+        results = []
+        for attempt in range(1, CONFIG['MAX_RETRIES'] + 1):
+            if scraper is not None and metrics.browser_searches >= self.max_searches:
+                # عمر مرورگر تمام شده؛ حافظه و وضعیت Chrome با شروع دوباره پاک می‌شود
+                self._shutdown(scraper)
+                scraper = None
+                metrics.restarts += 1
+            if scraper is None:
+                scraper = self._launch(metrics)
+                if scraper is None:
+                    break
+
+            metrics.rate_wait_seconds += self.rate_limiter.acquire()
+            start = time.perf_counter()
+            try:
+                results = scraper.search_google(keyword)
+            except Exception as e:
+                logger.error(f"Worker {metrics.index}: search error for '{keyword}': {str(e)}")
+                results = []
+            elapsed = time.perf_counter() - start
+            metrics.search_seconds += elapsed
+            metrics.slowest_search = max(metrics.slowest_search, elapsed)
+            metrics.browser_searches += 1
+            if results or scraper.is_alive():
+                break
+
+            metrics.crashes += 1
+            logger.warning(f"Worker {metrics.index}: browser stopped responding on '{keyword}' (attempt {attempt}), restarting")
+            self._shutdown(scraper)
+            scraper = None
+            metrics.restarts += 1
+
+        metrics.searches += 1
+        metrics.results += len(results)
+        if not results:
+            metrics.empty += 1
+        return scraper, results
+
+    def _worker(self, metrics):
+        scraper = None
+        try:
+            while True:
+                keyword = self.tasks.get()
+                if keyword is _STOP:
+                    break
+                scraper, results = self._search(metrics, scraper, keyword)
+                self.results.put((keyword, results))
+        finally:
+            if scraper is not None:
+                self._shutdown(scraper)
+
+    # ---------------------- Metrics ----------------------
+    def as_dict(self):
+        searches = sum(metrics.searches for metrics in self.metrics)
+        return {
+            'workers': self.workers,
+            'searches': searches,
+            'elapsed': self.elapsed,
+            'keywords_per_minute': searches * 60 / self.elapsed if self.elapsed else 0.0,
+            'per_worker': [metrics.as_dict() for metrics in self.metrics],
+        }
+
+    def summary(self):
+        stats = self.as_dict()
+        lines = [
+            f"SERP pool: {stats['searches']} keywords in {stats['elapsed']:.1f}s with {stats['workers']} browsers "
+            f"({stats['keywords_per_minute']:.1f} keywords/min)"
+        ]
+        lines.extend(f"  {metrics.summary()}" for metrics in self.metrics)
+        return '\n'.join(lines)
@@ -0,0 +1,329 @@
+"""
+Browser-free parsing of search result pages
+
+parse_serp turns the HTML of a results page (str or bytes: WebScraper's page_source, or a
+page saved on disk) into the same result dicts WebScraper returns, ranked in page order.
+iter_serp_dir streams a directory of saved pages one file at a time, so historical SERPs can
+be reprocessed in bulk without a browser. WebScraper writes a run file next to the pages of
+each finished search with the URL of every page; relative links are resolved against it (or
+against CONFIG['SEARCH_URL'] for pages without one), and by default only the newest complete
+run of each keyword is read, so pages of different searches are never mixed.
+
+The fast path needs lxml and cssselect (pip install lxml cssselect); without them the same
+selectors run through BeautifulSoup. Both paths extract text with the same rules as
+WebElement.text: a space only at block boundaries and <br>, script/style text dropped.
+
+Usage:
+    python serp_parser.py good_output/serp_pages                 # combined Excel + JSON
+    python serp_parser.py saved_serps --pattern "*.htm" --output reparsed
+"""
+
+import argparse
+import json
+import re
+from collections import namedtuple
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from urllib.parse import quote, unquote, urljoin
+
+from bs4 import BeautifulSoup, NavigableString, Tag
+from bs4.element import PreformattedString
+
+from config import CONFIG, get_logger
+
+logger = get_logger(__name__)
+
+try:
+    from lxml import html as lxml_html
+    from lxml.cssselect import CSSSelector
+    _HAS_LXML_CSS = True
+except ImportError:
+    _HAS_LXML_CSS = False
+
+# دامنه‌هایی که نتیجه آن‌ها کنار گذاشته می‌شود
+BLACKLIST = ('google.com', 'youtube.com', 'facebook.com')
+
+# نام فایل صفحه‌های ذخیره‌شده WebScraper: serp_{keyword با quote}_p{page}_{%Y%m%d_%H%M%S}.html
+_SERP_NAME_RE = re.compile(r'^serp_(.+)_p(\d+)_(\d{8}_\d{6})\.html?$')
+
+# فایل اجرای کامل یک جستجو: serp_{keyword با quote}_{%Y%m%d_%H%M%S}.run.json
+_SERP_RUN_RE = re.compile(r'^serp_(.+)_(\d{8}_\d{6})\.run\.json$')
+
+SerpPage = namedtuple('SerpPage', 'path keyword page results run')
+
+# عنصرهایی که مثل WebElement.text متنشان از متن اطراف جدا می‌شود؛ تگ‌های inline بدون فاصله به هم می‌چسبند
+_BLOCK_TAGS = frozenset({
+    'address', 'article', 'aside', 'blockquote', 'br', 'dd', 'div', 'dl', 'dt', 'fieldset', 'figcaption',
+    'figure', 'footer', 'form', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header', 'hr', 'li', 'main', 'nav',
+    'ol', 'p', 'pre', 'section', 'table', 'tbody', 'td', 'tfoot', 'th', 'thead', 'tr', 'ul',
+})
+# متن این تگ‌ها دیده نمی‌شود
+_SKIP_TAGS = frozenset({'script', 'style', 'noscript', 'template'})
+
+
+def is_valid_url(url):
+    return bool(url) and not any(site in url.lower() for site in BLACKLIST)
+
+
+def serp_file_name(keyword, page, timestamp=None):
+    """نام فایل ذخیره صفحه نتایج؛ کلمه کلیدی با quote در نام می‌ماند"""
+    timestamp = timestamp or datetime.now().strftime("%Y%m%d_%H%M%S")
+    return f"serp_{quote(keyword, safe='')}_p{page}_{timestamp}.html"
+
+
+def serp_file_info(path):
+    """(keyword, page, timestamp اجرا) از نام فایل، یا (None, 1, None) برای نام‌های دیگر"""
+    match = _SERP_NAME_RE.match(Path(path).name)
+    if not match:
+        return None, 1, None
+    return unquote(match.group(1)), int(match.group(2)), match.group(3)
+
+
+def serp_run_file_name(keyword, timestamp):
+    return f"serp_{quote(keyword, safe='')}_{timestamp}.run.json"
+
+
+def write_serp_run(directory, keyword, timestamp, pages):
+    """
+    ثبت اجرای کامل یک جستجو بعد از ذخیره همه صفحه‌هایش؛ pages لیست {'page', 'file', 'url'}.
+    صفحه‌های اجرایی که فایل run ندارد (مثلا جستجوی نیمه‌کاره) ناقص حساب می‌شوند.
+    """
+    path = Path(directory) / serp_run_file_name(keyword, timestamp)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'keyword': keyword, 'timestamp': timestamp, 'pages': pages}, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def read_serp_runs(directory):
+    """{(keyword, timestamp): {page: url}} از فایل‌های run پوشه"""
+    runs = {}
+    for path in Path(directory).glob('serp_*.run.json'):
+        if not _SERP_RUN_RE.match(path.name):
+            continue
+        try:
+            with open(path, encoding='utf-8') as f:
+                run = json.load(f)
+            runs[(run['keyword'], run['timestamp'])] = {int(page['page']): page.get('url') for page in run['pages']}
+        except Exception as e:
+            logger.error(f"Error reading {path}: {str(e)}")
+    return runs
+
+
+def _clean_text(text):
+    # مثل .text در WebDriver: فاصله‌ها یکی و ابتدا و انتها حذف می‌شوند
+    return ' '.join(text.split())
+
+
+def _lxml_text(element):
+    """متن قابل مشاهده عنصر lxml با قواعد _BLOCK_TAGS و _SKIP_TAGS"""
+    parts = []
+
+    def walk(node):
+        for child in node:
+            # کامنت و processing instruction تگ رشته‌ای ندارند؛ فقط tail آن‌ها متن است
+            tag = child.tag.lower() if isinstance(child.tag, str) else None
+            if tag is not None and tag not in _SKIP_TAGS:
+                block = tag in _BLOCK_TAGS
+                if block:
+                    parts.append(' ')
+                if child.text:
+                    parts.append(child.text)
+                walk(child)
+                if block:
+                    parts.append(' ')
+            if child.tail:
+                parts.append(child.tail)
+
+    if element.text:
+        parts.append(element.text)
+    walk(element)
+    return _clean_text(''.join(parts))
+
+
+def _soup_text(element):
+    """متن قابل مشاهده عنصر BeautifulSoup با همان قواعد _lxml_text"""
+    parts = []
+
+    def walk(node):
+        for child in node.children:
+            if isinstance(child, Tag):
+                name = child.name.lower()
+                if name in _SKIP_TAGS:
+                    continue
+                block = name in _BLOCK_TAGS
+                if block:
+                    parts.append(' ')
+                walk(child)
+                if block:
+                    parts.append(' ')
+            elif isinstance(child, NavigableString) and not isinstance(child, PreformattedString):
+                # PreformattedString: کامنت، CDATA، doctype و مانند آن
+                parts.append(str(child))
+
+    walk(element)
+    return _clean_text(''.join(parts))
+
+
+@lru_cache(maxsize=16)
+def _compiled_selectors(selectors):
+    return {name: CSSSelector(selector) for name, selector in selectors}
+
+
+def _lxml_tree(html):
+    try:
+        return lxml_html.fromstring(html)
+    except ValueError:
+        # رشته با اعلان encoding (<?xml ...?>) فقط به صورت bytes پارس می‌شود
+        return lxml_html.fromstring(html.encode('utf-8'))
+
+
+def parse_results(html, base_url=None, selectors=None):
+    """
+    همه نتایج (title, link, description) صفحه به ترتیب، بدون فیلتر.
+    لینک‌های نسبی مثل get_attribute('href') نسبت به base_url کامل می‌شوند.
+    """
+    selectors = selectors or CONFIG['SERP_SELECTORS']
+    results = []
+    if _HAS_LXML_CSS:
+        compiled = _compiled_selectors(tuple(sorted(selectors.items())))
+        for element in compiled['result'](_lxml_tree(html)):
+            titles = compiled['title'](element)
+            links = compiled['link'](element)
+            if not titles or not links:
+                continue
+            descriptions = compiled['description'](element)
+            results.append({
+                'title': _lxml_text(titles[0]),
+                'link': urljoin(base_url or '', links[0].get('href') or ''),
+                'description': _lxml_text(descriptions[0]) if descriptions else '',
+            })
+    else:
+        soup = BeautifulSoup(html, 'html.parser')
+        for element in soup.select(selectors['result']):
+            title = element.select_one(selectors['title'])
+            link = element.select_one(selectors['link'])
+            if title is None or link is None:
+                continue
+            description = element.select_one(selectors['description'])
+            results.append({
+                'title': _soup_text(title),
+                'link': urljoin(base_url or '', link.get('href') or ''),
+                'description': _soup_text(description) if description is not None else '',
+            })
+    return results
+
+
+def parse_serp(html, base_url=None, selectors=None, start_rank=1):
+    """نتایج معتبر صفحه (مثل WebScraper) با google_rank از start_rank"""
+    results = [
+        result for result in parse_results(html, base_url, selectors)
+        if result['title'] and is_valid_url(result['link'])
+    ]
+    for rank, result in enumerate(results, start_rank):
+        result['google_rank'] = rank
+    return results
+
+
+def iter_serp_dir(directory, pattern='*.html', selectors=None, latest_only=True, base_url=None):
+    """
+    SerpPage برای هر فایل پوشه، یکی یکی (حافظه به اندازه یک صفحه).
+    صفحه‌های هر اجرا به ترتیب page پشت سر هم می‌آیند. با latest_only برای هر کلمه فقط جدیدترین
+    اجرای کامل (یا اگر هیچ اجرایی کامل نیست، جدیدترین اجرا) خوانده می‌شود.
+    لینک‌های نسبی نسبت به آدرس ثبت‌شده صفحه، یا base_url (پیش‌فرض CONFIG['SEARCH_URL']) کامل می‌شوند.
+    """
+    base_url = base_url or CONFIG['SEARCH_URL']
+    runs = read_serp_runs(directory)
+    pages_by_run = {}
+    others = []
+    for path in Path(directory).glob(pattern):
+        keyword, page, timestamp = serp_file_info(path)
+        if keyword is None:
+            others.append(path)
+        else:
+            pages_by_run.setdefault((keyword, timestamp), {})[page] = path
+
+    selected = set(pages_by_run)
+    if latest_only:
+        timestamps = {}
+        for keyword, timestamp in pages_by_run:
+            timestamps.setdefault(keyword, []).append(timestamp)
+        selected = set()
+        for keyword, stamps in timestamps.items():
+            stamps.sort(reverse=True)
+            complete = [
+                timestamp for timestamp in stamps
+                if (keyword, timestamp) in runs and set(runs[(keyword, timestamp)]) <= set(pages_by_run[(keyword, timestamp)])
+            ]
+            selected.add((keyword, complete[0] if complete else stamps[0]))
+
+    jobs = [
+        (keyword, timestamp, page, path)
+        for (keyword, timestamp), pages in pages_by_run.items() if (keyword, timestamp) in selected
+        for page, path in pages.items()
+    ]
+    jobs.sort()
+    jobs.extend((None, None, 1, path) for path in sorted(others))
+    for keyword, timestamp, page, path in jobs:
+        page_url = runs.get((keyword, timestamp), {}).get(page) or base_url
+        try:
+            results = parse_serp(path.read_bytes(), page_url, selectors)
+        except Exception as e:
+            logger.error(f"Error parsing {path}: {str(e)}")
+            continue
+        yield SerpPage(path, keyword, page, results, timestamp)
+
+
+def iter_keyword_rows(pages):
+    """
+    ردیف‌های ترکیبی (مثل results_keywords.xlsx) از SerpPage ها: رتبه در صفحه‌های یک اجرای هر کلمه
+    ادامه پیدا می‌کند و مثل search_google حداکثر 20 نتیجه برای هر کلمه می‌ماند.
+    """
+    current = None
+    rank = 0
+    for serp in pages:
+        keyword = serp.keyword or serp.path.stem
+        if (keyword, serp.run) != current:
+            current = (keyword, serp.run)
+            rank = 0
+        for result in serp.results:
+            if rank >= 20:
+                break
+            rank += 1
+            yield {**result, 'google_rank': rank, 'keyword': keyword}
+
+
+def main():
+    from output_assembly import SerpAssembler
+
+    parser = argparse.ArgumentParser(description="Re-parse saved search result pages without a browser")
+    parser.add_argument('directory', help='directory of saved SERP HTML files')
+    parser.add_argument('--pattern', default='*.html')
+    parser.add_argument('--output', default=None, help="output directory (default: CONFIG['OUTPUT_DIR'])")
+    parser.add_argument('--all-versions', action='store_true', help='parse every saved run of a keyword, not only the newest complete one')
+    parser.add_argument('--base-url', default=None, help="URL for resolving relative links of pages without a run file (default: CONFIG['SEARCH_URL'])")
+    args = parser.parse_args()
+
+    output_dir = Path(args.output or CONFIG['OUTPUT_DIR'])
+    output_dir.mkdir(parents=True, exist_ok=True)
+    pages = []
+
+    def counted(serps):
+        for serp in serps:
+            pages.append(serp.path)
+            yield serp
+
+    assembler = SerpAssembler()
+    serps = iter_serp_dir(args.directory, args.pattern, latest_only=not args.all_versions, base_url=args.base_url)
+    assembler.add_rows(iter_keyword_rows(counted(serps)))
+    logger.info(f"Parsed {len(pages)} pages, {assembler.rows} results")
+    if not assembler.rows:
+        logger.warning("No results were found")
+        return
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    assembler.write_excel(output_dir / f'results_reparsed_{timestamp}.xlsx')
+    assembler.write_json(output_dir / f'results_reparsed_{timestamp}.json')
+
+
+if __name__ == "__main__":
+    main()
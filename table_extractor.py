@@ -0,0 +1,398 @@
+"""
+Native table extraction on an already-parsed tree (BeautifulSoup Tag or lxml element)
+
+Produces the same records as pd.read_html(str(table))[0].to_dict('records') without
+re-serializing and re-parsing every table: thead / top <th>-only header rows, rowspan and
+colspan expansion, ragged-row padding, "Unnamed: i" / ".1" column names and per-column
+int / float / bool / str inference with pandas' default NA strings.
+"""
+
+import copy
+import math
+import re
+from collections import defaultdict
+
+from bs4 import Comment, Declaration, Doctype, NavigableString, ProcessingInstruction, Tag
+
+from config import CONFIG, get_logger
+
+logger = get_logger(__name__)
+
+# na_values پیش‌فرض pandas
+NA_VALUES = frozenset((
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+))
+TRUE_VALUES = frozenset(('True', 'TRUE', 'true'))
+FALSE_VALUES = frozenset(('False', 'FALSE', 'false'))
+
+_WHITESPACE_RE = re.compile(r"[\r\n]+|\s{2,}")
+# read_html به صورت پیش‌فرض thousands=',' دارد
+_THOUSANDS_RE = re.compile(r"^[\-\+]?([0-9]+,|[0-9])*(\.[0-9]*)?([0-9]?(E|e)\-?[0-9]+)?$")
+_INT_RE = re.compile(r"^[+-]?[0-9]+$")
+_FLOAT_RE = re.compile(r"^[+-]?([0-9]+\.?[0-9]*|\.[0-9]+)([eE][+-]?[0-9]+)?$")
+_INF_VALUES = {'inf': math.inf, '+inf': math.inf, '-inf': -math.inf,
+               'infinity': math.inf, '+infinity': math.inf, '-infinity': -math.inf}
+
+
+class TableTooLarge(Exception):
+    pass
+
+
+def _is_hidden(style):
+    return bool(style) and 'display:none' in style.replace(' ', '')
+
+
+# ---------------------- Tree adapters ----------------------
+class _SoupTable:
+    """دسترسی به ردیف‌ها و خانه‌های جدول در درخت BeautifulSoup"""
+
+    _SKIP_STRINGS = (Comment, Declaration, Doctype, ProcessingInstruction)
+
+    def __init__(self, table):
+        if any(_is_hidden(el.get('style')) for el in table.find_all(style=True)) or table.find('style'):
+            # مثل displayed_only در read_html: عناصر پنهان و <style> حذف می‌شوند؛
+            # روی کپی تا درخت اصلی دست نخورد
+            table = copy.copy(table)
+            for el in table.find_all('style') + table.find_all(style=True):
+                if el.name == 'style' or _is_hidden(el.get('style')):
+                    el.decompose()
+        self.table = table
+
+    def _rows_under(self, section):
+        rows = []
+        for tr in self.table.find_all('tr'):
+            parent = tr.parent
+            while parent is not None and parent is not self.table:
+                if parent.name == section:
+                    rows.append(tr)
+                    break
+                parent = parent.parent
+        return rows
+
+    def header_rows(self):
+        rows = []
+        for thead in self.table.find_all('thead'):
+            rows.extend(thead.find_all('tr', recursive=False))
+            if thead.find_all(['td', 'th'], recursive=False):
+                rows.append(thead)
+        return rows
+
+    def body_rows(self):
+        return self._rows_under('tbody') + self.table.find_all('tr', recursive=False)
+
+    def footer_rows(self):
+        return self._rows_under('tfoot')
+
+    @staticmethod
+    def cells(row):
+        return row.find_all(['td', 'th'], recursive=False)
+
+    @staticmethod
+    def is_th(cell):
+        return cell.name == 'th'
+
+    @classmethod
+    def text(cls, cell):
+        # مثل text_content در lxml: متن script هم حساب می‌شود، کامنت نه؛ <br> یعنی خط جدید
+        contents = cell.contents
+        if len(contents) == 1 and type(contents[0]) is NavigableString:
+            return str(contents[0])
+        parts = []
+        for node in cell.descendants:
+            if isinstance(node, NavigableString):
+                if not isinstance(node, cls._SKIP_STRINGS):
+                    parts.append(str(node))
+            elif node.name == 'br':
+                parts.append('\n')
+        return ''.join(parts)
+
+    @staticmethod
+    def attr(cell, name):
+        return cell.get(name)
+
+    def has_text(self):
+        return any(
+            s.strip('\n') for s in self.table.descendants
+            if isinstance(s, NavigableString) and not isinstance(s, self._SKIP_STRINGS)
+        )
+
+
+class _LxmlTable:
+    """دسترسی به ردیف‌ها و خانه‌های جدول در درخت lxml"""
+
+    def __init__(self, table):
+        hidden = [el for el in table.iterfind('.//*[@style]') if _is_hidden(el.get('style'))]
+        if hidden or table.find('.//style') is not None:
+            table = copy.deepcopy(table)
+            for el in list(table.iterfind('.//style')) + list(table.iterfind('.//*[@style]')):
+                if (el.tag == 'style' or _is_hidden(el.get('style'))) and el.getparent() is not None:
+                    el.drop_tree()
+        self.table = table
+
+    def header_rows(self):
+        rows = []
+        for thead in self.table.iterfind('.//thead'):
+            rows.extend(thead.findall('tr'))
+            if thead.xpath('./td|./th'):
+                rows.append(thead)
+        return rows
+
+    def body_rows(self):
+        return self.table.xpath('.//tbody//tr') + self.table.findall('tr')
+
+    def footer_rows(self):
+        return self.table.xpath('.//tfoot//tr')
+
+    @staticmethod
+    def cells(row):
+        return [cell for cell in row if cell.tag in ('td', 'th')]
+
+    @staticmethod
+    def is_th(cell):
+        return cell.tag == 'th'
+
+    @staticmethod
+    def text(cell):
+        if not len(cell):
+            return cell.text or ''
+        if cell.find('.//br') is None:
+            return cell.text_content()
+        from lxml import etree
+
+        parts = []
+        for event, node in etree.iterwalk(cell, events=('start', 'end', 'comment', 'pi')):
+            if event == 'start':
+                if node.tag == 'br':
+                    parts.append('\n')
+                if node.text:
+                    parts.append(node.text)
+            elif node is not cell and node.tail:
+                parts.append(node.tail)
+        return ''.join(parts)
+
+    @staticmethod
+    def attr(cell, name):
+        return cell.get(name)
+
+    def has_text(self):
+        return any(t.strip('\n') for t in self.table.itertext())
+
+
+def _adapter(table):
+    if isinstance(table, Tag):
+        return _SoupTable(table)
+    return _LxmlTable(table)
+
+
+# ---------------------- Grid building ----------------------
+def _clean_text(text):
+    return _WHITESPACE_RE.sub(' ', text.strip())
+
+
+def _expand_spans(adapter, rows, budget, remainder=None, overflow=True):
+    """
+    باز کردن rowspan/colspan به یک شبکه متنی (همان الگوریتم read_html).
+    rowspan باقی‌مانده به بخش بعدی (thead -> tbody -> tfoot) منتقل می‌شود مگر overflow=False.
+    """
+    all_texts = []
+    remainder = remainder or []  # (index, text, rowspan باقی‌مانده)
+    for tr in rows:
+        texts = []
+        next_remainder = []
+        index = 0
+        for td in adapter.cells(tr):
+            while remainder and remainder[0][0] <= index:
+                prev_i, prev_text, prev_rowspan = remainder.pop(0)
+                texts.append(prev_text)
+                if prev_rowspan > 1:
+                    next_remainder.append((prev_i, prev_text, prev_rowspan - 1))
+                index += 1
+            text = _clean_text(adapter.text(td))
+            rowspan = int(adapter.attr(td, 'rowspan') or 1)
+            colspan = int(adapter.attr(td, 'colspan') or 1)
+            # خانه با rowspan در ردیف‌های بعدی هم تکرار می‌شود
+            budget[0] -= max(colspan, 1) * max(rowspan, 1)
+            if budget[0] < 0:
+                raise TableTooLarge()
+            for _ in range(colspan):
+                texts.append(text)
+                if rowspan > 1:
+                    next_remainder.append((index, text, rowspan - 1))
+                index += 1
+        for prev_i, prev_text, prev_rowspan in remainder:
+            texts.append(prev_text)
+            if prev_rowspan > 1:
+                next_remainder.append((prev_i, prev_text, prev_rowspan - 1))
+        all_texts.append(texts)
+        remainder = next_remainder
+
+    while remainder and not overflow:
+        next_remainder = []
+        texts = []
+        for prev_i, prev_text, prev_rowspan in remainder:
+            texts.append(prev_text)
+            if prev_rowspan > 1:
+                next_remainder.append((prev_i, prev_text, prev_rowspan - 1))
+        all_texts.append(texts)
+        remainder = next_remainder
+    return all_texts, remainder
+
+
+def _dedup_names(names, is_multi):
+    """نام ستون تکراری -> name.1، name.2 (مثل pandas)"""
+    names = list(names)
+    counts = defaultdict(int)
+    for i, col in enumerate(names):
+        cur_count = counts[col]
+        while cur_count > 0:
+            counts[col] = cur_count + 1
+            if is_multi:
+                col = col[:-1] + (f"{col[-1]}.{cur_count}",)
+            else:
+                col = f"{col}.{cur_count}"
+            cur_count = counts[col]
+        names[i] = col
+        counts[col] = cur_count + 1
+    return names
+
+
+def _single_level_names(row):
+    """نام ستون‌های یک ردیف سرستون؛ تکراری‌ها اول برای ستون‌های نام‌دار شماره می‌گیرند"""
+    names = list(row)
+    unnamed = [i for i, text in enumerate(names) if text == '']
+    for i in unnamed:
+        names[i] = f"Unnamed: {i}"
+    counts = defaultdict(int)
+    for i in [i for i in range(len(names)) if i not in set(unnamed)] + unnamed:
+        col = old_col = names[i]
+        cur_count = counts[col]
+        while cur_count > 0:
+            counts[old_col] = cur_count + 1
+            col = f"{old_col}.{cur_count}"
+            cur_count = cur_count + 1 if col in names else counts[col]
+        names[i] = col
+        counts[col] = cur_count + 1
+    return names
+
+
+def _column_names(header_rows, width):
+    if not header_rows:
+        return list(range(width))
+    if len(header_rows) == 1:
+        return _single_level_names(header_rows[0])
+    levels = [
+        [text if text != '' else f"Unnamed: {i}_level_{level}" for i, text in enumerate(row)]
+        for level, row in enumerate(header_rows)
+    ]
+    return _dedup_names(list(zip(*levels)), True)
+
+
+def _convert_column(values):
+    """استنتاج نوع ستون: int، float، bool یا str با NaN برای مقادیر خالی"""
+    cleaned = []
+    for value in values:
+        if value in NA_VALUES:
+            cleaned.append(None)
+        elif ',' in value and _THOUSANDS_RE.search(value.strip()):
+            cleaned.append(value.replace(',', ''))
+        else:
+            cleaned.append(value)
+    present = [v for v in cleaned if v is not None]
+
+    try:
+        numbers = [_to_number(v) for v in present]
+    except ValueError:
+        numbers = None
+    if numbers is not None:
+        it = iter(numbers)
+        if len(present) == len(cleaned) and all(isinstance(n, int) for n in numbers):
+            return numbers
+        return [math.nan if v is None else float(next(it)) for v in cleaned]
+
+    if all(v in TRUE_VALUES or v in FALSE_VALUES for v in present):
+        return [math.nan if v is None else v in TRUE_VALUES for v in cleaned]
+    return [math.nan if v is None else v for v in cleaned]
+
+
+def _to_number(value):
+    value = value.strip()
+    if _INT_RE.match(value):
+        return int(value)
+    if _FLOAT_RE.match(value):
+        return float(value)
+    if value.lower() in _INF_VALUES:
+        return _INF_VALUES[value.lower()]
+    raise ValueError(value)
+
+
+def extract_table_records(table, max_cells=None):
+    """
+    تبدیل یک عنصر table به لیست رکوردها؛ برای جدول خالی None برمی‌گرداند.
+    اگر تعداد خانه‌ها از max_cells بیشتر شود TableTooLarge رخ می‌دهد.
+    """
+    if _is_hidden(table.get('style')):
+        return None
+    adapter = _adapter(table)
+    if not adapter.has_text():
+        return None
+
+    header_rows = adapter.header_rows()
+    body_rows = adapter.body_rows()
+    footer_rows = adapter.footer_rows()
+    if not header_rows:
+        # بدون thead: ردیف‌های بالایی که همه خانه‌هایشان th است سرستون می‌شوند
+        while body_rows and all(adapter.is_th(cell) for cell in adapter.cells(body_rows[0])):
+            header_rows.append(body_rows.pop(0))
+
+    budget = [max_cells or CONFIG['MAX_TABLE_CELLS']]
+    header, remainder = _expand_spans(adapter, header_rows, budget)
+    body, remainder = _expand_spans(adapter, body_rows, budget, remainder, overflow=bool(footer_rows))
+    footer, _ = _expand_spans(adapter, footer_rows, budget, remainder, overflow=False)
+
+    data = header + body + footer
+    if not data:
+        return None
+    width = max(len(row) for row in data)
+    for row in data:
+        row.extend([''] * (width - len(row)))
+
+    # skip_blank_lines: فقط ردیف‌های تک‌ستونی خالی حذف می‌شوند (پیش از انتخاب سرستون)
+    if width <= 1:
+        data = [row for row in data if row and row[0].strip()]
+
+    # مثل read_html: یک ردیف سرستون -> header=0؛ چند ردیف -> فقط ردیف‌های غیرخالی
+    header_index = [0] if len(header) == 1 else [i for i, row in enumerate(header) if any(row)]
+    if header and not header_index:
+        return None
+    if header_index and header_index[-1] >= len(data):
+        return None
+    if not data:
+        return None
+    names = _column_names([data[i] for i in header_index], width)
+    rows = data[header_index[-1] + 1:] if header_index else data
+
+    columns = [_convert_column([row[i] for row in rows]) for i in range(width)]
+    return [
+        {name: columns[i][r] for i, name in enumerate(names)}
+        for r in range(len(rows))
+    ]
+
+
+def flatten_columns(records):
+    """کلیدهای tuple (سرستون چندسطحی) به رشته تبدیل می‌شوند تا رکوردها قابل ذخیره در JSON باشند"""
+    if not records or not any(isinstance(key, tuple) for key in records[0]):
+        return records
+    return [
+        {(' / '.join(str(part) for part in key) if isinstance(key, tuple) else key): value
+         for key, value in record.items()}
+        for record in records
+    ]
+
+
+def table_html(table):
+    """HTML یک عنصر table (برای مسیر مرجع pd.read_html)"""
+    if isinstance(table, (str, Tag)):
+        return str(table)
+    from lxml import etree
+    return etree.tostring(table, encoding='unicode', method='html', with_tail=False)
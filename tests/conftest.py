@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# ماژول‌های پروژه در ریشه مخزن هستند
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
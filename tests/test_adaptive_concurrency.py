@@ -0,0 +1,112 @@
+import asyncio
+import time
+
+import pytest
+
+from adaptive_concurrency import AdaptiveLimiter, HostQueue
+
+
+def _limiter(**kwargs):
+    kwargs.setdefault('pressure', lambda: (None, None))
+    kwargs.setdefault('target_latency', 10.0)
+    return AdaptiveLimiter(**kwargs)
+
+
+def test_additive_increase_after_limit_successes():
+    async def run():
+        limiter = _limiter(min_limit=2, max_limit=4, per_host=8)
+        limits = []
+        for _ in range(8):
+            started = await limiter.acquire('a')
+            await limiter.release('a', started, 1.0)
+            limits.append(limiter.limit)
+        # یک واحد بعد از 2 موفقیت، یکی بعد از 3 موفقیت بعدی، بعد سقف
+        assert limits == [2, 3, 3, 3, 4, 4, 4, 4]
+        assert limiter.increases == 2
+
+    asyncio.run(run())
+
+
+def test_burst_of_timeouts_halves_once():
+    async def run():
+        limiter = _limiter(min_limit=1, max_limit=16, initial=16, per_host=16, window=20)
+        burst = [await limiter.acquire('a') for _ in range(8)]
+        for started in burst:
+            await limiter.release('a', started, 30.0, ok=False, timed_out=True)
+        assert limiter.limit == 8
+        assert limiter.decreases == {'latency': 1}
+
+        # کار شروع‌شده با سقف جدید دوباره کم می‌کند
+        started = await limiter.acquire('a')
+        await limiter.release('a', started, 30.0, ok=False, timed_out=True)
+        assert limiter.limit == 4
+        assert [limit for _, limit in limiter.history] == [16, 8, 4]
+
+    asyncio.run(run())
+
+
+def test_timeout_rate_and_pressure_decrease():
+    async def run():
+        readings = iter([(None, None), (None, None), (None, 95.0)])
+        limiter = _limiter(min_limit=1, initial=8, per_host=8, window=4, pressure=lambda: next(readings),
+                           pressure_interval=0.0)
+        for timed_out in (False, True):
+            started = await limiter.acquire('a')
+            await limiter.release('a', started, 1.0, ok=not timed_out, timed_out=timed_out)
+        assert (limiter.limit, limiter.decreases) == (4, {'timeouts': 1})
+
+        started = await limiter.acquire('a')
+        await limiter.release('a', started, 1.0)
+        assert (limiter.limit, limiter.decreases['memory']) == (2, 1)
+
+    asyncio.run(run())
+
+
+def test_per_host_cap():
+    async def run():
+        limiter = _limiter(min_limit=4, per_host=1)
+        started = await limiter.acquire('a')
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(limiter.acquire('a'), 0.05)
+        other = await asyncio.wait_for(limiter.acquire('b'), 1)
+        waiting = asyncio.ensure_future(limiter.acquire('a'))
+        await asyncio.sleep(0.01)
+        assert not waiting.done()
+        await limiter.release('a', started, 1.0)
+        await asyncio.wait_for(waiting, 1)
+        assert dict(limiter.host_active) == {'a': 1, 'b': 1}
+        await limiter.release('b', other, 1.0)
+
+    asyncio.run(run())
+
+
+def test_per_host_delay_spaces_starts():
+    async def run():
+        limiter = _limiter(min_limit=4, per_host=2, per_host_delay=0.05)
+        first = await limiter.acquire('a')
+        second = await limiter.acquire('a')
+        assert second - first >= 0.05
+
+    asyncio.run(run())
+
+
+def test_acquire_next_skips_saturated_host():
+    async def run():
+        limiter = _limiter(min_limit=4, per_host=1)
+        pending = HostQueue()
+        for host, item in [('a', 'a1'), ('a', 'a2'), ('b', 'b1')]:
+            pending.put(host, item)
+
+        host, item, started = await limiter.acquire_next(pending)
+        assert (host, item) == ('a', 'a1')
+        # a پر است؛ کار b پشت a2 منتظر نمی‌ماند
+        assert (await asyncio.wait_for(limiter.acquire_next(pending), 1))[:2] == ('b', 'b1')
+        waiting = asyncio.ensure_future(limiter.acquire_next(pending))
+        await asyncio.sleep(0.01)
+        assert not waiting.done()
+        await limiter.release('a', started, 1.0)
+        assert (await asyncio.wait_for(waiting, 1))[:2] == ('a', 'a2')
+        assert len(pending) == 0
+        assert await limiter.acquire_next(pending) is None
+
+    asyncio.run(run())
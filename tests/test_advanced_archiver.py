@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+import advanced_archiver
+from advanced_archiver import ByteBudget, is_valid_html_file
+
+
+def test_reserve_waits_while_the_cap_is_full():
+    async def run():
+        budget = ByteBudget(limit=100)
+        events = []
+
+        async def page(name, size, hold):
+            async with budget.reserve(size):
+                events.append((name, 'in', budget.in_use))
+                await hold.wait()
+            events.append((name, 'out', budget.in_use))
+
+        first, second = asyncio.Event(), asyncio.Event()
+        big = asyncio.ensure_future(page('big', 80, first))
+        await asyncio.sleep(0)
+        small = asyncio.ensure_future(page('small', 40, second))
+        await asyncio.sleep(0.01)
+        # 80 + 40 از سقف بیشتر است؛ صفحه دوم منتظر می‌ماند
+        assert events == [('big', 'in', 80)] and budget.waits == 1
+        first.set()
+        second.set()
+        await asyncio.gather(big, small)
+        assert events == [('big', 'in', 80), ('big', 'out', 0), ('small', 'in', 40), ('small', 'out', 0)]
+        assert (budget.in_use, budget.peak) == (0, 80)
+
+        # صفحه بزرگ‌تر از کل سقف به اندازه سقف رزرو می‌شود و گیر نمی‌کند
+        async with budget.reserve(500):
+            assert budget.in_use == 100
+
+    asyncio.run(run())
+
+
+def test_reserve_is_released_on_exception():
+    async def run():
+        budget = ByteBudget(limit=100)
+        with pytest.raises(RuntimeError):
+            async with budget.reserve(100):
+                raise RuntimeError('navigation failed')
+        assert budget.in_use == 0
+        async with budget.reserve(100):
+            assert budget.in_use == 100
+
+    asyncio.run(run())
+
+
+def test_validation_reads_only_the_prefix(tmp_path, monkeypatch):
+    monkeypatch.setattr(advanced_archiver, 'VALIDATE_PREFIX_BYTES', 64)
+    reads = []
+
+    class SpyFile:
+        def __init__(self, f):
+            self.f = f
+
+        def read(self, size=-1):
+            reads.append(size)
+            return self.f.read(size)
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            self.f.close()
+
+    monkeypatch.setattr(advanced_archiver, 'open', lambda *args, **kwargs: SpyFile(open(*args, **kwargs)), raising=False)
+
+    page = tmp_path / 'page.html'
+    page.write_text('<!DOCTYPE html>\n<HTML lang="en"><body>' + 'x' * 10000 + '</body></html>', encoding='utf-8')
+    assert is_valid_html_file(str(page))
+    late = tmp_path / 'late.html'
+    late.write_text(' ' * 100 + '<html><body></body></html>', encoding='utf-8')
+    assert not is_valid_html_file(str(late))
+    assert reads == [64, 64]
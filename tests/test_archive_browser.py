@@ -0,0 +1,134 @@
+import asyncio
+
+import pytest
+
+import archive_browser
+from archive_browser import BrowserContextPool, BrowserUnavailable, _write_file
+
+
+class FakePage:
+    def __init__(self, browser):
+        self.browser = browser
+        self.url = 'https://example.com/page'
+
+    async def goto(self, url, **kwargs):
+        if not self.browser.alive:
+            raise RuntimeError('Target page, context or browser has been closed')
+
+    async def evaluate(self, script):
+        return 64
+
+    async def content(self):
+        return '<html><head></head><body>ok</body></html>'
+
+    async def close(self):
+        pass
+
+
+class FakeContext:
+    def __init__(self, browser):
+        self.browser = browser
+
+    async def new_page(self):
+        return FakePage(self.browser)
+
+    async def close(self):
+        pass
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.alive = True
+
+    def is_connected(self):
+        return self.alive
+
+    async def new_context(self, **kwargs):
+        return FakeContext(self)
+
+    async def close(self):
+        self.alive = False
+
+
+class FakeChromium:
+    def __init__(self, fail_after=None):
+        self.launched = []
+        self.fail_after = fail_after
+
+    async def launch(self, **kwargs):
+        if self.fail_after is not None and len(self.launched) >= self.fail_after:
+            raise RuntimeError('chromium failed to start')
+        self.launched.append(FakeBrowser())
+        return self.launched[-1]
+
+
+class FakePlaywright:
+    def __init__(self, chromium):
+        self.chromium = chromium
+
+    async def start(self):
+        return self
+
+    async def stop(self):
+        pass
+
+
+@pytest.fixture
+def chromium(monkeypatch):
+    chromium = FakeChromium()
+    monkeypatch.setattr(archive_browser, '_HAS_PLAYWRIGHT', True)
+    monkeypatch.setattr(archive_browser, 'async_playwright', lambda: FakePlaywright(chromium), raising=False)
+    return chromium
+
+
+def test_base_href_is_escaped(tmp_path):
+    output_file = tmp_path / 'page.html'
+    _write_file(output_file, '<html><head></head><body></body></html>', 'https://x.test/?q="><script>alert(1)</script>')
+    saved = output_file.read_text(encoding='utf-8')
+    assert '<base href="https://x.test/?q=&quot;&gt;&lt;script&gt;alert(1)&lt;/script&gt;">' in saved
+    assert '<script>' not in saved
+
+
+@pytest.mark.parametrize('html, expected', [
+    ('<!DOCTYPE html><html lang="en"><head><title>t</title></head><body></body></html>',
+     '<!DOCTYPE html><html lang="en"><head><base href="https://x.test/"><title>t</title>'),
+    ('<!DOCTYPE html><html lang="en"><body>no head</body></html>',
+     '<!DOCTYPE html><html lang="en"><base href="https://x.test/"><body>'),
+    ('<!DOCTYPE html><body>no html tag</body>', '<!DOCTYPE html><base href="https://x.test/"><body>'),
+])
+def test_base_goes_after_doctype(tmp_path, html, expected):
+    output_file = tmp_path / 'page.html'
+    _write_file(output_file, html, 'https://x.test/')
+    assert output_file.read_text(encoding='utf-8').startswith(expected)
+
+
+def test_dead_browser_is_relaunched(chromium, tmp_path):
+    async def run():
+        pool = await BrowserContextPool(contexts=2, max_relaunches=1).start()
+        await pool.capture('https://example.com/1', tmp_path / '1.html')
+        chromium.launched[-1].alive = False
+        assert not pool.connected
+        timing = await pool.capture('https://example.com/2', tmp_path / '2.html')
+        assert timing['bytes'] > 0
+        assert pool.relaunches == 1 and len(chromium.launched) == 2
+
+        chromium.launched[-1].alive = False
+        with pytest.raises(BrowserUnavailable):
+            await pool.capture('https://example.com/3', tmp_path / '3.html')
+        await pool.close()
+
+    asyncio.run(run())
+
+
+def test_failed_relaunch_gives_up(chromium, tmp_path):
+    async def run():
+        pool = await BrowserContextPool(contexts=1).start()
+        chromium.fail_after = 1
+        chromium.launched[-1].alive = False
+        for _ in range(2):
+            with pytest.raises(BrowserUnavailable):
+                await pool.capture('https://example.com/', tmp_path / 'page.html')
+        assert len(chromium.launched) == 1
+        await pool.close()
+
+    asyncio.run(run())
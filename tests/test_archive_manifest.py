@@ -0,0 +1,66 @@
+import time
+
+from archive_manifest import ArchiveManifest, normalize_url
+
+
+def test_normalize_url():
+    assert normalize_url('HTTPS://Example.COM:443/a?b=2&a=1#top') == 'https://example.com/a?a=1&b=2'
+    assert normalize_url('http://example.com:80') == 'http://example.com/'
+    assert normalize_url('http://example.com:8080/x') == 'http://example.com:8080/x'
+    assert normalize_url('https://example.com/?q=') == 'https://example.com/?q='
+
+
+def _archive(manifest, tmp_path, url, content='<html>ok</html>'):
+    (url_key, url, file_name), = manifest.pending([url], tmp_path)
+    (tmp_path / file_name).write_text(content, encoding='utf-8')
+    manifest.record(url_key, url, file_name, True, 1.5, backend='single-file', size=len(content), content_hash='h1')
+    return url_key, file_name
+
+
+def test_pending_skips_fresh_and_requeues_stale_or_missing(tmp_path):
+    manifest = ArchiveManifest(str(tmp_path / 'manifest.db'))
+    _archive(manifest, tmp_path, 'https://example.com/fresh')
+    stale_key, stale_file = _archive(manifest, tmp_path, 'https://example.com/stale')
+    missing_key, missing_file = _archive(manifest, tmp_path, 'https://example.com/missing')
+    manifest.conn.execute("UPDATE archives SET archived_at = ? WHERE url_key = ?", (time.time() - 3600, stale_key))
+    (tmp_path / missing_file).unlink()
+
+    urls = [
+        'https://example.com/fresh', 'https://example.com/stale', 'https://example.com/missing',
+        'https://example.com/new', 'https://EXAMPLE.com/new#again',
+    ]
+    todo = manifest.pending(urls, tmp_path, max_age=60)
+    assert [url_key for url_key, _, _ in todo] == [stale_key, missing_key, 'https://example.com/new']
+    # آرشیو دوباره همان فایل قبلی را بازنویسی می‌کند
+    assert todo[0][2] == stale_file and todo[1][2] == missing_file
+    # بدون max_age آرشیو موفق قدیمی هم تازه حساب می‌شود
+    assert [url_key for url_key, _, _ in manifest.pending(urls, tmp_path)] == [missing_key, 'https://example.com/new']
+    manifest.close()
+
+
+def test_failed_attempt_keeps_previous_archive(tmp_path):
+    manifest = ArchiveManifest(str(tmp_path / 'manifest.db'))
+    url_key, file_name = _archive(manifest, tmp_path, 'https://example.com/page')
+    before = manifest.get(url_key)
+    manifest.record(url_key, 'https://example.com/page', file_name, False, 9.0, backend='single-file')
+
+    entry = manifest.get(url_key)
+    assert (entry.status, entry.attempts, entry.duration) == ('failed', 2, 9.0)
+    assert (entry.content_hash, entry.size, entry.archived_at) == (before.content_hash, before.size, before.archived_at)
+    manifest.close()
+
+
+def test_report_counts(tmp_path):
+    manifest = ArchiveManifest(str(tmp_path / 'manifest.db'))
+    old_key, _ = _archive(manifest, tmp_path, 'https://example.com/old')
+    manifest.conn.execute("UPDATE archives SET attempted_at = 0 WHERE url_key = ?", (old_key,))
+    since = time.time()
+    for i, duration in enumerate([1.0, 3.0, 2.0]):
+        manifest.record(f'https://example.com/{i}', f'https://example.com/{i}', f'{i}.html', True, duration, size=100)
+    manifest.record('https://example.com/bad', 'https://example.com/bad', 'bad.html', False, 5.0)
+
+    report = manifest.report(since)
+    assert (report['ok'], report['failed'], report['total_size']) == (3, 1, 300)
+    assert report['median_seconds'] == 2.0 and report['p95_seconds'] == 3.0
+    assert report['failed_urls'] == ['https://example.com/bad']
+    manifest.close()
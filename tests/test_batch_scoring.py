@@ -0,0 +1,55 @@
+import random
+
+import pandas as pd
+import pytest
+
+from batch_scoring import features_frame, score_features
+from config import CONFIG
+
+
+def _contents(count, seed=7):
+    rng = random.Random(seed)
+    contents = []
+    for i in range(count):
+        contents.append({
+            'google_rank': rng.randint(1, 30),
+            'meta_description': rng.choice(['', 'A description']),
+            'main_content': 'x' * rng.choice([0, 150, 200, 201, 499, 500, 501, 999, 1000, 1001, 5000]),
+            'tables': [[]] * rng.randint(0, 3),
+            **{f'h{level}': ['heading'] * rng.randint(0, 4) for level in range(1, 7)},
+        })
+    return contents
+
+
+@pytest.fixture
+def scraper(tmp_path, monkeypatch):
+    from content_scraper import ContentScraper
+
+    monkeypatch.setitem(CONFIG, 'OUTPUT_DIR', tmp_path)
+    return ContentScraper(offline=True)
+
+
+FRACTIONAL_WEIGHTS = {
+    'rank_base': 20.5,
+    'rank': 1.15,
+    'meta_description': 0.1,
+    'headings': {'h1': 0.7, 'h2': 0.35, 'h3': 0.125, 'h4': 0.05, 'h5': 0.015, 'h6': 0.005},
+    'content_length': [(1000, 2.675), (500, 1.005), (200, 0.335)],
+    'table': 0.145,
+}
+
+
+@pytest.mark.parametrize('weights', [None, FRACTIONAL_WEIGHTS], ids=['config', 'fractional'])
+def test_matches_calculate_content_score(scraper, weights):
+    contents = _contents(2000)
+    expected = [scraper.calculate_content_score(content, content['google_rank'], weights) for content in contents]
+    actual = score_features(features_frame(contents), weights).tolist()
+    assert actual == expected
+
+
+def test_missing_rank_scores_zero(scraper):
+    features = features_frame(_contents(3))
+    features['google_rank'] = pd.array([1, None, 5], dtype='Int64')
+    scores = score_features(features).tolist()
+    assert scores[1] == 0
+    assert scores[0] == scraper.calculate_content_score(_contents(3)[0], 1)
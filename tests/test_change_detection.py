@@ -0,0 +1,30 @@
+import page_store
+from content_scraper import ContentScraper
+from database_manager import DatabaseManager
+from page_store import PageStore
+
+
+def _page(nonce):
+    # فقط nonce عوض می‌شود؛ متن استخراج‌شده یکی است
+    return f'<html><head><script nonce="{nonce}"></script></head><body><h1>Title</h1><p>Body</p></body></html>'
+
+
+def test_unchanged_page_adds_no_store_bytes_and_no_row(tmp_path, monkeypatch):
+    store = PageStore(tmp_path / 'store')
+    monkeypatch.setattr(page_store, '_store', store)
+    db_manager = DatabaseManager(tmp_path / 'scraped.db')
+    scraper = ContentScraper(offline=True)
+    scraper.page_store = store
+    keyword_id = db_manager.get_keyword_id('test')
+    content = {'url': 'https://example.com/a', 'title': 'Title', 'h1': ['Title'], 'main_content': 'Body'}
+
+    scraper.store_content(content['url'], content, tmp_path / 'out.xlsx', db_manager, keyword_id, 1, html=_page('a'))
+    raw_bytes, writes = store.raw_bytes, store.writes
+    scraper.store_content(content['url'], content, tmp_path / 'out.xlsx', db_manager, keyword_id, 1, html=_page('b'))
+
+    assert (store.raw_bytes, store.writes) == (raw_bytes, writes)
+    assert db_manager.cursor.execute("SELECT COUNT(*) FROM urls").fetchone()[0] == 1
+    assert db_manager.rows_unchanged == 1
+    assert db_manager.bytes_skipped == len('Body') + len(_page('b'))
+    db_manager.close()
+    store.close()
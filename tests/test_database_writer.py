@@ -0,0 +1,87 @@
+import threading
+
+import pytest
+
+from config import CONFIG
+from database_manager import DatabaseManager, DatabaseWriter, InsertBatch
+
+
+@pytest.fixture
+def db_manager(tmp_path, monkeypatch):
+    monkeypatch.setitem(CONFIG, 'PAGE_STORE_ENABLED', False)
+    db_manager = DatabaseManager(tmp_path / 'scraped.db')
+    yield db_manager
+    db_manager.close()
+
+
+def _content(i):
+    return {'url': f'https://example.com/{i}', 'title': f'page {i}', 'google_rank': i,
+            'h1': [f'title {i}'], 'h2': [f'section {i}.{j}' for j in range(i % 3)]}
+
+
+def _headings(db_manager):
+    rows = db_manager.cursor.execute('''
+        SELECT u.url, h.level, h.position, h.text FROM url_headings h JOIN urls u ON u.id = h.url_id
+        ORDER BY u.url, h.level, h.position
+    ''').fetchall()
+    headings = {}
+    for url, level, _, text in rows:
+        headings.setdefault(url, {}).setdefault(f'h{level}', []).append(text)
+    return headings
+
+
+def test_failed_batch_falls_back_to_single_rows(db_manager):
+    keyword_id = db_manager.get_keyword_id('test')
+    batch = InsertBatch(db_manager, size=10, seconds=60)
+    errors = {}
+    for i in range(4):
+        content = _content(i)
+        if i == 2:
+            # رتبه غیرقابل ذخیره: درج همین ردیف خطای sqlite می‌دهد
+            content['google_rank'] = [2]
+        batch.insert_url_data(keyword_id, content, on_stored=lambda error, i=i: errors.__setitem__(i, error))
+    batch.flush()
+
+    assert [i for i, error in errors.items() if error is not None] == [2]
+    assert sorted(errors) == [0, 1, 2, 3]
+    assert (batch.inserted, batch.failed) == (3, 1)
+    urls = [url for (url,) in db_manager.cursor.execute("SELECT url FROM urls ORDER BY id")]
+    assert urls == ['https://example.com/0', 'https://example.com/1', 'https://example.com/3']
+
+
+def test_heading_ids_across_batches(db_manager):
+    keyword_id = db_manager.get_keyword_id('test')
+    batch = InsertBatch(db_manager, size=3, seconds=60)
+    for i in range(8):
+        batch.insert_url_data(keyword_id, _content(i))
+    batch.flush()
+
+    assert batch.commits == 3
+    expected = {}
+    for i in range(8):
+        content = _content(i)
+        expected[content['url']] = {tag: content[tag] for tag in ('h1', 'h2') if content[tag]}
+    assert _headings(db_manager) == expected
+
+
+def test_close_drains_the_queue(db_manager):
+    keyword_id = db_manager.get_keyword_id('test')
+    writer = DatabaseWriter(db_manager, size=50, seconds=60)
+    stored = []
+    threads = [
+        threading.Thread(target=lambda start=start: [
+            writer.insert_url_data(keyword_id, _content(i), on_stored=stored.append) for i in range(start, start + 20)
+        ])
+        for start in (0, 20, 40)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    writer.close()
+
+    assert not writer.thread.is_alive()
+    assert (writer.inserted, writer.failed) == (60, 0)
+    assert stored == [None] * 60
+    assert db_manager.cursor.execute("SELECT COUNT(*) FROM urls").fetchone()[0] == 60
+    assert len(_headings(db_manager)) == 60
@@ -0,0 +1,52 @@
+import pytest
+
+from config import CONFIG
+from http_session import create_session, session_stats
+from local_server import LocalTestServer
+
+
+@pytest.fixture
+def stats():
+    stats = session_stats()
+    stats.reset()
+    yield stats
+    stats.reset()
+
+
+@pytest.fixture
+def server():
+    with LocalTestServer() as server:
+        yield server
+
+
+def test_one_connection_per_host_is_reused(server, stats):
+    port = server.base_url.rsplit(':', 1)[1]
+    with create_session() as session:
+        for i in range(10):
+            assert session.get(server.url(f"/page/{i}"), timeout=10).status_code == 200
+            session.get(f"http://localhost:{port}/other/{i}", timeout=10)
+
+    assert stats.requests == 20
+    assert stats.new_connections == 2
+    assert dict(stats.connections_per_host) == {'127.0.0.1': 1, 'localhost': 1}
+    assert stats.reused_connections == 18
+    assert stats.reuse_ratio == pytest.approx(0.9)
+
+
+def test_fresh_sessions_open_new_connections(server, stats):
+    for i in range(3):
+        with create_session() as session:
+            session.get(server.url(f"/page/{i}"), timeout=10)
+    assert stats.as_dict()['new_connections'] == 3
+    assert stats.reused_connections == 0
+    stats.reset()
+    assert stats.requests == 0 and stats.new_connections == 0 and not stats.connections_per_host
+
+
+def test_per_host_maxsize(server):
+    with create_session(host_maxsize={'127.0.0.1': 3}) as session:
+        adapter = session.get_adapter(server.base_url)
+        pinned = adapter.poolmanager.connection_from_url(server.url('/'))
+        other = adapter.poolmanager.connection_from_url('http://localhost:1/')
+        assert pinned.pool.maxsize == 3
+        assert other.pool.maxsize == CONFIG['HTTP_POOL_MAXSIZE']
@@ -0,0 +1,93 @@
+from types import SimpleNamespace
+
+import pytest
+
+import job_ledger
+from job_ledger import JobLedger
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=1000.0)
+    clock.time = lambda: clock.now
+    monkeypatch.setattr(job_ledger, 'time', clock)
+    return clock
+
+
+def _results(keyword, count=2):
+    return [{'link': f'https://example.com/{keyword}/{rank}', 'title': keyword, 'google_rank': rank}
+            for rank in range(1, count + 1)]
+
+
+def test_killed_run_resumes_from_stored_serp_results(tmp_path, clock):
+    ledger = JobLedger(tmp_path / 'ledger.db')
+    ledger.add_keywords(['a', 'b'])
+    ledger.record_serp('a', 7, _results('a'))
+    first = ledger.due_url_tasks('a')[0]
+    ledger.mark_url(first, 'stored')
+    # اجرا بدون finish_run قطع می‌شود
+    ledger.close()
+
+    resumed = JobLedger(tmp_path / 'ledger.db')
+    assert resumed.resumed and resumed.run_id == ledger.run_id
+    assert resumed.due_keywords() == ['a', 'b']
+    # a دوباره جستجو نمی‌شود: نتایج ثبت‌شده و فقط URL ذخیره‌نشده باقی مانده‌اند
+    assert resumed.keyword_state('a') == 'searched'
+    assert resumed.serp_results('a') == _results('a')
+    assert [task['url'] for task in resumed.due_url_tasks('a')] == ['https://example.com/a/2']
+    assert resumed.due_url_tasks('a')[0]['keyword_id'] == 7
+    assert resumed.serp_results('b') == []
+    resumed.close()
+
+
+def test_url_retry_backs_off_up_to_max_attempts(tmp_path, clock):
+    ledger = JobLedger(tmp_path / 'ledger.db', max_attempts=3, backoff_seconds=10)
+    ledger.add_keywords(['a'])
+    ledger.record_serp('a', 1, _results('a', 1))
+    waits = []
+    for _ in range(3):
+        task, = ledger.due_url_tasks('a')
+        ledger.mark_url(task, 'failed', 'timeout')
+        failed_at = clock.now
+        while not ledger.due_url_tasks('a') and clock.now - failed_at < 1000:
+            clock.now += 1
+        waits.append(clock.now - failed_at)
+    # 10s، 20s و بعد از سومین شکست دیگر تلاشی نیست
+    assert waits[:2] == [10, 20] and waits[2] >= 1000
+    assert ledger.counts()['urls'] == {'failed': 1}
+    # URL بی‌نتیجه مانع بستن کلمه کلیدی نیست
+    assert ledger.finish_keyword('a')
+    ledger.close()
+
+
+def test_keyword_and_run_transitions(tmp_path, clock):
+    ledger = JobLedger(tmp_path / 'ledger.db', max_attempts=2, backoff_seconds=10)
+    ledger.add_keywords(['a', 'b'])
+    assert ledger.keyword_state('a') == 'pending'
+    ledger.record_serp('a', 1, _results('a'))
+    tasks = ledger.due_url_tasks('a')
+    ledger.mark_url(tasks[0], 'stored')
+
+    # یک URL هنوز ذخیره نشده است
+    assert not ledger.finish_keyword('a')
+    assert ledger.keyword_state('a') == 'failed'
+    assert ledger.due_keywords() == ['b']
+    clock.now += 10
+    assert ledger.due_keywords() == ['a', 'b']
+
+    ledger.mark_url(tasks[1], 'stored')
+    assert ledger.finish_keyword('a') and ledger.keyword_state('a') == 'done'
+    assert not ledger.finish_run()
+
+    for _ in range(2):
+        ledger.fail_keyword('b', 'no search results')
+    assert ledger.due_keywords() == []
+    assert ledger.finish_run()
+    assert ledger.counts()['keywords'] == {'done': 1, 'failed': 1}
+    ledger.close()
+
+    # اجرای بسته‌شده ادامه داده نمی‌شود
+    fresh = JobLedger(tmp_path / 'ledger.db')
+    assert not fresh.resumed and fresh.run_id != ledger.run_id
+    assert fresh.due_keywords() == []
+    fresh.close()
@@ -0,0 +1,70 @@
+import logging
+import multiprocessing
+import os
+import subprocess
+import sys
+import uuid
+from pathlib import Path
+
+import pytest
+
+import config
+
+pytestmark = pytest.mark.skipif(config.log_listener is None, reason="LOG_ASYNC is off")
+
+
+def _log_text():
+    config.file_handler.flush()
+    return Path(config.file_handler.baseFilename).read_text(encoding='utf-8')
+
+
+def _drain():
+    # stop منتظر نوشته شدن همه record های صف است
+    config.log_listener.stop()
+    config.log_listener.start()
+
+
+def test_records_reach_the_file_through_the_listener():
+    root = logging.getLogger()
+    assert config.queue_handler in root.handlers and config.file_handler not in root.handlers
+    marker = f"listener {uuid.uuid4().hex}"
+    config.get_logger('tests.logging').debug(marker)
+    _drain()
+    assert marker in _log_text()
+
+
+def _log_in_child(marker, results):
+    root = logging.getLogger()
+    results.put((config.queue_handler in root.handlers, config.file_handler in root.handlers))
+    config.get_logger('tests.logging').warning(marker)
+    config.file_handler.flush()
+
+
+@pytest.mark.skipif(not hasattr(os, 'register_at_fork'), reason="needs fork")
+def test_forked_child_writes_directly():
+    ctx = multiprocessing.get_context('fork')
+    results = ctx.Queue()
+    marker = f"child {uuid.uuid4().hex}"
+    child = ctx.Process(target=_log_in_child, args=(marker, results))
+    child.start()
+    handlers = results.get(timeout=30)
+    child.join(timeout=30)
+    assert child.exitcode == 0
+    # پروسس فرزند thread نویسنده ندارد؛ بدون handler مستقیم record در صف می‌ماند و گم می‌شود
+    assert handlers == (False, True)
+    assert marker in _log_text()
+    # پروسس اصلی همچنان از صف استفاده می‌کند
+    assert config.queue_handler in logging.getLogger().handlers
+
+
+def test_queue_is_flushed_at_exit():
+    marker = uuid.uuid4().hex
+    script = (
+        "import config\n"
+        "log = config.get_logger('tests.logging')\n"
+        f"for i in range(2000):\n    log.debug('exit {marker} %d', i)\n"
+    )
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([str(Path(config.__file__).parent), *sys.path]))
+    subprocess.run([sys.executable, '-c', script], env=env, check=True, timeout=60, stdout=subprocess.DEVNULL)
+    text = _log_text()
+    assert f"exit {marker} 0" in text and f"exit {marker} 1999" in text
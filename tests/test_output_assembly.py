@@ -0,0 +1,45 @@
+import json
+
+from output_assembly import SerpAssembler
+
+RESULTS = {
+    'seo tools': [
+        {'title': 'Ahrefs', 'link': 'https://ahrefs.com/', 'description': 'SEO toolset', 'google_rank': 1},
+        {'title': 'Moz', 'link': 'https://moz.com/', 'google_rank': 2},
+    ],
+    'کلمه کلیدی': [
+        {'title': 'نتیجه', 'link': 'https://example.ir/', 'google_rank': 1, 'sitelinks': 3},
+    ],
+}
+
+
+def test_json_matches_json_dump(tmp_path):
+    assembler = SerpAssembler()
+    for keyword, results in RESULTS.items():
+        assembler.add(keyword, results)
+    output_file = tmp_path / 'results.json'
+    assembler.write_json(output_file)
+
+    with open(output_file, encoding='utf-8') as f:
+        assert f.read() == json.dumps(RESULTS, ensure_ascii=False, indent=4)
+
+
+def test_interleaved_keyword_is_written_once(tmp_path):
+    assembler = SerpAssembler()
+    assembler.add_rows([
+        {'title': 'A', 'google_rank': 1, 'keyword': 'first'},
+        {'title': 'B', 'google_rank': 1, 'keyword': 'second', 'extra': True},
+        {'title': 'C', 'google_rank': 2, 'keyword': 'first'},
+    ])
+    output_file = tmp_path / 'results.json'
+    assembler.write_json(output_file)
+
+    with open(output_file, encoding='utf-8') as f:
+        pairs = json.load(f, object_pairs_hook=list)
+    assert [key for key, _ in pairs] == ['first', 'second']
+    assert json.loads(output_file.read_text(encoding='utf-8')) == {
+        'first': [{'title': 'A', 'google_rank': 1}, {'title': 'C', 'google_rank': 2}],
+        'second': [{'title': 'B', 'google_rank': 1, 'extra': True}],
+    }
+    # اکسل همچنان همه ستون‌ها را دارد
+    assert list(assembler.to_frame().columns) == ['title', 'google_rank', 'extra', 'keyword']
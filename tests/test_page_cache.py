@@ -0,0 +1,90 @@
+import os
+import threading
+
+from page_cache import PageCache
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+        self.content = text.encode('utf-8')
+        self.status_code = 200
+        self.headers = {}
+
+    def raise_for_status(self):
+        pass
+
+
+class FakeSession:
+    def get(self, url, headers=None, timeout=None):
+        return FakeResponse(f"<html><body>{url}</body></html>")
+
+
+def test_every_entry_keeps_its_blob_under_eviction(tmp_path):
+    # سقف حجم کوچک: store های همزمان مدام بدنه‌های مشترک را evict می‌کنند
+    cache = PageCache(tmp_path, ttl=3600, max_bytes=2000)
+    bodies = [f"<html><body>{'x' * 300} {i}</body></html>" for i in range(4)]
+
+    def worker(n):
+        for i in range(200):
+            cache.store(f"https://example.com/{n}/{i}", bodies[(n + i) % len(bodies)])
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for url, digest in cache.conn.execute("SELECT url, content_hash FROM entries"):
+        assert cache._blob_path(digest).exists(), url
+    assert not list(tmp_path.glob('blobs/*/*.tmp'))
+    cache.close()
+
+
+def test_blob_evicted_before_lock_is_written_again(tmp_path):
+    cache = PageCache(tmp_path, ttl=3600)
+    html = '<html><body>shared</body></html>'
+    digest = cache.store('https://example.com/a', html)
+    lock = cache._lock
+
+    class EvictedWhileWaiting:
+        # thread دیگری درست پیش از گرفتن قفل همین بدنه را حذف کرده است
+        armed = True
+
+        def __enter__(self):
+            lock.acquire()
+            if self.armed:
+                self.armed = False
+                os.remove(cache._blob_path(digest))
+
+        def __exit__(self, *exc):
+            lock.release()
+
+    cache._lock = EvictedWhileWaiting()
+    assert cache.store('https://example.com/b', html) == digest
+    assert cache.read_blob(digest) == html
+    cache._lock = lock
+    cache.close()
+
+
+def test_counters_are_exact_across_threads(tmp_path):
+    cache = PageCache(tmp_path, ttl=3600)
+    session = FakeSession()
+    urls = [f"https://example.com/{i}" for i in range(20)]
+    for url in urls:
+        cache.fetch(session, url)
+
+    def worker():
+        for _ in range(50):
+            for url in urls:
+                cache.fetch(session, url)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert cache.misses == len(urls)
+    assert cache.hits == 8 * 50 * len(urls)
+    cache.close()
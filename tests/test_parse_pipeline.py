@@ -0,0 +1,108 @@
+import threading
+
+import pytest
+
+from config import CONFIG
+from page_cache import FetchedPage
+from parse_pipeline import ParsePipeline
+
+PAGE = (
+    '<html><head><title>SEO guide</title></head><body><h1>Guide</h1>'
+    '<p>' + 'Search engine optimization explained step by step. ' * 40 + '</p></body></html>'
+)
+
+
+class FakeFetchEngine:
+    def __init__(self, pages):
+        self.pages = pages
+
+    def run(self, urls, on_result=None):
+        for url in urls:
+            on_result(url, self.pages.get(url))
+
+
+@pytest.fixture
+def scraper(tmp_path, monkeypatch):
+    from content_scraper import ContentScraper
+
+    monkeypatch.setitem(CONFIG, 'OUTPUT_DIR', tmp_path)
+    scraper = ContentScraper(offline=True)
+    stored = []
+    scraper.store_content = lambda url, content, *args, **kwargs: stored.append(content)
+    scraper.stored = stored
+    return scraper
+
+
+@pytest.mark.parametrize('workers', [0, 2])
+def test_url_shared_by_tasks_is_parsed_once(scraper, tmp_path, workers):
+    pages = {
+        'https://a.example/': FetchedPage('https://a.example/', PAGE, 'miss', None, len(PAGE)),
+        'https://b.example/': None,
+    }
+    tasks_by_url = {
+        'https://a.example/': [
+            {'url': 'https://a.example/', 'keyword_id': 1, 'google_rank': 1},
+            {'url': 'https://a.example/', 'keyword_id': 2, 'google_rank': 9},
+        ],
+        'https://b.example/': [{'url': 'https://b.example/', 'keyword_id': 1, 'google_rank': 2}],
+    }
+    scraper.fetch_engine = FakeFetchEngine(pages)
+    excel_file = tmp_path / 'out.xlsx'
+    if workers:
+        pipeline = ParsePipeline(scraper, workers=workers)
+        try:
+            processed = pipeline.run(tasks_by_url, excel_file)
+        finally:
+            pipeline.close()
+        assert pipeline.parsed == 1
+    else:
+        processed = scraper._scrape_inline(tasks_by_url, excel_file)
+
+    assert processed == 2
+    assert [content['google_rank'] for content in scraper.stored] == [1, 9]
+    for content in scraper.stored:
+        assert content['content_score'] == scraper.calculate_content_score(content, content['google_rank'])
+    assert scraper.stored[0]['content_score'] != scraper.stored[1]['content_score']
+
+
+def test_run_survives_a_killed_worker(scraper, tmp_path):
+    urls = [f"https://site{i}.example/" for i in range(20)]
+    pages = {url: FetchedPage(url, PAGE, 'miss', None, len(PAGE)) for url in urls}
+    tasks_by_url = {url: [{'url': url, 'keyword_id': 1, 'google_rank': 1}] for url in urls}
+    scraper.fetch_engine = FakeFetchEngine(pages)
+    pipeline = ParsePipeline(scraper, workers=2, queue_size=4)
+    try:
+        for process in list(pipeline.executor._processes.values()):
+            process.kill()
+            process.join()
+        outcome = {}
+        runner = threading.Thread(
+            target=lambda: outcome.update(processed=pipeline.run(tasks_by_url, tmp_path / 'out.xlsx')), daemon=True
+        )
+        runner.start()
+        runner.join(timeout=60)
+        assert not runner.is_alive(), 'run() hung after a parse worker died'
+        assert pipeline.restarts == 1
+        # صفحه‌هایی که به pool مرده رسیدند ناموفق‌اند؛ بقیه با pool تازه پارس می‌شوند
+        assert 0 < outcome['processed'] <= len(urls)
+        assert outcome['processed'] == len(scraper.stored)
+    finally:
+        pipeline.close()
+
+
+def test_run_aborts_when_the_pool_cannot_recover(scraper, tmp_path, monkeypatch):
+    from concurrent.futures.process import BrokenProcessPool
+
+    monkeypatch.setitem(CONFIG, 'PARSE_POOL_RESTARTS', 0)
+    urls = [f"https://site{i}.example/" for i in range(10)]
+    pages = {url: FetchedPage(url, PAGE, 'miss', None, len(PAGE)) for url in urls}
+    scraper.fetch_engine = FakeFetchEngine(pages)
+    pipeline = ParsePipeline(scraper, workers=1, queue_size=2)
+    try:
+        for process in list(pipeline.executor._processes.values()):
+            process.kill()
+            process.join()
+        with pytest.raises(BrokenProcessPool):
+            pipeline.run({url: [{'url': url, 'google_rank': 1}] for url in urls}, tmp_path / 'out.xlsx')
+    finally:
+        pipeline.close()
@@ -0,0 +1,33 @@
+from config import CONFIG
+from content_scraper import ContentScraper
+from database_manager import DatabaseManager
+from rescore import Rescorer, archive_key
+
+PAGE = (
+    '<html><head><title>SEO guide</title><meta name="description" content="A guide"></head><body>'
+    '<h1>Guide</h1><h2>Basics</h2><p>' + 'Search engine optimization explained step by step. ' * 40 + '</p></body></html>'
+)
+
+
+def test_rescore_updates_content_score(tmp_path, monkeypatch):
+    monkeypatch.setitem(CONFIG, 'PAGE_STORE_ENABLED', False)
+    db_manager = DatabaseManager(tmp_path / 'scraped.db')
+    keyword_id = db_manager.get_keyword_id('seo')
+    archive_dir = tmp_path / 'archive'
+    archive_dir.mkdir()
+    urls = [f'https://example.com/page{i}' for i in range(3)]
+    for rank, url in enumerate(urls, 1):
+        db_manager.insert_url_data(keyword_id, {'url': url, 'title': 'old', 'google_rank': rank, 'content_score': 0})
+        (archive_dir / f'archive_{archive_key(url)}_20260101_000000.html').write_text(PAGE, encoding='utf-8')
+
+    rescorer = Rescorer(db_manager, workers=2, chunk_size=2)
+    assert rescorer.run(rescorer.groups_from_archive(archive_dir)) == 3
+
+    scorer = ContentScraper(offline=True)
+    expected = scorer.extract_content(PAGE, urls[0])
+    rows = db_manager.cursor.execute("SELECT url, google_rank, title, content_score FROM urls ORDER BY google_rank").fetchall()
+    assert [(url, title) for url, _, title, _ in rows] == [(url, 'SEO guide') for url in urls]
+    for _, google_rank, _, score in rows:
+        assert score == scorer.calculate_content_score(expected, google_rank) > 0
+    assert rescorer.score_changed == 3 and rescorer.failed == 0
+    db_manager.close()
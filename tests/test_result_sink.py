@@ -0,0 +1,39 @@
+import pandas as pd
+
+from result_sink import ResultSink
+
+
+def _row(url, score):
+    return {'URL': url, 'Google Rank': 1, 'Content Score': score, 'Title': url}
+
+
+def test_no_file_handle_outside_appends(tmp_path):
+    sink = ResultSink(tmp_path / 'content_results_a.xlsx')
+    assert sink._file is None
+    assert list(sink.iter_rows()) == []
+
+    sink.append(_row('https://a.example/', 10))
+    sink.append(_row('https://b.example/', 20))
+    assert sink.build_workbook() == 2
+    sink.close()
+    assert sink._file is None
+
+    # append بعد از close فایل را دوباره باز می‌کند و رکورد جدید جایگزین قبلی می‌شود
+    sink.append(_row('https://a.example/', 30))
+    assert sink.build_workbook() == 2
+    sink.close()
+
+    df = pd.read_excel(tmp_path / 'content_results_a.xlsx')
+    assert dict(zip(df['URL'], df['Content Score'])) == {'https://b.example/': 20, 'https://a.example/': 30}
+
+
+def test_compact_keeps_latest_rows(tmp_path):
+    sink = ResultSink(tmp_path / 'content_results_b.xlsx')
+    for score in range(5):
+        sink.append(_row('https://a.example/', score))
+    assert sink.build_workbook() == 1
+    assert sink._file is None
+    assert [row['Content Score'] for row in sink.iter_rows()] == [4]
+    sink.append(_row('https://c.example/', 7))
+    assert len(list(sink.iter_rows())) == 2
+    sink.close()
@@ -0,0 +1,66 @@
+import json
+import sqlite3
+
+import schema
+
+# ساختار دیتابیس پیش از schema.py (DatabaseManager._create_tables قدیمی)
+BASELINE = '''
+    CREATE TABLE keywords (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        keyword TEXT UNIQUE NOT NULL
+    );
+    CREATE TABLE scraped_data (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        keyword_id INTEGER NOT NULL,
+        url TEXT NOT NULL,
+        title TEXT,
+        description TEXT,
+        headers TEXT,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (keyword_id) REFERENCES keywords(id) ON DELETE CASCADE
+    );
+'''
+
+
+def _headers(**headings):
+    return json.dumps({tag: headings.get(tag, []) for tag in schema.HEADING_LEVELS}, ensure_ascii=False)
+
+
+def test_baseline_database_is_upgraded(tmp_path):
+    db_path = tmp_path / 'seo_data.db'
+    old = sqlite3.connect(str(db_path))
+    old.executescript(BASELINE)
+    old.executemany("INSERT INTO keywords (keyword) VALUES (?)", [('seo',), ('سئو',)])
+    old.executemany(
+        "INSERT INTO scraped_data (id, keyword_id, url, title, description, headers, timestamp) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [
+            (3, 1, 'https://a.example/', 'A', 'about a', _headers(h1=['Guide'], h2=['One', 'Two']), '2024-01-02 03:04:05'),
+            (7, 2, 'https://b.example/', 'ب', 'درباره ب', _headers(h3=['عنوان']), '2024-02-03 04:05:06'),
+            (9, 2, 'https://c.example/', 'C', None, 'not json', '2024-03-04 05:06:07'),
+        ]
+    )
+    old.commit()
+    old.close()
+
+    conn = schema.connect(db_path)
+    assert schema.schema_version(conn) == schema.SCHEMA_VERSION
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert 'scraped_data' not in tables and {'urls', 'url_headings', 'url_seen'} <= tables
+    assert conn.execute("SELECT COUNT(*) FROM keywords WHERE created_at IS NULL").fetchone()[0] == 0
+    assert conn.execute(
+        "SELECT id, keyword_id, url, title, meta_description, created_at FROM urls ORDER BY id"
+    ).fetchall() == [
+        (3, 1, 'https://a.example/', 'A', 'about a', '2024-01-02 03:04:05'),
+        (7, 2, 'https://b.example/', 'ب', 'درباره ب', '2024-02-03 04:05:06'),
+        (9, 2, 'https://c.example/', 'C', None, '2024-03-04 05:06:07'),
+    ]
+    assert conn.execute("SELECT url_id, level, position, text FROM url_headings ORDER BY url_id, level, position").fetchall() == [
+        (3, 1, 0, 'Guide'), (3, 2, 0, 'One'), (3, 2, 1, 'Two'), (7, 3, 0, 'عنوان'),
+    ]
+    assert conn.execute(schema.URLS_FOR_KEYWORD_QUERY, (1,)).fetchone()[5:7] == ('Guide', 'One | Two')
+    conn.close()
+
+    # اتصال دوباره migration را تکرار نمی‌کند
+    conn = schema.connect(db_path)
+    assert conn.execute("SELECT COUNT(*) FROM urls").fetchone()[0] == 3
+    conn.close()
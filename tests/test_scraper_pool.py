@@ -0,0 +1,137 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import scraper_pool
+from config import CONFIG
+from scraper_pool import RateLimiter, WebScraperPool
+
+
+class FakeScraper:
+    """
+    WebScraper بدون مرورگر؛ crash_on کلماتی است که مرورگر روی آن‌ها از کار می‌افتد
+    (بین مرورگرهای یک factory مشترک است، پس هر کلمه فقط یک بار)
+    """
+
+    def __init__(self, index, crash_on=None, gates=None):
+        self.index = index
+        self.crash_on = crash_on if crash_on is not None else set()
+        self.gates = gates or {}
+        self.alive = True
+        self.closed = False
+        self.searched = []
+
+    def search_google(self, keyword):
+        self.searched.append(keyword)
+        if keyword in self.gates:
+            self.gates[keyword].wait(10)
+        if keyword in self.crash_on:
+            self.crash_on.discard(keyword)
+            self.alive = False
+            return []
+        return [{'url': f'https://example.com/{keyword}/{i}', 'title': keyword} for i in range(3)]
+
+    def is_alive(self):
+        return self.alive
+
+    def close_browser(self):
+        self.closed = True
+
+
+class FakeFactory:
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.scrapers = []
+
+    def __call__(self):
+        self.scrapers.append(FakeScraper(len(self.scrapers), **self.kwargs))
+        return self.scrapers[-1]
+
+
+def _pool(factory, **kwargs):
+    return WebScraperPool(rate_limiter=RateLimiter(per_minute=0), scraper_factory=factory, **kwargs)
+
+
+def test_browser_is_restarted_after_max_searches():
+    factory = FakeFactory()
+    with _pool(factory, workers=1, max_searches=2) as pool:
+        results = pool.search_all([f'k{i}' for i in range(5)])
+    assert all(len(rows) == 3 for rows in results.values()) and len(results) == 5
+    assert [scraper.searched for scraper in factory.scrapers] == [['k0', 'k1'], ['k2', 'k3'], ['k4']]
+    assert all(scraper.closed for scraper in factory.scrapers)
+    assert pool.metrics[0].restarts == 2
+
+
+def test_keyword_is_searched_again_after_a_crash():
+    factory = FakeFactory(crash_on={'crash'})
+    with _pool(factory, workers=1, max_searches=10) as pool:
+        results = pool.search_all(['ok', 'crash', 'after'])
+    assert all(len(rows) == 3 for rows in results.values())
+    first, second = factory.scrapers
+    assert first.searched == ['ok', 'crash'] and first.closed
+    assert second.searched[0] == 'crash'
+    metrics = pool.metrics[0]
+    assert (metrics.crashes, metrics.restarts, metrics.empty) == (1, 1, 0)
+
+
+def test_launch_failure_returns_empty_results(monkeypatch):
+    monkeypatch.setitem(CONFIG, 'MAX_RETRIES', 2)
+    # _launch بین تلاش‌ها می‌خوابد
+    monkeypatch.setattr(scraper_pool, 'time', SimpleNamespace(perf_counter=time.perf_counter, sleep=lambda seconds: None))
+
+    def factory():
+        raise RuntimeError('chrome not found')
+
+    with _pool(factory, workers=2) as pool:
+        results = pool.search_all(['a', 'b', 'c'])
+    assert results == {'a': [], 'b': [], 'c': []}
+    assert sum(metrics.start_failures for metrics in pool.metrics) == 6
+    assert sum(metrics.empty for metrics in pool.metrics) == 3
+
+
+def test_completed_yields_in_completion_order():
+    slow = threading.Event()
+    factory = FakeFactory(gates={'slow': slow})
+    pool = _pool(factory, workers=2).start()
+    try:
+        pool.submit('slow')
+        pool.submit('fast')
+        order = []
+        for keyword, results in pool.completed():
+            order.append(keyword)
+            # جستجوی کند فقط بعد از رسیدن نتیجه سریع تمام می‌شود
+            slow.set()
+        assert order == ['fast', 'slow']
+        assert pool.returned == pool.submitted == 2
+    finally:
+        slow.set()
+        pool.close()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def test_rate_limiter_spaces_searches(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(scraper_pool, 'time', clock)
+
+    limiter = RateLimiter(per_minute=30, jitter=0)
+    assert [limiter.acquire() for _ in range(3)] == [0.0, 2.0, 2.0]
+    clock.now += 10
+    assert limiter.acquire() == 0.0
+    assert (limiter.waits, limiter.waited_seconds) == (2, 4.0)
+
+    jittered = RateLimiter(per_minute=60, jitter=0.5)
+    waits = [jittered.acquire() for _ in range(20)][1:]
+    assert all(0.5 <= wait <= 1.5 for wait in waits)
+    assert RateLimiter(per_minute=0).acquire() == 0.0
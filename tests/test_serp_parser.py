@@ -0,0 +1,128 @@
+from pathlib import Path
+
+import pytest
+
+import serp_parser
+
+FIXTURES = Path(__file__).parent / 'fixtures' / 'serp'
+PAGE_1 = FIXTURES / 'serp_best%20seo%20tools_p1_20240105_101500.html'
+PAGE_2 = FIXTURES / 'serp_best%20seo%20tools_p2_20240105_101500.html'
+BASE_URL = 'https://www.google.com/search?q=best+seo+tools'
+
+EXPECTED_PAGE_1 = [
+    {
+        'title': 'Best SEO Tools for 2024',
+        'link': 'https://ahrefs.com/blog/seo-tools/',
+        'description': 'The best SEO tools, tested. Free and paid options compared.',
+        'google_rank': 1,
+    },
+    {
+        'title': 'Use SEO',
+        'link': 'https://moz.com/tools',
+        'description': 'Moz Pro overview',
+        'google_rank': 2,
+    },
+    {
+        'title': 'Semrush All-in-one',
+        'link': 'https://semrush.com/',
+        'description': '',
+        'google_rank': 3,
+    },
+    {
+        'title': 'SEO Tools: The Complete List',
+        'link': 'https://backlinko.com/seo-tools',
+        'description': 'First paragraph. Secondary paragraph',
+        'google_rank': 4,
+    },
+]
+
+EXPECTED_PAGE_2 = [
+    {
+        'title': 'Free SEO Tools',
+        'link': 'https://www.searchenginejournal.com/seo-tools/',
+        'description': 'Jan 2, 2024 — A list of free tools',
+        'google_rank': 5,
+    },
+]
+
+
+@pytest.fixture(params=['lxml', 'bs4'])
+def backend(request, monkeypatch):
+    if request.param == 'lxml' and not serp_parser._HAS_LXML_CSS:
+        pytest.skip('lxml and cssselect are not installed')
+    monkeypatch.setattr(serp_parser, '_HAS_LXML_CSS', request.param == 'lxml')
+    return request.param
+
+
+def test_parse_serp_page_1(backend):
+    assert serp_parser.parse_serp(PAGE_1.read_bytes(), BASE_URL) == EXPECTED_PAGE_1
+
+
+def test_parse_serp_continues_rank(backend):
+    assert serp_parser.parse_serp(PAGE_2.read_text(encoding='utf-8'), BASE_URL, start_rank=5) == EXPECTED_PAGE_2
+
+
+def test_text_skips_script_style_and_splits_only_blocks(backend):
+    html = (
+        '<div class="g"><a href="https://a.example/"><h3>Best <b>SEO</b>s tools<style>.x{}</style></h3></a>'
+        '<div class="VwiC3b">one<br>two<div>three</div>four<script>var x = 1;</script></div></div>'
+    )
+    [result] = serp_parser.parse_results(html)
+    assert result['title'] == 'Best SEOs tools'
+    assert result['description'] == 'one two three four'
+
+
+def test_parse_results_keeps_filtered_results(backend):
+    links = [result['link'] for result in serp_parser.parse_results(PAGE_1.read_bytes(), BASE_URL)]
+    assert 'https://www.youtube.com/watch?v=abc' in links
+    assert 'https://www.google.com/url?q=https://redirect.example/&sa=U' in links
+    assert 'https://example.org/no-title' not in links
+
+
+def _copy_run(directory, timestamp, pages=(1, 2)):
+    sources = {1: PAGE_1, 2: PAGE_2}
+    for page in pages:
+        name = serp_parser.serp_file_name('best seo tools', page, timestamp)
+        (directory / name).write_bytes(sources[page].read_bytes())
+
+
+def _rows(directory, **kwargs):
+    return list(serp_parser.iter_keyword_rows(serp_parser.iter_serp_dir(directory, **kwargs)))
+
+
+def test_iter_serp_dir_resolves_links_without_run_file(tmp_path, backend):
+    _copy_run(tmp_path, '20240105_101500')
+    rows = _rows(tmp_path)
+    assert [row['link'] for row in rows] == [result['link'] for result in EXPECTED_PAGE_1 + EXPECTED_PAGE_2]
+    assert [row['google_rank'] for row in rows] == [1, 2, 3, 4, 5]
+    assert {row['keyword'] for row in rows} == {'best seo tools'}
+
+
+def test_iter_serp_dir_uses_page_url_from_run_file(tmp_path, backend):
+    _copy_run(tmp_path, '20240105_101500')
+    serp_parser.write_serp_run(tmp_path, 'best seo tools', '20240105_101500', [
+        {'page': 1, 'file': 'p1', 'url': 'https://www.google.com/search?q=best+seo+tools'},
+        {'page': 2, 'file': 'p2', 'url': 'https://tools.example/serp?page=2'},
+    ])
+    links = [row['link'] for row in _rows(tmp_path)]
+    # لینک نسبی صفحه 2 نسبت به آدرس خود صفحه کامل می‌شود، نه صفحه جستجوی پیش‌فرض
+    assert links[-1] == 'https://tools.example/tools/local'
+
+
+def test_iter_serp_dir_reads_latest_complete_run_only(tmp_path, backend):
+    _copy_run(tmp_path, '20240105_101500')
+    serp_parser.write_serp_run(tmp_path, 'best seo tools', '20240105_101500', [
+        {'page': 1, 'file': 'p1', 'url': BASE_URL},
+        {'page': 2, 'file': 'p2', 'url': BASE_URL + '&start=10'},
+    ])
+    # جستجوی جدیدتر که فقط صفحه 1 آن ذخیره شد و فایل run ندارد
+    _copy_run(tmp_path, '20240107_090000', pages=(1,))
+    pages = list(serp_parser.iter_serp_dir(tmp_path))
+    assert [(page.page, page.run) for page in pages] == [(1, '20240105_101500'), (2, '20240105_101500')]
+
+    everything = list(serp_parser.iter_serp_dir(tmp_path, latest_only=False))
+    assert [(page.run, page.page) for page in everything] == [
+        ('20240105_101500', 1), ('20240105_101500', 2), ('20240107_090000', 1)
+    ]
+    ranks = [row['google_rank'] for row in serp_parser.iter_keyword_rows(everything)]
+    assert ranks == [1, 2, 3, 4, 5, 1, 2, 3, 4]
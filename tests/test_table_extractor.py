@@ -0,0 +1,62 @@
+from io import StringIO
+
+import pandas as pd
+import pytest
+
+from html_parsers import PARSERS, _HAS_LXML, _canonical
+from table_extractor import TableTooLarge, extract_table_records, flatten_columns, table_html
+
+TABLES = {
+    'thead': '<table><thead><tr><th>Tool</th><th>Price</th></tr></thead>'
+             '<tbody><tr><td>Ahrefs</td><td>1,299</td></tr><tr><td>Moz</td><td>99.5</td></tr></tbody></table>',
+    'th_rows_without_thead': '<table><tr><th>a</th><th>b</th></tr><tr><td>1</td><td>x</td></tr>'
+                             '<tr><td>2</td><td>y</td></tr></table>',
+    'no_header': '<table><tr><td>1</td><td>2</td></tr><tr><td>3</td><td>4</td></tr></table>',
+    'multi_level_header': '<table><thead><tr><th rowspan="2">Name</th><th colspan="2">Score</th></tr>'
+                          '<tr><th>2023</th><th>2024</th></tr></thead>'
+                          '<tbody><tr><td>A</td><td>10</td><td>12</td></tr><tr><td>B</td><td></td><td>7</td></tr></tbody>'
+                          '</table>',
+    'body_spans': '<table><tr><th>k</th><th>v</th><th>w</th></tr>'
+                  '<tr><td rowspan="2">x</td><td colspan="2">wide</td></tr><tr><td>1</td><td>2</td></tr></table>',
+    'na_and_booleans': '<table><tr><th>n</th><th>flag</th><th>text</th></tr>'
+                       '<tr><td>N/A</td><td>true</td><td>nan</td></tr><tr><td>-3</td><td>False</td><td>ok</td></tr></table>',
+    'numbers': '<table><tr><th>i</th><th>f</th><th>e</th></tr>'
+               '<tr><td>007</td><td>.5</td><td>1e3</td></tr><tr><td>-12</td><td>+2.25</td><td>-inf</td></tr></table>',
+    'duplicate_names': '<table><tr><th>x</th><th>x</th><th></th></tr><tr><td>1</td><td>2</td><td>3</td></tr></table>',
+    'footer': '<table><thead><tr><th>a</th></tr></thead><tbody><tr><td>1</td></tr></tbody>'
+              '<tfoot><tr><td>total</td></tr></tfoot></table>',
+    'ragged_rows': '<table><tr><th>a</th><th>b</th><th>c</th></tr><tr><td>1</td></tr>'
+                   '<tr><td>2</td><td>3</td><td>4</td><td>5</td></tr></table>',
+    'whitespace_and_br': '<table><tr><th>name</th></tr><tr><td>  two   spaces<br>and a break </td></tr></table>',
+    'single_column_blank_lines': '<table><tr><th>only</th></tr><tr><td> </td></tr><tr><td>kept</td></tr></table>',
+    'unicode': '<table><tr><th>نام</th><th>مقدار</th></tr><tr><td>الف</td><td>۱۲</td></tr></table>',
+}
+
+BACKENDS = [name for name in PARSERS if name != 'lxml' or _HAS_LXML]
+
+
+def _tables(parser_name, html):
+    return PARSERS[parser_name]().parse(f"<html><body>{html}</body></html>")['tables']
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+@pytest.mark.parametrize('name', sorted(TABLES))
+def test_records_match_read_html(backend, name):
+    [table] = _tables(backend, TABLES[name])
+    expected = pd.read_html(StringIO(table_html(table)))[0].to_dict('records')
+    # کلیدهای tuple (سرستون چندسطحی) مثل extract_content به رشته تبدیل می‌شوند
+    assert _canonical(flatten_columns(extract_table_records(table))) == _canonical(flatten_columns(expected))
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_hidden_and_empty_tables_are_skipped(backend):
+    hidden, empty = _tables(backend, '<table style="display: none"><tr><td>x</td></tr></table><table><tr><td> </td></tr></table>')
+    assert extract_table_records(hidden) is None
+    assert extract_table_records(empty) is None
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_cell_budget(backend):
+    [table] = _tables(backend, '<table>' + '<tr><td>1</td><td>2</td></tr>' * 10 + '</table>')
+    with pytest.raises(TableTooLarge):
+        extract_table_records(table, max_cells=5)
@@ -14,13 +14,24 @@ import json
 from pathlib import Path
 
 from config import CONFIG, get_logger
+from serp_parser import is_valid_url, parse_results, serp_file_name, write_serp_run
 
 logger = get_logger(__name__)
 
 class WebScraper:
-    def __init__(self):
+    # تاخیرهای ثابت نسخه قبلی (ثانیه)؛ فقط با fixed_sleeps برای مقایسه زمان‌ها استفاده می‌شوند
+    LEGACY_SLEEPS = {'load': 3, 'before_submit': 1, 'submit': 3, 'after_extract': 2, 'next_page': 3}
+
+    def __init__(self, search_url=None, headless=None, fixed_sleeps=None):
         self.ua = UserAgent()
         self.driver = None
+        # صفحه جستجو (برای تست می‌تواند صفحه محلی LocalTestServer باشد)
+        self.search_url = search_url or CONFIG['SEARCH_URL']
+        self.headless = CONFIG['BROWSER_HEADLESS'] if headless is None else headless
+        self.fixed_sleeps = CONFIG['SEARCH_FIXED_SLEEPS'] if fixed_sleeps is None else fixed_sleeps
+        # زمان مراحل هر جستجو (ثانیه)
+        self.timings = []
+        self._serp_run = None
         self.setup_driver()
         if self.driver:
             self.wait = WebDriverWait(self.driver, 15)
@@ -38,6 +49,9 @@ class WebScraper:
             options.add_argument('--disable-extensions')
             options.add_argument('--disable-popup-blocking')
             options.add_argument('--start-maximized')
+            if self.headless:
+                options.add_argument('--headless=new')
+                options.add_argument('--window-size=1920,1080')
             options.add_argument(f'user-agent={self.ua.random}')
             
             # Chrome path
@@ -68,40 +82,76 @@ class WebScraper:
             logger.error(error_msg)
             raise Exception(error_msg)
 
+    def _legacy_sleep(self, step):
+        if self.fixed_sleeps:
+            time.sleep(self.LEGACY_SLEEPS[step])
+
+    def _wait_for_navigation(self, previous_url, old_root):
+        """منتظر صفحه جدید: تغییر URL، کنار رفتن سند قبلی و پایان بارگذاری"""
+        self.wait.until(EC.url_changes(previous_url))
+        self.wait.until(EC.staleness_of(old_root))
+        self.wait.until(lambda driver: driver.execute_script("return document.readyState") == "complete")
+
     def search_google(self, keyword):
+        timing = {'keyword': keyword}
+        started = time.perf_counter()
+        # زمان اجرای مشترک برای صفحه‌های ذخیره‌شده این جستجو
+        self._serp_run = {'timestamp': datetime.now().strftime("%Y%m%d_%H%M%S"), 'pages': []}
         try:
             logger.info(f"Searching for: {keyword}")
-            self.driver.get("https://www.google.com")
-            time.sleep(3)
+            self.driver.get(self.search_url)
+            self._legacy_sleep('load')
 
             search_box = self.wait.until(EC.presence_of_element_located((By.NAME, "q")))
             search_box.clear()
-            
-            # Type keyword naturally
-            for char in keyword:
-                search_box.send_keys(char)
-                time.sleep(random.uniform(0.1, 0.3))
-            
-            time.sleep(1)
+            timing['load'] = time.perf_counter() - started
+
+            if self.fixed_sleeps:
+                # Type keyword naturally
+                for char in keyword:
+                    search_box.send_keys(char)
+                    time.sleep(random.uniform(0.1, 0.3))
+            else:
+                search_box.send_keys(keyword)
+            self._legacy_sleep('before_submit')
+
+            step = time.perf_counter()
+            previous_url = self.driver.current_url
+            old_root = self.driver.find_element(By.TAG_NAME, "html")
             search_box.send_keys(Keys.RETURN)
-            time.sleep(3)
+            self._wait_for_navigation(previous_url, old_root)
+            self._legacy_sleep('submit')
 
-            results = self.extract_results_from_page()
-            time.sleep(2)
+            results = self.extract_results_from_page(keyword, 1)
+            timing['first_page'] = time.perf_counter() - step
+            self._legacy_sleep('after_extract')
 
             # Try to get results from second page
+            step = time.perf_counter()
+            complete = True
             try:
-                next_button = self.wait.until(EC.element_to_be_clickable((By.ID, "pnnext")))
-                self.driver.execute_script("arguments[0].click();", next_button)
-                time.sleep(3)
-                second_page_results = self.extract_results_from_page()
-                results.extend(second_page_results)
+                next_buttons = self.driver.find_elements(By.ID, "pnnext")
+                if next_buttons:
+                    previous_url = self.driver.current_url
+                    old_root = self.driver.find_element(By.TAG_NAME, "html")
+                    self.driver.execute_script("arguments[0].click();", next_buttons[0])
+                    self._wait_for_navigation(previous_url, old_root)
+                    self._legacy_sleep('next_page')
+                    second_page_results = self.extract_results_from_page(keyword, 2)
+                    results.extend(second_page_results)
+                    timing['second_page'] = time.perf_counter() - step
+                else:
+                    logger.warning(f"No second results page for '{keyword}'")
             except Exception as e:
+                complete = False
                 logger.warning(f"Could not get second page: {str(e)}")
+            if CONFIG['SERP_SAVE_PAGES'] and complete:
+                self.save_serp_run(keyword)
 
-            # ذخیره نتایج در فایل اکسل و JSON
-            self.save_results_to_excel(keyword, results)
-            self.save_results_to_json(keyword, results)
+            # ذخیره نتایج در فایل اکسل و JSON جداگانه برای هر کلمه (خروجی ترکیبی در main ساخته می‌شود)
+            if CONFIG['WRITE_PER_KEYWORD_FILES']:
+                self.save_results_to_excel(keyword, results)
+                self.save_results_to_json(keyword, results)
 
             return results[:20]
 
@@ -109,29 +159,56 @@ class WebScraper:
             logger.error(f"Search error for '{keyword}': {str(e)}")
             return []
 
-    def extract_results_from_page(self):
+        finally:
+            timing['total'] = time.perf_counter() - started
+            self.timings.append(timing)
+            logger.debug(
+                f"Search timing for '{keyword}': "
+                + ', '.join(f"{name} {timing[name]:.2f}s" for name in ('load', 'first_page', 'second_page', 'total') if name in timing)
+            )
+
+    def save_serp_page(self, keyword, page, page_source, url=None):
+        """
+        ذخیره HTML صفحه نتایج برای پارس دوباره با serp_parser بدون مرورگر.
+        صفحه‌های یک جستجو زمان اجرای مشترک (self._serp_run) در نام فایل دارند.
+        """
+        try:
+            serp_dir = Path(CONFIG['SERP_PAGES_DIR'])
+            serp_dir.mkdir(parents=True, exist_ok=True)
+            run = self._serp_run or {'timestamp': datetime.now().strftime("%Y%m%d_%H%M%S"), 'pages': []}
+            file_name = serp_file_name(keyword, page, run['timestamp'])
+            with open(serp_dir / file_name, 'w', encoding='utf-8') as f:
+                f.write(page_source)
+            run['pages'].append({'page': page, 'file': file_name, 'url': url})
+        except Exception as e:
+            logger.error(f"Error saving results page of '{keyword}': {str(e)}")
+
+    def save_serp_run(self, keyword):
+        """ثبت اجرای کامل جستجو (آدرس صفحه‌ها) بعد از ذخیره همه صفحه‌های آن"""
+        run, self._serp_run = self._serp_run, None
+        if not run or not run['pages']:
+            return
+        try:
+            write_serp_run(CONFIG['SERP_PAGES_DIR'], keyword, run['timestamp'], run['pages'])
+        except Exception as e:
+            logger.error(f"Error saving results run of '{keyword}': {str(e)}")
+
+    def extract_results_from_page(self, keyword=None, page=1):
         results = []
         try:
-            elements = self.wait.until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, "div.g")))
-            
-            for element in elements:
-                try:
-                    title = element.find_element(By.CSS_SELECTOR, "h3").text
-                    link = element.find_element(By.CSS_SELECTOR, "a").get_attribute("href")
-                    try:
-                        description = element.find_element(By.CSS_SELECTOR, "div.VwiC3b").text
-                    except:
-                        description = ""
-                    
-                    if title and link and self.is_valid_url(link):
-                        results.append({
-                            'title': title,
-                            'link': link,
-                            'description': description,
-                            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                        })
-                except:
-                    continue
+            selectors = CONFIG['SERP_SELECTORS']
+            self.wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, selectors['result'])))
+
+            # یک درخواست page_source و پارس داخل پروسس (نه چند رفت و برگشت WebDriver برای هر نتیجه)
+            page_source = self.driver.page_source
+            page_url = self.driver.current_url
+            if keyword and CONFIG['SERP_SAVE_PAGES']:
+                self.save_serp_page(keyword, page, page_source, page_url)
+            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            for result in parse_results(page_source, page_url, selectors):
+                if result['title'] and result['link'] and self.is_valid_url(result['link']):
+                    result['timestamp'] = timestamp
+                    results.append(result)
 
             return results
 
@@ -140,8 +217,7 @@ class WebScraper:
             return []
 
     def is_valid_url(self, url):
-        blacklist = ['google.com', 'youtube.com', 'facebook.com']
-        return url and not any(site in url.lower() for site in blacklist)
+        return is_valid_url(url)
 
     def save_results_to_excel(self, keyword, results):
         try:
@@ -174,6 +250,13 @@ class WebScraper:
         except Exception as e:
             logger.error(f"خطا در ذخیره نتایج در JSON: {str(e)}")
 
+    def is_alive(self):
+        """آیا مرورگر هنوز به فرمان‌ها پاسخ می‌دهد"""
+        try:
+            return self.driver is not None and bool(self.driver.window_handles)
+        except Exception:
+            return False
+
     def get_page_source(self):
         try:
             return self.driver.page_source